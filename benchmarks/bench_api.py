@@ -0,0 +1,209 @@
+# bench_api.py
+"""
+End-to-end `/predict` latency (p50/p95/p99) and throughput at a given
+concurrency.
+
+    python -m benchmarks.bench_api --requests 2000 --concurrency 1 8 32 --output api.json
+    python -m benchmarks.bench_api --url http://127.0.0.1:8000 --concurrency 16
+
+Without `--url` the app runs in this process, with its lifespan, behind an
+in-process ASGI transport, and logs to a throwaway SQLite file in WAL mode
+(`--db sqlite`) or an in-memory SQLite database (`--db memory`) standing in
+for PostgreSQL; the background log writer, shadow scorer and rollup
+compactor write there too. The settings of `src/config.py` apply, so the micro-batcher,
+log writer, caches etc. are benchmarked by setting their environment
+variables. Every request has its own request_id and content, so the
+prediction and idempotency caches never answer.
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional, Sequence
+
+import httpx
+
+from .results import emit, environment, latency_summary
+from .synthetic import make_records
+
+
+async def _load(
+    client: httpx.AsyncClient, records: List[dict], concurrency: int
+) -> Dict[str, Any]:
+    queue = iter(records)
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+
+    async def worker():
+        for record in queue:
+            start = time.perf_counter()
+            response = await client.post("/predict", json=record)
+            latencies.append(time.perf_counter() - start)
+            statuses[response.status_code] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+    return {
+        "concurrency": concurrency,
+        "requests": len(records),
+        "errors": sum(n for status, n in statuses.items() if status != 200),
+        "status_codes": {str(status): n for status, n in sorted(statuses.items())},
+        "seconds": round(seconds, 4),
+        "throughput_rps": round(len(records) / seconds, 1),
+        "latency": latency_summary(latencies),
+    }
+
+
+async def _run_levels(client, records, levels, warmup) -> List[Dict[str, Any]]:
+    await _load(client, records[:warmup], 1)
+    results = []
+    offset = warmup
+    per_level = (len(records) - warmup) // len(levels)
+    for concurrency in levels:
+        result = await _load(client, records[offset : offset + per_level], concurrency)
+        offset += per_level
+        print(
+            f"concurrency {concurrency}: {result['throughput_rps']} req/s, "
+            f"p99 {result['latency'].get('p99_ms')} ms",
+            file=sys.stderr,
+        )
+        results.append(result)
+    return results
+
+
+def _bench_database(db: str, directory: str):
+    """(URL, engine options, session factory) of a fresh SQLite database."""
+    from sqlalchemy import create_engine, event
+    from sqlalchemy.orm import sessionmaker
+    from sqlalchemy.pool import StaticPool
+
+    from src.database import Base
+
+    if db == "memory":
+        # one shared connection, so every session sees the same in-memory database
+        url = "sqlite://"
+        options = {"connect_args": {"check_same_thread": False}, "poolclass": StaticPool}
+    else:
+        url = f"sqlite:///{os.path.join(directory, 'bench.db')}"
+        options = {"connect_args": {"check_same_thread": False, "timeout": 30}}
+    engine = create_engine(url, **options)
+    if db != "memory":
+
+        @event.listens_for(engine, "connect")
+        def _wal(connection, _):
+            # in rollback-journal mode, concurrent writers mostly wait on each
+            # other's fsync; WAL is how SQLite is run under concurrent writes
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+
+    Base.metadata.create_all(engine)
+    return url, options, sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+
+async def _run_in_process(records, levels, warmup, db) -> List[Dict[str, Any]]:
+    # the app picks its database when imported
+    os.environ.setdefault("TESTING", "true")
+    from src import main
+    from src.database import Base
+
+    app = main.app
+    with tempfile.TemporaryDirectory() as directory:
+        url, options, session_factory = _bench_database(db, directory)
+
+        def get_bench_db():
+            session = session_factory()
+            try:
+                yield session
+            finally:
+                session.close()
+
+        overrides = {main.get_db: get_bench_db}
+        async_engine = None
+        if main.async_engine is not None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+            # with --db memory this is a second in-memory database; both are thrown away
+            async_engine = create_async_engine(
+                url.replace("sqlite://", "sqlite+aiosqlite://", 1), **options
+            )
+            async with async_engine.begin() as connection:
+                await connection.run_sync(Base.metadata.create_all)
+            async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
+            async def get_bench_async_db():
+                async with async_session_factory() as session:
+                    yield session
+
+            overrides[main.get_async_db] = get_bench_async_db
+
+        # every writer of the app goes to the benchmark database, never to
+        # the TESTING database file in the working directory
+        writers = [
+            component
+            for component in (main.log_writer, main.shadow_scorer, main.rollup_compactor)
+            if component is not None
+        ]
+        previous = [writer.session_factory for writer in writers]
+        previous_app_factory = app.state.session_factory
+        for writer in writers:
+            writer.session_factory = session_factory
+        app.state.session_factory = session_factory
+        app.dependency_overrides.update(overrides)
+        try:
+            async with app.router.lifespan_context(app):
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(
+                    transport=transport, base_url="http://bench"
+                ) as client:
+                    return await _run_levels(client, records, levels, warmup)
+        finally:
+            for dependency in overrides:
+                app.dependency_overrides.pop(dependency, None)
+            for writer, factory in zip(writers, previous):
+                writer.session_factory = factory
+            app.state.session_factory = previous_app_factory
+            if async_engine is not None:
+                await async_engine.dispose()
+
+
+async def _run_remote(url, records, levels, warmup) -> List[Dict[str, Any]]:
+    limits = httpx.Limits(max_connections=max(levels))
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        return await _run_levels(client, records, levels, warmup)
+
+
+def run(
+    n_requests: int = 2000,
+    concurrency: Sequence[int] = (1, 8, 32),
+    warmup: int = 50,
+    url: Optional[str] = None,
+    db: str = "sqlite",
+) -> Dict[str, Any]:
+    """Runs `n_requests` split evenly over the concurrency levels, after `warmup` requests."""
+    records = make_records(n_requests + warmup, seed=1)
+    if url:
+        levels = asyncio.run(_run_remote(url, records, concurrency, warmup))
+    else:
+        levels = asyncio.run(_run_in_process(records, concurrency, warmup, db))
+    return {"target": url or f"in-process ({db})", "warmup": warmup, "levels": levels}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000, help="split over the levels")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--warmup", type=int, default=50)
+    parser.add_argument("--url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--db", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+    result = run(args.requests, args.concurrency, args.warmup, args.url, args.db)
+    emit({"environment": environment(), "api": result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
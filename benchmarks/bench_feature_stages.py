@@ -0,0 +1,134 @@
+# bench_feature_stages.py
+"""
+Compares time and peak traced memory of the feature stages in
+`src/pipeline.py` against the previous copy-per-stage implementation.
+
+    python -m benchmarks.bench_feature_stages --rows 100000
+"""
+import argparse
+import json
+import time
+import tracemalloc
+
+import pandas as pd
+
+from src import pipeline
+from src.lexicons import get_term_matcher
+
+from .synthetic import make_requests
+
+
+# --- previous implementation: every stage starts with a full df.copy() ---
+
+
+def legacy_drop_leakage_and_redundant_cols(df):
+    df = df.copy()
+    leakage_cols = ["giver_username_if_known", "requester_user_flair", "post_was_edited"]
+    retrieval_cols = [col for col in df.columns if "_at_retrieval" in col]
+    redundant_cols = [
+        "request_text",
+        "unix_timestamp_of_request",
+        "request_id",
+        "requester_subreddits_at_request",
+    ]
+    cols_to_drop = leakage_cols + retrieval_cols + redundant_cols
+    df.drop(columns=[c for c in cols_to_drop if c in df.columns], inplace=True)
+    return df
+
+
+def legacy_create_time_features(df):
+    df = df.copy()
+    request_datetime = pd.to_datetime(df["unix_timestamp_of_request_utc"], unit="s")
+    df["hour_of_request"] = request_datetime.dt.hour
+    df["day_of_week"] = request_datetime.dt.dayofweek
+    df.drop(columns=["unix_timestamp_of_request_utc"], inplace=True)
+    return df
+
+
+def legacy_create_engineered_features(df):
+    df = df.copy()
+    df["request_length"] = df["request_text_edit_aware"].str.len().fillna(0)
+    df["raop_post_ratio"] = df["requester_number_of_posts_on_raop_at_request"] / (
+        df["requester_number_of_posts_at_request"] + 1e-6
+    )
+    df["full_request_text"] = (
+        df["request_title"].fillna("")
+        + " "
+        + df["request_text_edit_aware"].fillna("")
+        + " "
+        + df["requester_username"].fillna("")
+    )
+    df.drop(
+        columns=["request_title", "request_text_edit_aware", "requester_username"],
+        inplace=True,
+    )
+    return df
+
+
+def legacy_create_politeness_features(df):
+    df = df.copy()
+    matcher = get_term_matcher()
+    counts = matcher.count_many(df["full_request_text"])
+    for i, category in enumerate(matcher.categories):
+        df[f"{category}_terms_count"] = counts[:, i]
+    df["politeness_score"] = (
+        df["polite_terms_count"] + df["humility_terms_count"] + df["reciprocity_terms_count"]
+    )
+    return df
+
+
+LEGACY_STAGES = [
+    legacy_drop_leakage_and_redundant_cols,
+    legacy_create_time_features,
+    legacy_create_engineered_features,
+    legacy_create_politeness_features,
+]
+CURRENT_STAGES = [
+    pipeline.drop_leakage_and_redundant_cols,
+    pipeline.create_time_features,
+    pipeline.create_engineered_features,
+    pipeline.create_politeness_features,
+]
+
+
+def run_stages(stages, df):
+    """Runs the stages, returns (output, seconds, peak traced MB above the input)."""
+    tracemalloc.start()
+    start = time.perf_counter()
+    out = df
+    for stage in stages:
+        out = stage(out)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return out, elapsed, peak / 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    df = make_requests(args.rows, wide=True)
+    legacy_out, legacy_s, legacy_mb = run_stages(LEGACY_STAGES, df)
+    current_out, current_s, current_mb = run_stages(CURRENT_STAGES, df)
+
+    # the column transformer selects by name, so only the columns it uses matter
+    pd.testing.assert_frame_equal(
+        legacy_out[current_out.columns], current_out, check_dtype=False
+    )
+    print(
+        json.dumps(
+            {
+                "rows": args.rows,
+                "input_columns": df.shape[1],
+                "legacy": {"seconds": legacy_s, "peak_mb": legacy_mb},
+                "current": {"seconds": current_s, "peak_mb": current_mb},
+            },
+            indent=2,
+        )
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# bench_model_load.py
+"""
+Model load time and resident memory, for each way the API can load the model.
+
+    python -m benchmarks.bench_model_load --repeats 5 --output load.json
+
+Every load runs in a fresh interpreter, so imports (sklearn, pandas) count
+towards the load time and memory as they do when a worker starts. RSS and
+PSS are read from /proc (see `src/memory.py`) before and after the load.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+from typing import Any, Dict
+
+from src.model_loader import MODEL_PATH
+from src.score import DEFAULT_BUNDLE_PATH
+
+from .results import emit, environment
+
+# name -> load_model(bundle_path, model_path, fast_path, mmap_mode) arguments
+VARIANTS = {
+    "bundle": [DEFAULT_BUNDLE_PATH, MODEL_PATH, True, None],
+    "bundle_mmap": [DEFAULT_BUNDLE_PATH, MODEL_PATH, True, "r"],
+    "joblib": [None, MODEL_PATH, True, None],
+    "joblib_no_fast_path": [None, MODEL_PATH, False, None],
+}
+
+
+# runs in a fresh interpreter that has imported nothing else, so the cost
+# of the imports load_model needs is part of the measurement
+_CHILD = """
+import contextlib, json, sys, time
+from src.memory import process_memory
+
+before = process_memory()
+start = time.perf_counter()
+from src.model_loader import load_model
+
+with contextlib.redirect_stdout(sys.stderr):
+    pipeline, scorer, _ = load_model(*json.loads(sys.argv[1]))
+seconds = time.perf_counter() - start
+after = process_memory()
+if pipeline is None and scorer is None:
+    raise SystemExit("Model could not be loaded.")
+print(json.dumps({
+    "seconds": seconds,
+    "rss_kb": after["rss_kb"],
+    "pss_kb": after["pss_kb"],
+    "rss_added_kb": None if before["rss_kb"] is None else after["rss_kb"] - before["rss_kb"],
+}))
+"""
+
+
+def _measure(arguments) -> Dict[str, Any]:
+    completed = subprocess.run(
+        [sys.executable, "-c", _CHILD, json.dumps(arguments)],
+        capture_output=True, text=True, check=True,
+    )
+    return json.loads(completed.stdout)
+
+
+def run(repeats: int = 3) -> Dict[str, Any]:
+    """Median load time and memory of every variant over `repeats` fresh processes."""
+    results = {}
+    for name, arguments in VARIANTS.items():
+        samples = [_measure(arguments) for _ in range(repeats)]
+        results[name] = {
+            "load_ms": round(statistics.median(s["seconds"] for s in samples) * 1000, 2),
+            **{
+                key: statistics.median(s[key] for s in samples)
+                if samples[0][key] is not None else None
+                for key in ("rss_kb", "pss_kb", "rss_added_kb")
+            },
+        }
+        print(f"{name}: {results[name]['load_ms']} ms", file=sys.stderr)
+    return {"repeats": repeats, "variants": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+    emit({"environment": environment(), "model_load": run(args.repeats)}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# bench_stages.py
+"""
+Time of each step of the served pipeline, from `1_drop_cols` through
+`5_preprocessor` and the classifier, at several batch sizes. The NumPy fast
+scorer, which the API uses when available, is timed on the same batches.
+
+    python -m benchmarks.bench_stages --batch-sizes 1 10 100 1000 10000 --output stages.json
+"""
+import argparse
+import contextlib
+import statistics
+import sys
+import time
+from typing import Any, Dict, List, Sequence
+
+from src.model_loader import MODEL_PATH, load_model
+
+from .results import emit, environment
+from .synthetic import make_requests
+
+BATCH_SIZES = (1, 10, 100, 1000, 10000)
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, time.perf_counter() - start
+
+
+def _median_ms(samples: List[float]) -> float:
+    return round(statistics.median(samples) * 1000, 4)
+
+
+def run(
+    batch_sizes: Sequence[int] = BATCH_SIZES,
+    repeats: int = 5,
+    model_path: str = MODEL_PATH,
+) -> Dict[str, Any]:
+    """Median milliseconds per step for every batch size."""
+    with contextlib.redirect_stdout(sys.stderr):
+        pipeline, scorer, version = load_model(None, model_path)
+    if pipeline is None:
+        raise SystemExit(f"No model at {model_path}.")
+    steps = pipeline.named_steps["preprocessor"].steps
+    classifier = pipeline.named_steps["classifier"]
+
+    results = []
+    requests = make_requests(max(batch_sizes))
+    for batch_size in batch_sizes:
+        batch = requests.iloc[:batch_size].reset_index(drop=True)
+        records = batch.to_dict(orient="records")
+        samples = {name: [] for name, _ in steps}
+        samples["classifier"] = []
+        samples["pipeline_total"] = []
+        samples["fast_scorer"] = []
+        for _ in range(repeats):
+            X = batch
+            total = 0.0
+            for name, step in steps:
+                X, seconds = _timed(step.transform, X)
+                samples[name].append(seconds)
+                total += seconds
+            _, seconds = _timed(classifier.predict_proba, X)
+            samples["classifier"].append(seconds)
+            samples["pipeline_total"].append(total + seconds)
+            if scorer is not None:
+                samples["fast_scorer"].append(_timed(scorer.score, records)[1])
+        timings = {name: _median_ms(s) for name, s in samples.items() if s}
+        results.append(
+            {
+                "batch_size": batch_size,
+                "median_ms": timings,
+                "pipeline_rows_per_sec": round(
+                    batch_size / max(timings["pipeline_total"] / 1000, 1e-9), 1
+                ),
+            }
+        )
+        print(f"batch {batch_size}: {timings['pipeline_total']} ms", file=sys.stderr)
+    return {"model_version": version, "repeats": repeats, "batches": results}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=BATCH_SIZES)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+    result = run(args.batch_sizes, args.repeats, args.model)
+    emit({"environment": environment(), "stages": result}, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+# compare.py
+"""
+Compares two benchmark result files and flags regressions.
+
+    python -m benchmarks.compare baseline.json candidate.json --threshold 0.2
+
+Every timing, memory and throughput figure present in both files is listed
+with its relative change. The exit status is 1 when one of them got worse
+by more than `--threshold` (a fraction), so the comparison can gate CI.
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, Optional
+
+# entries of result lists are matched on these keys rather than on position
+_LIST_KEYS = ("batch_size", "concurrency")
+_LOWER_IS_BETTER = ("_ms", "_kb", "seconds")
+_HIGHER_IS_BETTER = ("_rps", "_per_sec")
+
+
+def flatten(result: Any, prefix: str = "") -> Dict[str, float]:
+    """Numeric leaves of a result document, keyed by their dotted path."""
+    if isinstance(result, dict):
+        items = result.items()
+    elif isinstance(result, list):
+        items = []
+        for index, entry in enumerate(result):
+            key = next((f"{k}={entry[k]}" for k in _LIST_KEYS if k in entry), str(index))
+            items.append((key, entry))
+    elif isinstance(result, (int, float)) and not isinstance(result, bool):
+        return {prefix: float(result)}
+    else:
+        return {}
+    flat = {}
+    for key, value in items:
+        flat.update(flatten(value, f"{prefix}.{key}" if prefix else str(key)))
+    return flat
+
+
+def direction(path: str) -> Optional[int]:
+    """1 when higher is better, -1 when lower is better, None for other figures."""
+    # the unit is in the figure's name, or in its group's ("median_ms": {...})
+    for name in reversed(path.split(".")[-2:]):
+        if name.endswith(_HIGHER_IS_BETTER):
+            return 1
+        if name.endswith(_LOWER_IS_BETTER):
+            return -1
+    return None
+
+
+def compare(baseline: Dict[str, Any], candidate: Dict[str, Any], threshold: float):
+    """(path, baseline, candidate, relative change, regressed) for every shared figure."""
+    old, new = flatten(baseline), flatten(candidate)
+    rows = []
+    for path in sorted(old.keys() & new.keys()):
+        sign = direction(path)
+        if path.startswith("environment.") or sign is None:
+            continue
+        change = (new[path] - old[path]) / old[path] if old[path] else 0.0
+        rows.append((path, old[path], new[path], change, -sign * change > threshold))
+    return rows
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args(argv)
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    rows = compare(baseline, candidate, args.threshold)
+    for path, old, new, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{path:70s} {old:>12.3f} {new:>12.3f} {change:>+8.1%}{flag}")
+    regressions = sum(row[4] for row in rows)
+    print(f"{len(rows)} figures compared, {regressions} regressed by more than {args.threshold:.0%}.")
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+# run_all.py
+"""
+Runs the stage, API and model load benchmarks into one JSON document.
+
+    python -m benchmarks.run_all --output bench-main.json
+    python -m benchmarks.run_all --quick --output bench-branch.json
+    python -m benchmarks.compare bench-main.json bench-branch.json
+"""
+import argparse
+
+from . import bench_api, bench_model_load, bench_stages
+from .results import emit, environment
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--quick", action="store_true", help="smaller batches and fewer requests")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--db", choices=("sqlite", "memory"), default="sqlite")
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    args = parser.parse_args(argv)
+
+    if args.quick:
+        stages = bench_stages.run((1, 100, 1000), repeats=3)
+        api = bench_api.run(300, args.concurrency, warmup=20, db=args.db)
+        model_load = bench_model_load.run(repeats=1)
+    else:
+        stages = bench_stages.run()
+        api = bench_api.run(concurrency=args.concurrency, db=args.db)
+        model_load = bench_model_load.run()
+    emit(
+        {
+            "environment": environment(),
+            "stages": stages,
+            "api": api,
+            "model_load": model_load,
+        },
+        args.output,
+    )
+
+
+if __name__ == "__main__":
+    main()
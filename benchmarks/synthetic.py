@@ -0,0 +1,76 @@
+# synthetic.py
+"""Synthetic RAOP-shaped requests for benchmarks (the real dump is not shipped)."""
+import numpy as np
+import pandas as pd
+
+_WORDS = (
+    "pizza please thank thanks hungry student exam broke week rent paycheck "
+    "kids family would love appreciate grateful kind pay it forward return "
+    "the favor tonight friday job lost hate asking reddit random acts help"
+).split()
+
+_SUBREDDITS = ["funny", "askreddit", "pics", "gaming", "WTF", "Random_Acts_Of_Pizza"]
+
+
+def _texts(rng, n, n_words):
+    words = np.array(_WORDS)
+    return [" ".join(rng.choice(words, size=n_words)) for _ in range(n)]
+
+
+def make_requests(n: int, seed: int = 0, wide: bool = False) -> pd.DataFrame:
+    """
+    `n` request rows with the `PizzaRequestInput` columns. With `wide=True`
+    the frame also carries the leakage and `_at_retrieval` columns of the
+    full RAOP dump, as `train.py` sees it.
+    """
+    rng = np.random.default_rng(seed)
+    timestamps = rng.uniform(1.29e9, 1.38e9, size=n)
+    posts = rng.integers(0, 200, size=n)
+    df = pd.DataFrame(
+        {
+            "request_id": [f"t3_{i:x}" for i in range(n)],
+            "request_title": _texts(rng, n, 8),
+            "request_text_edit_aware": _texts(rng, n, 80),
+            "requester_username": [f"user_{i}" for i in range(n)],
+            "unix_timestamp_of_request_utc": timestamps,
+            "requester_account_age_in_days_at_request": rng.uniform(0, 2000, size=n),
+            "requester_days_since_first_post_on_raop_at_request": rng.uniform(0, 500, size=n),
+            "requester_number_of_comments_at_request": rng.integers(0, 1000, size=n),
+            "requester_number_of_comments_in_raop_at_request": rng.integers(0, 20, size=n),
+            "requester_number_of_posts_at_request": posts,
+            "requester_number_of_posts_on_raop_at_request": rng.integers(0, 5, size=n),
+            "requester_number_of_subreddits_at_request": rng.integers(0, 100, size=n),
+            "requester_upvotes_minus_downvotes_at_request": rng.integers(-50, 5000, size=n),
+            "requester_upvotes_plus_downvotes_at_request": rng.integers(0, 20000, size=n),
+            "requester_subreddits_at_request": [
+                list(rng.choice(_SUBREDDITS, size=3)) for _ in range(n)
+            ],
+            "unix_timestamp_of_request": timestamps,
+        }
+    )
+    if wide:
+        df["request_text"] = df["request_text_edit_aware"]
+        df["giver_username_if_known"] = "N/A"
+        df["requester_user_flair"] = None
+        df["post_was_edited"] = False
+        for name in (
+            "number_of_downvotes_of_request_at_retrieval",
+            "number_of_upvotes_of_request_at_retrieval",
+            "request_number_of_comments_at_retrieval",
+            "requester_account_age_in_days_at_retrieval",
+            "requester_days_since_first_post_on_raop_at_retrieval",
+            "requester_number_of_comments_at_retrieval",
+            "requester_number_of_comments_in_raop_at_retrieval",
+            "requester_number_of_posts_at_retrieval",
+            "requester_number_of_posts_on_raop_at_retrieval",
+            "requester_upvotes_minus_downvotes_at_retrieval",
+            "requester_upvotes_plus_downvotes_at_retrieval",
+        ):
+            df[name] = rng.integers(0, 1000, size=n)
+        df["requester_received_pizza"] = rng.random(n) < 0.25
+    return df
+
+
+def make_records(n: int, seed: int = 0) -> list:
+    """`n` request payloads as dicts, ready to post to the API."""
+    return make_requests(n, seed=seed).to_dict(orient="records")
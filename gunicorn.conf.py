@@ -0,0 +1,22 @@
+# gunicorn.conf.py
+"""
+Multi-worker serving: `gunicorn -c gunicorn.conf.py src.main:app`.
+
+The app, and with it the model, is imported once in the master before the
+workers are forked (`preload_app`), so the workers share those pages instead
+of each loading its own copy. Per-worker memory is reported by `GET /status`.
+"""
+import os
+
+bind = os.getenv("BIND", "0.0.0.0:8000")
+workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+
+def post_fork(server, worker):
+    # connections opened by the master (create_all at import) must not be
+    # reused by the workers; each worker opens its own
+    from src.database import engine
+
+    engine.dispose(close=False)
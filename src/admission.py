@@ -0,0 +1,317 @@
+# admission.py
+"""
+Admission control for the prediction endpoints: load is shed at the door
+instead of piling up in the thread pool and the database pool.
+
+`AdmissionController` lets at most `max_in_flight` requests run at once.
+Up to `max_queue` more wait for a slot, first come first served, for at
+most `queue_timeout_ms`; beyond that a request is answered right away
+with 503 and a `Retry-After` header. The optional `TokenBucketLimiter`
+answers clients that exceed their rate with 429 before they take a slot.
+
+Every admitted request also gets a deadline, from its `X-Request-Timeout-Ms`
+header capped by the server default. Endpoints call `check_deadline()`
+before expensive work, so a request whose client already gave up (or that
+waited too long in the queue) is not scored and logged for nothing.
+"""
+import asyncio
+import contextvars
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+TIMEOUT_HEADER = "x-request-timeout-ms"
+ADMITTED_KEY = "admission.admitted_at"
+
+# monotonic time by which the current request must be done, None for no limit
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class AdmissionRejectedError(Exception):
+    """A request was shed; `status` and `retry_after` (seconds) describe the response."""
+
+    def __init__(self, reason: str, status: int, retry_after: int):
+        super().__init__(reason)
+        self.reason = reason
+        self.status = status
+        self.retry_after = retry_after
+
+
+class DeadlineExceededError(AdmissionRejectedError):
+    """The request deadline passed before its work started (maps to HTTP 503)."""
+
+    def __init__(self, retry_after: int = 1):
+        super().__init__("deadline_exceeded", 503, retry_after)
+
+
+def remaining_seconds() -> Optional[float]:
+    """Time left before the current request's deadline, None without one."""
+    deadline = _deadline.get()
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def check_deadline():
+    """Raises `DeadlineExceededError` when the current request's deadline has passed."""
+    remaining = remaining_seconds()
+    if remaining is not None and remaining <= 0:
+        raise DeadlineExceededError()
+
+
+class _Waiter:
+    __slots__ = ("future", "granted")
+
+    def __init__(self, future: asyncio.Future):
+        self.future = future
+        # set under the lock when a released slot is handed to this waiter
+        self.granted = False
+
+
+class AdmissionController:
+    """
+    A counting semaphore with a bounded, timed wait queue. A released slot
+    is handed straight to the oldest waiter, so a burst cannot overtake
+    the requests already queued.
+    """
+
+    def __init__(
+        self,
+        max_in_flight: int,
+        max_queue: int = 0,
+        queue_timeout_ms: float = 1000.0,
+        retry_after_seconds: int = 1,
+    ):
+        if max_in_flight < 1:
+            raise ValueError("max_in_flight must be at least 1")
+        self.max_in_flight = max_in_flight
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout_ms / 1000.0
+        self.retry_after = max(1, retry_after_seconds)
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._lock = threading.Lock()
+        self.counters = {
+            "admitted": 0,
+            "queued": 0,
+            "rejected_queue_full": 0,
+            "rejected_queue_timeout": 0,
+            "deadline_exceeded": 0,
+        }
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        self.counters[f"rejected_{reason}"] += 1
+        return AdmissionRejectedError(reason, 503, self.retry_after)
+
+    async def acquire(self, timeout: Optional[float] = None):
+        """
+        Takes a slot, waiting at most `queue_timeout_ms` (or `timeout`
+        seconds, if shorter); raises `AdmissionRejectedError` otherwise.
+        """
+        with self._lock:
+            if self._in_flight < self.max_in_flight and not self._waiters:
+                self._in_flight += 1
+                self.counters["admitted"] += 1
+                return
+            if len(self._waiters) >= self.max_queue:
+                raise self._reject("queue_full")
+            waiter = _Waiter(asyncio.get_running_loop().create_future())
+            self._waiters.append(waiter)
+            self.counters["queued"] += 1
+        wait = self.queue_timeout if timeout is None else min(self.queue_timeout, timeout)
+        try:
+            await asyncio.wait_for(waiter.future, max(wait, 0.0))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                if not waiter.granted:
+                    self._waiters.remove(waiter)
+                    if isinstance(e, asyncio.CancelledError):
+                        raise
+                    raise self._reject("queue_timeout")
+            # the slot was handed over just as the wait ended: keep it, unless
+            # the request itself is gone
+            if isinstance(e, asyncio.CancelledError):
+                self.release()
+                raise
+        # `release` left the slot counted for this request
+        with self._lock:
+            self.counters["admitted"] += 1
+
+    def release(self):
+        with self._lock:
+            if not self._waiters:
+                self._in_flight -= 1
+                return
+            waiter = self._waiters.popleft()
+            # the slot stays taken, now by the waiter
+            waiter.granted = True
+        waiter.future.get_loop().call_soon_threadsafe(_wake, waiter.future)
+
+    def count_deadline_exceeded(self):
+        with self._lock:
+            self.counters["deadline_exceeded"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "pending": len(self._waiters),
+                "max_queue": self.max_queue,
+                **self.counters,
+            }
+
+
+def _wake(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class TokenBucketLimiter:
+    """
+    Per-client token buckets: `rate` requests per second on average, bursts
+    of up to `burst`. Only the `max_clients` most recently seen clients are
+    tracked, so memory stays bounded; a forgotten client starts full.
+    """
+
+    def __init__(self, rate: float, burst: int, max_clients: int = 10000):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.burst = max(1, burst)
+        self.max_clients = max_clients
+        self._buckets: "OrderedDict[str, Tuple[float, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.limited = 0
+
+    def allow(self, client: str) -> Tuple[bool, int]:
+        """(whether a request of `client` may go ahead, seconds until it may if not)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            allowed = tokens >= 1
+            if allowed:
+                tokens -= 1
+            else:
+                self.limited += 1
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else math.ceil((1 - tokens) / self.rate)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"clients": len(self._buckets), "limited": self.limited}
+
+
+def _rejection(error: AdmissionRejectedError) -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"Request rejected ({error.reason}); retry later."},
+        status_code=error.status,
+        headers={"Retry-After": str(error.retry_after)},
+    )
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying the rate limit, the admission controller and
+    the request deadline to requests whose path starts with `path_prefix`.
+    Clients are told apart by their address, or by `client_header` when one
+    is given: only pass a header that a trusted proxy sets, since clients
+    could otherwise pick their own key. A `DeadlineExceededError` raised by
+    the endpoint becomes a 503.
+    """
+
+    def __init__(
+        self,
+        app,
+        controller: Optional[AdmissionController] = None,
+        limiter: Optional[TokenBucketLimiter] = None,
+        path_prefix: str = "/predict",
+        timeout_ms: float = 0.0,
+        client_header: Optional[str] = None,
+        observe_wait: Optional[Callable[[float], None]] = None,
+    ):
+        self.app = app
+        self.controller = controller
+        self.limiter = limiter
+        self.path_prefix = path_prefix
+        self.timeout = timeout_ms / 1000.0
+        self.client_header = client_header.lower().encode() if client_header else None
+        self.observe_wait = observe_wait
+
+    def _header(self, scope, name: bytes) -> Optional[str]:
+        for key, value in scope.get("headers", ()):
+            if key == name:
+                return value.decode("latin-1")
+        return None
+
+    def _timeout(self, scope) -> Optional[float]:
+        """The server timeout, shortened by the client's `X-Request-Timeout-Ms`."""
+        timeout = self.timeout or None
+        requested = self._header(scope, TIMEOUT_HEADER.encode())
+        if requested is not None:
+            try:
+                client_timeout = float(requested) / 1000.0
+            except ValueError:
+                client_timeout = None
+            if client_timeout is not None and client_timeout > 0:
+                timeout = client_timeout if timeout is None else min(timeout, client_timeout)
+        return timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not scope["path"].startswith(self.path_prefix):
+            await self.app(scope, receive, send)
+            return
+
+        if self.limiter is not None:
+            client = None
+            if self.client_header is not None:
+                client = self._header(scope, self.client_header)
+            if client is None:
+                client = (scope.get("client") or ("unknown",))[0]
+            allowed, retry_after = self.limiter.allow(client)
+            if not allowed:
+                error = AdmissionRejectedError("rate_limited", 429, retry_after)
+                await _rejection(error)(scope, receive, send)
+                return
+
+        start = time.monotonic()
+        timeout = self._timeout(scope)
+        if self.controller is not None:
+            try:
+                await self.controller.acquire(timeout)
+            except AdmissionRejectedError as e:
+                await _rejection(e)(scope, receive, send)
+                return
+            if self.observe_wait is not None:
+                self.observe_wait(time.monotonic() - start)
+        scope[ADMITTED_KEY] = time.perf_counter()
+        token = _deadline.set(None if timeout is None else start + timeout)
+        started = False
+
+        async def send_wrapper(message):
+            nonlocal started
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except DeadlineExceededError as e:
+            if self.controller is not None:
+                self.controller.count_deadline_exceeded()
+            if started:
+                raise
+            await _rejection(e)(scope, receive, send)
+        finally:
+            _deadline.reset(token)
+            if self.controller is not None:
+                self.controller.release()
+
+
+def admitted_at(scope) -> Optional[float]:
+    """perf_counter() value at which `AdmissionMiddleware` let the request in."""
+    return scope.get(ADMITTED_KEY)
@@ -0,0 +1,170 @@
+# batching.py
+import queue
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+from typing import Any, Callable, Dict, List, Sequence
+
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item scoring calls into small batches.
+
+    Callers block in `submit` while a background thread collects requests
+    until either `max_batch_size` items are waiting or `max_wait_ms` has
+    passed since the first one arrived, scores them with one call to
+    `score_fn` and hands each caller its own result back. The added latency
+    is therefore bounded by the wait window.
+    """
+
+    def __init__(
+        self,
+        score_fn: Callable[[List[Dict[str, Any]]], Sequence[Any]],
+        max_batch_size: int = 64,
+        max_wait_ms: float = 3.0,
+    ):
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue: "queue.Queue" = queue.Queue()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.batches_scored = 0
+        self.items_scored = 0
+        self.largest_batch = 0
+
+    def start(self):
+        # a worker left running by a timed-out `stop` carries on
+        self._stopping.clear()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(
+            target=self._run, name="micro-batcher", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 5.0):
+        """
+        Stops the worker once every already submitted item is scored. Items
+        still queued after `timeout` seconds fail; a worker busy past it is
+        kept, so a later `stop` can wait for it again.
+        """
+        with self._lock:
+            if self._thread is None:
+                return
+            # taken under the lock, so no submit can queue an item after this
+            self._stopping.set()
+        self._thread.join(timeout)
+        self._fail_pending(RuntimeError("MicroBatcher was stopped."))
+        if not self._thread.is_alive():
+            self._thread = None
+
+    def submit(self, record: Dict[str, Any], timeout: float = None):
+        """
+        Queues one record and blocks until its result is available, at most
+        `timeout` seconds (then raises `TimeoutError` and the record is not
+        scored if it has not been yet).
+        """
+        future = Future()
+        with self._lock:
+            if self._thread is None or self._stopping.is_set():
+                raise RuntimeError("MicroBatcher is not running.")
+            self._queue.put((record, future))
+        try:
+            return future.result(timeout)
+        except TimeoutError:
+            future.cancel()
+            raise
+
+    def _fail_pending(self, error: Exception):
+        while True:
+            try:
+                _, future = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            _resolve(future.set_exception, error)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "batches_scored": self.batches_scored,
+                "items_scored": self.items_scored,
+                "largest_batch": self.largest_batch,
+                "pending": self._queue.qsize(),
+            }
+
+    def _collect(self):
+        """Waits for a first item, then gathers more until size or time runs out."""
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _score_items(self, batch) -> None:
+        """Scores `batch` in one call; raises if that fails or returns the wrong count."""
+        results = self.score_fn([record for record, _ in batch])
+        if len(results) != len(batch):
+            raise RuntimeError(
+                f"score_fn returned {len(results)} results for {len(batch)} records."
+            )
+        for (_, future), result in zip(batch, results):
+            _resolve(future.set_result, result)
+
+    def _score(self, batch):
+        """
+        Resolves the future of every item of `batch`. When the batch call
+        fails, the items are scored one by one, so a bad record only fails
+        its own caller.
+        """
+        # callers that gave up are not scored
+        batch = [item for item in batch if not item[1].cancelled()]
+        if not batch:
+            return
+        try:
+            self._score_items(batch)
+            return
+        except Exception as e:
+            if len(batch) == 1:
+                _resolve(batch[0][1].set_exception, e)
+                return
+        for item in batch:
+            if item[1].done():
+                continue
+            try:
+                self._score_items([item])
+            except Exception as e:
+                _resolve(item[1].set_exception, e)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if not batch:
+                continue
+            self._score(batch)
+            with self._lock:
+                self.batches_scored += 1
+                self.items_scored += len(batch)
+                self.largest_batch = max(self.largest_batch, len(batch))
+
+
+def _resolve(set_outcome: Callable[[Any], None], outcome):
+    """Sets a future's result or exception, unless its caller gave up already."""
+    try:
+        set_outcome(outcome)
+    except InvalidStateError:
+        pass
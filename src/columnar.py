@@ -0,0 +1,221 @@
+# columnar.py
+"""
+Arrow IPC, Parquet and msgpack request bodies for `/predict/arrow`,
+`/predict/parquet` and `/predict/msgpack`.
+
+Arrow and Parquet batches are validated a column at a time against the
+fields of `PizzaRequestInput`: a column of the wrong type rejects the
+batch, a null in a required column rejects only its row. The validated
+columns are scored as they are, without building a request object per
+row. pyarrow and msgpack are imported on first use, so the API starts
+without them.
+"""
+import typing
+from typing import Any, Dict, List, Optional, Tuple
+
+from .schemas import PizzaRequestInput
+
+ARROW_STREAM_TYPE = "application/vnd.apache.arrow.stream"
+PARQUET_TYPE = "application/vnd.apache.parquet"
+MSGPACK_TYPE = "application/msgpack"
+
+
+class ColumnSchemaError(ValueError):
+    """Columns of a batch do not match `PizzaRequestInput` (maps to HTTP 422)."""
+
+    def __init__(self, errors: List[Dict[str, Any]]):
+        super().__init__(f"{len(errors)} invalid columns")
+        self.errors = errors
+
+
+def _field_kinds() -> Dict[str, Tuple[str, bool]]:
+    """Field name -> (kind, required) of `PizzaRequestInput`."""
+    kinds = {}
+    for name, field in PizzaRequestInput.model_fields.items():
+        annotation = field.annotation
+        if typing.get_origin(annotation) is typing.Union:
+            annotation = next(a for a in typing.get_args(annotation) if a is not type(None))
+        if typing.get_origin(annotation) in (list, List):
+            kind = "list"
+        else:
+            kind = {str: "string", float: "float", int: "int"}[annotation]
+        kinds[name] = (kind, field.is_required())
+    return kinds
+
+
+FIELD_KINDS = _field_kinds()
+
+
+def read_arrow(body: bytes):
+    """Table of an Arrow IPC body, in the stream or the file format."""
+    import pyarrow as pa
+
+    try:
+        return pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except pa.ArrowInvalid:
+        return pa.ipc.open_file(pa.py_buffer(body)).read_all()
+
+
+def read_parquet(body: bytes):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    return pq.read_table(pa.BufferReader(body))
+
+
+def write_arrow(table) -> bytes:
+    import pyarrow as pa
+
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def write_parquet(table) -> bytes:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    sink = pa.BufferOutputStream()
+    pq.write_table(table, sink)
+    return sink.getvalue().to_pybytes()
+
+
+def _cast(column, kind: str):
+    """`column` as the Arrow type of a field `kind`, or None when pydantic would reject it."""
+    import pyarrow as pa
+    import pyarrow.types as t
+
+    type_ = column.type
+    if t.is_null(type_):
+        # a column with no value at all: every row is missing
+        target = {"string": pa.string(), "float": pa.float64(), "int": pa.int64()}.get(
+            kind, pa.list_(pa.string())
+        )
+        return column.cast(target)
+    if kind == "string" and (t.is_string(type_) or t.is_large_string(type_)):
+        return column.cast(pa.string())
+    if kind == "float" and (t.is_integer(type_) or t.is_floating(type_)):
+        return column.cast(pa.float64())
+    if kind == "int" and (t.is_integer(type_) or t.is_floating(type_)):
+        try:
+            # fractional floats fail the safe cast, as they fail validation
+            return column.cast(pa.int64(), safe=True)
+        except pa.ArrowInvalid:
+            return None
+    if kind == "list" and (t.is_list(type_) or t.is_large_list(type_)):
+        value_type = type_.value_type
+        if t.is_string(value_type) or t.is_large_string(value_type) or t.is_null(value_type):
+            return column.cast(pa.list_(pa.string()))
+    return None
+
+
+def validate_table(table):
+    """
+    (validated table, indices of its rows in `table`, per-row errors) of
+    a request batch. Extra columns are dropped, as `PizzaRequestInput`
+    ignores extra fields. Raises `ColumnSchemaError` for a missing or
+    mistyped column.
+    """
+    import pyarrow as pa
+    import pyarrow.compute as pc
+
+    columns, column_errors = {}, []
+    valid = pa.array([True] * table.num_rows)
+    missing_by_row: Dict[str, Any] = {}
+    for name, (kind, required) in FIELD_KINDS.items():
+        if name not in table.column_names:
+            if required:
+                column_errors.append(
+                    {"type": "missing", "loc": ["body", name], "msg": "Column required"}
+                )
+            else:
+                columns[name] = _cast(pa.nulls(table.num_rows), kind)
+            continue
+        cast = _cast(table.column(name), kind)
+        if cast is None:
+            column_errors.append(
+                {
+                    "type": f"{kind}_type",
+                    "loc": ["body", name],
+                    "msg": f"Column of type {table.column(name).type} is not a valid {kind}",
+                }
+            )
+            continue
+        columns[name] = cast
+        if required and cast.null_count:
+            is_null = pc.is_null(cast)
+            missing_by_row[name] = is_null
+            valid = pc.and_(valid, pc.invert(is_null))
+    if column_errors:
+        raise ColumnSchemaError(column_errors)
+
+    valid_mask = valid.combine_chunks() if hasattr(valid, "combine_chunks") else valid
+    validated = pa.table(columns).filter(valid_mask)
+    row_errors = {}
+    for name, is_null in missing_by_row.items():
+        for index in pc.indices_nonzero(is_null).to_pylist():
+            row_errors.setdefault(index, []).append(
+                {"type": "missing", "loc": [name], "msg": "Field required"}
+            )
+    valid_indices = pc.indices_nonzero(valid_mask).to_pylist()
+    return validated, valid_indices, row_errors
+
+
+def feature_columns(table) -> Dict[str, Any]:
+    """Column name -> values of a validated table, as the model scores them."""
+    columns = {}
+    for name, (kind, _) in FIELD_KINDS.items():
+        column = table.column(name)
+        if kind in ("float", "int"):
+            columns[name] = column.to_numpy(zero_copy_only=False)
+        else:
+            columns[name] = column.to_pylist()
+    return columns
+
+
+def result_table(
+    n_rows: int,
+    scored: Dict[int, Tuple[str, str, int, float]],
+    errors: Dict[int, Any],
+):
+    """
+    One result row per input row: index, request_id, prediction_label,
+    prediction_value and probability_of_success, or an error message.
+    """
+    import pyarrow as pa
+
+    rows = [scored.get(i) for i in range(n_rows)]
+    return pa.table(
+        {
+            "index": pa.array(range(n_rows), pa.int64()),
+            "request_id": pa.array([r[0] if r else None for r in rows], pa.string()),
+            "prediction_label": pa.array([r[1] if r else None for r in rows], pa.string()),
+            "prediction_value": pa.array([r[2] if r else None for r in rows], pa.int64()),
+            "probability_of_success": pa.array(
+                [r[3] if r else None for r in rows], pa.float64()
+            ),
+            "error": pa.array(
+                [None if i in scored else _error_message(errors.get(i)) for i in range(n_rows)],
+                pa.string(),
+            ),
+        }
+    )
+
+
+def _error_message(error: Optional[Any]) -> str:
+    if isinstance(error, list):
+        return "; ".join(f"{'.'.join(map(str, e['loc']))}: {e['msg']}" for e in error)
+    return str(error)
+
+
+def unpack_msgpack(body: bytes):
+    import msgpack
+
+    return msgpack.unpackb(body, raw=False)
+
+
+def pack_msgpack(content: Any) -> bytes:
+    import msgpack
+
+    return msgpack.packb(content, use_bin_type=True)
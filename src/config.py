@@ -0,0 +1,153 @@
+# config.py
+"""Runtime settings for the API, read from the environment (and `.env`)."""
+import os
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, str(default)))
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+# -- Scoring --
+# Score with the NumPy fast path (src/inference.py) when the loaded pipeline supports it.
+FAST_PATH_ENABLED = _env_bool("FAST_PATH_ENABLED", True)
+# Compact NumPy bundle written by train.py; served instead of the joblib
+# pipeline when present (set to an empty string to always use the pipeline).
+MODEL_BUNDLE_PATH = os.getenv(
+    "MODEL_BUNDLE_PATH", os.path.join("models", "pizza_request_model.npz")
+)
+# Memory-map the model arrays read-only instead of copying them into each
+# process, so workers serving the same file share its pages.
+MODEL_MMAP_ENABLED = _env_bool("MODEL_MMAP_ENABLED", True)
+
+# -- Database connection pool (PostgreSQL) --
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 5)
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 10)
+DB_POOL_TIMEOUT = _env_float("DB_POOL_TIMEOUT", 30.0)
+# Check connections on checkout, and replace them after this many seconds
+# (-1 keeps them forever), so a restarted database or a proxy closing idle
+# connections does not surface as failed log writes.
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)
+# Log writes of /predict go through an asyncio engine (asyncpg, or aiosqlite
+# in TESTING mode) and are awaited instead of taking a thread-pool slot.
+ASYNC_DB_ENABLED = _env_bool("ASYNC_DB_ENABLED", False)
+
+# -- Batch scoring --
+# Upper bound on the number of items accepted by /predict/batch in one call.
+MAX_BATCH_SIZE = _env_int("MAX_BATCH_SIZE", 10000)
+
+# -- Process pool for scoring (executor.py); each worker loads the model --
+INFERENCE_EXECUTOR_ENABLED = _env_bool("INFERENCE_EXECUTOR_ENABLED", False)
+INFERENCE_WORKERS = _env_int("INFERENCE_WORKERS", os.cpu_count() or 1)
+# Scoring calls allowed to wait for or run in a worker before new ones get 503.
+INFERENCE_MAX_PENDING = _env_int("INFERENCE_MAX_PENDING", 256)
+
+# -- Streaming NDJSON scoring (/predict/stream) --
+# Lines answered together, valid or not (their valid lines are scored and
+# logged in one call); results are streamed per chunk.
+STREAM_CHUNK_SIZE = _env_int("STREAM_CHUNK_SIZE", 500)
+# Longer lines are answered with an error instead of being buffered.
+STREAM_MAX_LINE_BYTES = _env_int("STREAM_MAX_LINE_BYTES", 1024 * 1024)
+# A chunk holding this many bytes of input is answered early, before it
+# has STREAM_CHUNK_SIZE lines; this bounds the input buffered per stream.
+STREAM_MAX_CHUNK_BYTES = _env_int("STREAM_MAX_CHUNK_BYTES", 4 * 1024 * 1024)
+
+# -- Micro-batching of concurrent /predict calls --
+MICROBATCH_ENABLED = _env_bool("MICROBATCH_ENABLED", False)
+MICROBATCH_MAX_BATCH_SIZE = _env_int("MICROBATCH_MAX_BATCH_SIZE", 64)
+MICROBATCH_MAX_WAIT_MS = _env_float("MICROBATCH_MAX_WAIT_MS", 3.0)
+
+# -- Background prediction log writer --
+LOG_WRITER_ENABLED = _env_bool("LOG_WRITER_ENABLED", False)
+LOG_WRITER_MAX_QUEUE_SIZE = _env_int("LOG_WRITER_MAX_QUEUE_SIZE", 10000)
+LOG_WRITER_FLUSH_BATCH_SIZE = _env_int("LOG_WRITER_FLUSH_BATCH_SIZE", 500)
+LOG_WRITER_FLUSH_INTERVAL_MS = _env_float("LOG_WRITER_FLUSH_INTERVAL_MS", 200.0)
+# one of "block", "drop" or "spill"
+LOG_WRITER_OVERFLOW_POLICY = os.getenv("LOG_WRITER_OVERFLOW_POLICY", "block")
+LOG_WRITER_BLOCK_TIMEOUT_MS = _env_float("LOG_WRITER_BLOCK_TIMEOUT_MS", 1000.0)
+LOG_WRITER_SPILL_PATH = os.getenv(
+    "LOG_WRITER_SPILL_PATH", "prediction_logs_spill.jsonl"
+)
+
+# -- Prediction cache (identical feature payloads) --
+PREDICTION_CACHE_ENABLED = _env_bool("PREDICTION_CACHE_ENABLED", False)
+PREDICTION_CACHE_MAX_SIZE = _env_int("PREDICTION_CACHE_MAX_SIZE", 10000)
+PREDICTION_CACHE_TTL_SECONDS = _env_float("PREDICTION_CACHE_TTL_SECONDS", 3600.0)
+
+# -- Idempotency: a repeated request_id gets the stored response, no new log row --
+IDEMPOTENCY_ENABLED = _env_bool("IDEMPOTENCY_ENABLED", False)
+IDEMPOTENCY_MAX_SIZE = _env_int("IDEMPOTENCY_MAX_SIZE", 100000)
+IDEMPOTENCY_TTL_SECONDS = _env_float("IDEMPOTENCY_TTL_SECONDS", 86400.0)
+
+# -- Prometheus metrics (GET /metrics): stage timers, request counters, gauges --
+METRICS_ENABLED = _env_bool("METRICS_ENABLED", True)
+
+# -- Prediction log queries (GET /logs) --
+LOGS_MAX_PAGE_SIZE = _env_int("LOGS_MAX_PAGE_SIZE", 1000)
+
+# -- Dashboard rollups (GET /stats), compacted from prediction_logs --
+# the API compacts in a background thread; `python -m src.rollups` does one pass
+ROLLUP_ENABLED = _env_bool("ROLLUP_ENABLED", False)
+ROLLUP_INTERVAL_SECONDS = _env_float("ROLLUP_INTERVAL_SECONDS", 60.0)
+ROLLUP_BATCH_SIZE = _env_int("ROLLUP_BATCH_SIZE", 10000)
+# logs younger than this wait for the next pass, so late commits are not skipped
+ROLLUP_LAG_SECONDS = _env_float("ROLLUP_LAG_SECONDS", 5.0)
+STATS_MAX_DAYS = _env_int("STATS_MAX_DAYS", 366)
+
+# -- Model versions: hot reload, rollback and the admin endpoints --
+# how often the artifact files are checked for a new version; 0 disables the watcher
+MODEL_WATCH_INTERVAL_SECONDS = _env_float("MODEL_WATCH_INTERVAL_SECONDS", 10.0)
+# loaded versions kept besides the served one, for an immediate rollback
+MODEL_HISTORY_SIZE = _env_int("MODEL_HISTORY_SIZE", 3)
+# every loaded artifact is copied here under its version; empty to load in place
+MODEL_ARCHIVE_DIR = os.getenv("MODEL_ARCHIVE_DIR", os.path.join("models", "versions"))
+# required as the X-Admin-Token header of /admin/* when set
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
+
+# -- Shadow models: challenger heads scored off the response path --
+# comma-separated name=path[@share of requests], e.g. "lr=models/shadow/lr.joblib@0.5"
+SHADOW_MODELS = os.getenv("SHADOW_MODELS", "")
+# batches waiting for the shadow thread; more are dropped, never waited for
+SHADOW_QUEUE_SIZE = _env_int("SHADOW_QUEUE_SIZE", 1000)
+
+# -- Admission control of /predict*: shed load instead of queueing without bound --
+ADMISSION_ENABLED = _env_bool("ADMISSION_ENABLED", False)
+# requests served at once; by default as many as the database pool has connections
+ADMISSION_MAX_IN_FLIGHT = _env_int("ADMISSION_MAX_IN_FLIGHT", DB_POOL_SIZE + DB_MAX_OVERFLOW)
+# requests waiting for a slot, and for how long, before they get 503
+ADMISSION_MAX_QUEUE = _env_int("ADMISSION_MAX_QUEUE", 64)
+ADMISSION_QUEUE_TIMEOUT_MS = _env_float("ADMISSION_QUEUE_TIMEOUT_MS", 500.0)
+ADMISSION_RETRY_AFTER_SECONDS = _env_int("ADMISSION_RETRY_AFTER_SECONDS", 1)
+# deadline of an admitted request, shortened by its X-Request-Timeout-Ms; 0 for none
+REQUEST_TIMEOUT_MS = _env_float("REQUEST_TIMEOUT_MS", 5000.0)
+# per-client token buckets (429 beyond the rate); 0 disables rate limiting
+RATE_LIMIT_PER_SECOND = _env_float("RATE_LIMIT_PER_SECOND", 0.0)
+RATE_LIMIT_BURST = _env_int("RATE_LIMIT_BURST", 20)
+# clients are keyed on their address; set a header only if a trusted proxy
+# in front of the API sets or overwrites it (clients could choose their key)
+RATE_LIMIT_CLIENT_HEADER = os.getenv("RATE_LIMIT_CLIENT_HEADER", "")
+RATE_LIMIT_MAX_CLIENTS = _env_int("RATE_LIMIT_MAX_CLIENTS", 10000)
+
+# -- Drift monitor: live feature histograms against the training reference --
+DRIFT_ENABLED = _env_bool("DRIFT_ENABLED", False)
+# written by train.py next to the model
+DRIFT_REFERENCE_PATH = os.getenv(
+    "DRIFT_REFERENCE_PATH", os.path.join("models", "pizza_request_model.drift.json")
+)
+# scores cover the last DRIFT_WINDOW_SIZE to twice as many scored requests
+DRIFT_WINDOW_SIZE = _env_int("DRIFT_WINDOW_SIZE", 5000)
+# scored rows waiting for the drift thread; more are dropped, never waited for
+DRIFT_QUEUE_ROWS = _env_int("DRIFT_QUEUE_ROWS", 20000)
+# population stability index above which a feature is reported as drifted
+DRIFT_PSI_THRESHOLD = _env_float("DRIFT_PSI_THRESHOLD", 0.25)
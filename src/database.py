@@ -4,6 +4,8 @@ from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
+from . import config
+
 load_dotenv()
 
 IS_TESTING = os.getenv("TESTING", "false").lower() == "true"
@@ -11,7 +13,10 @@ IS_TESTING = os.getenv("TESTING", "false").lower() == "true"
 if IS_TESTING:
     print("INFO:     Running in TEST mode. Using test SQLite database.")
     DATABASE_URL = "sqlite:///./test_pizza.db"
+    ASYNC_DATABASE_URL = "sqlite+aiosqlite:///./test_pizza.db"
     engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+    # SQLite connections are local files; only the checks apply
+    POOL_OPTIONS = {"pool_pre_ping": config.DB_POOL_PRE_PING}
 else:
     print("INFO:     Running in PRODUCTION mode. Connecting to PostgreSQL.")
     DB_USER = os.getenv("POSTGRES_USER")
@@ -20,11 +25,29 @@ else:
     DB_PORT = os.getenv("POSTGRES_PORT")
     DB_NAME = os.getenv("POSTGRES_DB")
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
-    engine = create_engine(DATABASE_URL)
+    ASYNC_DATABASE_URL = f"postgresql+asyncpg://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    POOL_OPTIONS = {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_timeout": config.DB_POOL_TIMEOUT,
+        "pool_pre_ping": config.DB_POOL_PRE_PING,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+    }
+    engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
 
 Base = declarative_base()
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Optional asyncio engine for the logging path. The drivers (asyncpg,
+# aiosqlite) are only imported when it is enabled.
+async_engine = None
+AsyncSessionLocal = None
+if config.ASYNC_DB_ENABLED:
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, **POOL_OPTIONS)
+    AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -32,3 +55,8 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -0,0 +1,309 @@
+# drift.py
+"""
+Drift of the incoming traffic away from the training data.
+
+`train.py` saves a reference next to the model: for each monitored value
+(the numeric inputs, the engineered features and the predicted
+probability), the edges of its training deciles and the share of training
+rows in each bin. `DriftMonitor` counts the scored requests in the same
+bins and compares the two distributions with the population stability
+index (PSI):
+
+    < 0.1 stable, 0.1 to 0.25 moderate shift, > 0.25 significant shift
+
+The API hands each scored batch to the monitor's queue and returns; a
+background thread computes the features and updates the counts, so a
+request pays for one `put_nowait`. Memory is fixed: one array of at most
+`BINS` counts per value and window, and at most `max_queued_rows` scored
+rows waiting for the thread. Counts cover roughly the last
+`window_size` to `2 * window_size` requests: when the current window is
+full it becomes the previous one, and the one before is dropped.
+"""
+import json
+import logging
+import os
+import queue
+import threading
+from typing import Any, Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .features import NUMERIC_INPUT_COLUMNS, engineer_column_features, engineer_features
+
+logger = logging.getLogger(__name__)
+
+BINS = 10
+PROBABILITY = "probability_of_success"
+MONITORED_FEATURES = NUMERIC_INPUT_COLUMNS + [
+    "hour_of_request",
+    "day_of_week",
+    "request_length",
+    "raop_post_ratio",
+    "politeness_score",
+]
+# added to every bin share, so an empty bin does not make the index infinite
+_EPSILON = 1e-4
+
+
+def bin_edges(values, bins: int = BINS) -> np.ndarray:
+    """Inner edges of the quantile bins of `values`; repeated quantiles are merged."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    if not len(values):
+        return np.empty(0)
+    return np.unique(np.quantile(values, np.linspace(0, 1, bins + 1)[1:-1]))
+
+
+def bin_counts(values, edges: np.ndarray) -> np.ndarray:
+    """Counts of `values` in the `len(edges) + 1` bins bounded by `edges`."""
+    values = np.asarray(values, dtype=np.float64)
+    values = values[np.isfinite(values)]
+    return np.bincount(np.searchsorted(edges, values, side="right"), minlength=len(edges) + 1)
+
+
+def psi(reference_shares, counts) -> Optional[float]:
+    """Population stability index of `counts` against the reference bin shares."""
+    total = counts.sum()
+    if not total:
+        return None
+    expected = np.asarray(reference_shares, dtype=np.float64) + _EPSILON
+    actual = counts / total + _EPSILON
+    return float(np.sum((actual - expected) * np.log(actual / expected)))
+
+
+def monitored_values(records, probabilities: Optional[Sequence[float]] = None):
+    """Value name -> array of the monitored values of `records` (dicts, or columns)."""
+    if isinstance(records, Mapping):
+        columns = engineer_column_features(records)
+    else:
+        columns = engineer_features(records)
+    values = {name: np.asarray(columns[name], dtype=np.float64) for name in MONITORED_FEATURES}
+    if probabilities is not None:
+        values[PROBABILITY] = np.asarray(probabilities, dtype=np.float64)
+    return values
+
+
+def build_reference(
+    records, probabilities: Sequence[float], model_versions: Sequence[str] = ()
+) -> Dict[str, Any]:
+    """
+    Reference sketches of training `records` and the model's probabilities
+    on them, for the served model `model_versions`.
+    """
+    reference = {}
+    for name, values in monitored_values(records, probabilities).items():
+        edges = bin_edges(values)
+        counts = bin_counts(values, edges)
+        reference[name] = {
+            "edges": edges.tolist(),
+            "shares": (counts / max(counts.sum(), 1)).tolist(),
+        }
+    return {
+        "rows": len(probabilities),
+        "model_versions": list(model_versions),
+        "features": reference,
+    }
+
+
+def matches(reference: Optional[Dict[str, Any]], model_version: Optional[str]) -> bool:
+    """Whether `reference` was saved for model `model_version` (any, if it names none)."""
+    if reference is None:
+        return False
+    versions = reference.get("model_versions") or []
+    return not versions or model_version in versions
+
+
+def save_reference(reference: Dict[str, Any], path: str):
+    # written aside then renamed, like the model files
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(reference, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def load_reference(path: str) -> Dict[str, Any]:
+    with open(path) as f:
+        return json.load(f)
+
+
+class DriftMonitor:
+    """
+    Histograms of the scored traffic in the reference bins, updated from a
+    background thread. `observe` never blocks: rows beyond `max_queued_rows`
+    waiting for the thread are dropped and counted in `dropped`.
+    """
+
+    def __init__(
+        self,
+        reference: Optional[Dict[str, Any]] = None,
+        window_size: int = 5000,
+        max_queued_rows: int = 20000,
+        psi_threshold: float = 0.25,
+    ):
+        if window_size < 1:
+            raise ValueError("window_size must be at least 1")
+        self.window_size = window_size
+        self.psi_threshold = psi_threshold
+        self.max_queued_rows = max_queued_rows
+        # bounded by `_queued_rows`, not by its number of batches
+        self._queue: "queue.Queue" = queue.Queue()
+        self._queued_rows = 0
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {"observed": 0, "dropped": 0, "failed": 0}
+        self.set_reference(reference)
+
+    def set_reference(self, reference: Optional[Dict[str, Any]]):
+        """Compares against `reference` from now on; the live counts start over."""
+        features = (reference or {}).get("features", {})
+        with self._lock:
+            self.reference = reference
+            self._edges = {name: np.asarray(f["edges"]) for name, f in features.items()}
+            self._shares = {name: np.asarray(f["shares"]) for name, f in features.items()}
+            self._current = {
+                name: np.zeros(len(e) + 1, np.int64) for name, e in self._edges.items()
+            }
+            self._previous = {name: np.zeros_like(c) for name, c in self._current.items()}
+            self._current_rows = 0
+            self._previous_rows = 0
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="drift-monitor", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def observe(self, records, probabilities: Sequence[float]) -> bool:
+        """
+        Queues a scored batch (request dicts, or columns) and its probabilities.
+        Only the rows that fit in the queue are kept; False if none did.
+        """
+        rows = len(probabilities)
+        with self._lock:
+            kept = min(rows, max(self.max_queued_rows - self._queued_rows, 0))
+            self._queued_rows += kept
+            self.counters["dropped"] += rows - kept
+        if not kept:
+            return False
+        if kept < rows:
+            records, probabilities = _head(records, kept), probabilities[:kept]
+        self._queue.put_nowait((records, probabilities))
+        return True
+
+    def update(self, records, probabilities: Sequence[float]):
+        """Adds a scored batch to the current window, in the calling thread."""
+        edges_by_name = self._edges
+        if not edges_by_name:
+            return
+        values = monitored_values(records, probabilities)
+        counts = {
+            name: bin_counts(values[name], edges)
+            for name, edges in edges_by_name.items()
+            if name in values
+        }
+        with self._lock:
+            if self._edges is not edges_by_name:
+                # binned for a reference replaced meanwhile
+                return
+            for name, c in counts.items():
+                self._current[name] += c
+            self._current_rows += len(probabilities)
+            self.counters["observed"] += len(probabilities)
+            if self._current_rows >= self.window_size:
+                self._previous, self._previous_rows = self._current, self._current_rows
+                self._current = {name: np.zeros_like(c) for name, c in self._previous.items()}
+                self._current_rows = 0
+
+    def report(self) -> Dict[str, Any]:
+        """PSI of every monitored value over the last window or two."""
+        with self._lock:
+            rows = self._current_rows + self._previous_rows
+            features = {}
+            for name, shares in self._shares.items():
+                counts = self._current[name] + self._previous[name]
+                score = psi(shares, counts)
+                features[name] = {
+                    "psi": score,
+                    "drifted": score is not None and score > self.psi_threshold,
+                    "reference_shares": shares.tolist(),
+                    "live_shares": (counts / rows).tolist() if rows else None,
+                }
+        drifted = sorted(name for name, f in features.items() if f["drifted"])
+        return {
+            "has_reference": self.reference is not None,
+            "reference_rows": (self.reference or {}).get("rows"),
+            "reference_model_versions": (self.reference or {}).get("model_versions"),
+            "window_rows": rows,
+            "psi_threshold": self.psi_threshold,
+            "drifted": drifted,
+            "features": features,
+        }
+
+    def scores(self) -> Dict[str, float]:
+        """Feature name -> PSI, for the features with live counts."""
+        return {
+            name: f["psi"] for name, f in self.report()["features"].items() if f["psi"] is not None
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "pending": self._queued_rows,
+                "window_rows": self._current_rows + self._previous_rows,
+            }
+
+    def _drain(self, first) -> List[Any]:
+        batch = [first]
+        while len(batch) < 256:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                first = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            batch = self._drain(first)
+            # request dicts of several calls are featurized together
+            records = [r for item in batch if not isinstance(item[0], Mapping) for r in item[0]]
+            probabilities = [
+                p for item in batch if not isinstance(item[0], Mapping) for p in item[1]
+            ]
+            columnar = [item for item in batch if isinstance(item[0], Mapping)]
+            try:
+                if records:
+                    self.update(records, probabilities)
+                for columns, column_probabilities in columnar:
+                    self.update(columns, column_probabilities)
+            except Exception:
+                logger.exception("Failed to update the drift sketches")
+                with self._lock:
+                    self.counters["failed"] += 1
+            finally:
+                with self._lock:
+                    self._queued_rows -= sum(len(item[1]) for item in batch)
+
+
+def _head(records, n: int):
+    """The first `n` rows of request dicts or of columns."""
+    if isinstance(records, Mapping):
+        return {name: values[:n] for name, values in records.items()}
+    return records[:n]
+
+
+def reference_path(model_path: str) -> str:
+    """Where `train.py` saves the drift reference of the model at `model_path`."""
+    return os.path.splitext(model_path)[0] + ".drift.json"
@@ -0,0 +1,250 @@
+# executor.py
+import asyncio
+import math
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+from .model_loader import MODEL_PATH, load_model, score_records
+
+
+class InferenceUnavailableError(RuntimeError):
+    """Scoring could not be handed to a worker process (maps to HTTP 503)."""
+
+
+class ExecutorOverloadedError(InferenceUnavailableError):
+    """Too many scoring calls are already waiting for a worker."""
+
+
+class WorkerCrashedError(InferenceUnavailableError):
+    """A worker process died while this call was pending; the pool was restarted."""
+
+
+# state of a worker process, set once by `_init_worker`
+_worker_model = None
+
+
+def _init_worker(bundle_path, model_path, fast_path, mmap_mode):
+    global _worker_model
+    pipeline, scorer, _ = load_model(bundle_path, model_path, fast_path, mmap_mode)
+    if pipeline is None and scorer is None:
+        raise RuntimeError("Model is not available in the inference worker.")
+    _worker_model = (pipeline, scorer)
+
+
+def _score_in_worker(records):
+    pipeline, scorer = _worker_model
+    return score_records(pipeline, scorer, records)
+
+
+def _ping():
+    return _worker_model is not None
+
+
+class InferenceExecutor:
+    """
+    Scores requests in a pool of worker processes, so CPU-bound scoring runs
+    on every core instead of contending for the GIL of the API process.
+
+    Each worker loads the model once, when it starts. At most `max_pending`
+    calls may be waiting or running at a time; further calls are rejected
+    with `ExecutorOverloadedError` instead of queueing without bound. When a
+    worker dies, the calls it had pending fail with `WorkerCrashedError`
+    and the pool is replaced so later calls are served again.
+
+    Workers are started with `spawn` by default: forking a process that
+    already runs threads (the API thread pool, the log writer) can deadlock.
+    """
+
+    def __init__(
+        self,
+        max_workers: int,
+        max_pending: int = 256,
+        bundle_path: Optional[str] = None,
+        model_path: str = MODEL_PATH,
+        fast_path: bool = True,
+        mmap_mode: Optional[str] = None,
+        min_chunk_size: int = 64,
+        start_method: str = "spawn",
+        model_version: Optional[str] = None,
+    ):
+        if max_workers < 1:
+            raise ValueError("max_workers must be at least 1")
+        if max_pending < 1:
+            raise ValueError("max_pending must be at least 1")
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.min_chunk_size = max(1, min_chunk_size)
+        self._initargs = (bundle_path, model_path, fast_path, mmap_mode)
+        # version of the artifact the current workers loaded
+        self.model_version = model_version
+        self._context = multiprocessing.get_context(start_method)
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self.calls_submitted = 0
+        self.calls_rejected = 0
+        self.pool_restarts = 0
+        self.reloads = 0
+
+    def _new_pool(self, initargs=None) -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=self._context,
+            initializer=_init_worker,
+            initargs=initargs or self._initargs,
+        )
+
+    def _wait_ready(self, pool: ProcessPoolExecutor):
+        for future in [pool.submit(_ping) for _ in range(self.max_workers)]:
+            future.result()
+
+    def start(self):
+        """Starts the workers and waits until each has loaded the model."""
+        with self._lock:
+            if self._pool is None:
+                self._pool = self._new_pool()
+            pool = self._pool
+        self._wait_ready(pool)
+
+    def reload(self, bundle_path: Optional[str], model_path: str, model_version: Optional[str]):
+        """
+        Starts a pool on another artifact and swaps it in once every worker
+        has loaded it. Calls already submitted finish on the old workers,
+        which are shut down afterwards; new calls go to the new ones.
+        """
+        with self._lock:
+            initargs = (bundle_path, model_path) + self._initargs[2:]
+            running = self._pool is not None
+        if not running:
+            with self._lock:
+                self._initargs, self.model_version = initargs, model_version
+            return
+        pool = self._new_pool(initargs)
+        try:
+            self._wait_ready(pool)
+        except BaseException:
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        with self._lock:
+            old_pool, self._pool = self._pool, pool
+            self._initargs, self.model_version = initargs, model_version
+            self.reloads += 1
+        if old_pool is not None:
+            old_pool.shutdown(wait=True)
+
+    def stop(self):
+        """Waits for the pending calls, then shuts the workers down."""
+        with self._lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+    def _restart(self, broken_pool: ProcessPoolExecutor):
+        with self._lock:
+            # several callers may see the same broken pool; replace it once
+            if self._pool is not broken_pool:
+                return
+            self._pool = self._new_pool()
+            self.pool_restarts += 1
+        broken_pool.shutdown(wait=False, cancel_futures=True)
+
+    def _release(self, future: Future):
+        with self._lock:
+            self._pending -= 1
+
+    def _chunks(self, records: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Splits a batch so that every worker gets a share of it."""
+        size = max(self.min_chunk_size, math.ceil(len(records) / self.max_workers))
+        return [records[i : i + size] for i in range(0, len(records), size)] or [[]]
+
+    def _submit(self, chunks: List[List[Dict[str, Any]]]):
+        with self._lock:
+            if self._pool is None:
+                raise InferenceUnavailableError("Inference executor is not running.")
+            if self._pending + len(chunks) > self.max_pending:
+                self.calls_rejected += 1
+                raise ExecutorOverloadedError(
+                    f"Inference queue is full ({self.max_pending} calls pending)."
+                )
+            self._pending += len(chunks)
+            self.calls_submitted += 1
+            pool, version = self._pool, self.model_version
+        futures = []
+        try:
+            for chunk in chunks:
+                future = pool.submit(_score_in_worker, chunk)
+                future.add_done_callback(self._release)
+                futures.append(future)
+        except BrokenProcessPool:
+            with self._lock:
+                self._pending -= len(chunks) - len(futures)
+            for future in futures:
+                future.cancel()
+            self._restart(pool)
+            raise WorkerCrashedError("An inference worker died; retry the request.")
+        except RuntimeError:
+            # the pool was shut down by a reload after it was picked; use the new one
+            with self._lock:
+                self._pending -= len(chunks) - len(futures)
+                replaced = self._pool is not pool
+            for future in futures:
+                future.cancel()
+            if not replaced:
+                raise
+            return self._submit(chunks)
+        return pool, futures, version
+
+    def _merge(self, pool, results):
+        predictions, probabilities = [], []
+        for result in results:
+            if isinstance(result, BrokenProcessPool):
+                self._restart(pool)
+                raise WorkerCrashedError("An inference worker died; retry the request.")
+            if isinstance(result, BaseException):
+                raise result
+            predictions.extend(result[0])
+            probabilities.extend(result[1])
+        return predictions, probabilities
+
+    def score_versioned(self, records: List[Dict[str, Any]]):
+        """(predictions, probabilities, model version) of `records`, spread over the workers."""
+        pool, futures, version = self._submit(self._chunks(records))
+        results = []
+        for future in futures:
+            try:
+                results.append(future.result())
+            except BaseException as e:
+                results.append(e)
+        return (*self._merge(pool, results), version)
+
+    async def score_versioned_async(self, records: List[Dict[str, Any]]):
+        """Same as `score_versioned`, awaited from the event loop without blocking it."""
+        pool, futures, version = self._submit(self._chunks(records))
+        results = await asyncio.gather(
+            *(asyncio.wrap_future(f) for f in futures), return_exceptions=True
+        )
+        return (*self._merge(pool, results), version)
+
+    def score(self, records: List[Dict[str, Any]]):
+        """(predictions, probabilities) of `records`, spread over the workers."""
+        return self.score_versioned(records)[:2]
+
+    async def score_async(self, records: List[Dict[str, Any]]):
+        """Same as `score`, awaited from the event loop without blocking it."""
+        return (await self.score_versioned_async(records))[:2]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "calls_submitted": self.calls_submitted,
+                "calls_rejected": self.calls_rejected,
+                "pool_restarts": self.pool_restarts,
+                "reloads": self.reloads,
+                "model_version": self.model_version,
+            }
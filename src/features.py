@@ -0,0 +1,116 @@
+# features.py
+"""
+Plain Python/NumPy versions of the feature engineering stages.
+
+`pipeline.py` applies these features to DataFrames during training; the
+functions here compute the same columns straight from request dicts so the
+serving fast path does not need pandas. Any change to a stage in
+`pipeline.py` has to be mirrored here (tests/test_inference.py checks parity).
+"""
+from typing import Any, Dict, Mapping, Optional, Sequence
+
+import numpy as np
+
+from .lexicons import TermMatcher, get_term_matcher
+
+# Raw columns read by the feature stages. Everything else in the input
+# (leakage columns such as `giver_username_if_known`, the `_at_retrieval`
+# columns, `request_text`, `request_id`, ...) is projected away by stage 1.
+NUMERIC_INPUT_COLUMNS = [
+    "requester_account_age_in_days_at_request",
+    "requester_days_since_first_post_on_raop_at_request",
+    "requester_number_of_comments_at_request",
+    "requester_number_of_comments_in_raop_at_request",
+    "requester_number_of_posts_at_request",
+    "requester_number_of_posts_on_raop_at_request",
+    "requester_number_of_subreddits_at_request",
+    "requester_upvotes_minus_downvotes_at_request",
+    "requester_upvotes_plus_downvotes_at_request",
+]
+RAW_INPUT_COLUMNS = NUMERIC_INPUT_COLUMNS + [
+    "request_title",
+    "request_text_edit_aware",
+    "requester_username",
+    "unix_timestamp_of_request_utc",
+]
+
+_NS_PER_SECOND = 10**9
+_NS_PER_HOUR = 3600 * _NS_PER_SECOND
+_NS_PER_DAY = 24 * _NS_PER_HOUR
+
+
+def time_features(timestamps):
+    """
+    Hour of day and day of week (Monday=0) of UTC unix timestamps.
+
+    Converts to nanoseconds the way `pd.to_datetime(..., unit="s")` does
+    (whole seconds plus the fraction rounded to 9 decimals), so boundary
+    cases land in the same hour as in the pipeline.
+    """
+    seconds = np.asarray(timestamps, dtype=np.float64)
+    base = seconds.astype(np.int64)
+    frac = np.round(seconds - base, 9)
+    ns = base * _NS_PER_SECOND + (frac * _NS_PER_SECOND).astype(np.int64)
+    hour = (ns // _NS_PER_HOUR) % 24
+    # 1970-01-01 was a Thursday (dayofweek 3)
+    day = (ns // _NS_PER_DAY + 3) % 7
+    return hour, day
+
+
+def _text(value) -> str:
+    return value if isinstance(value, str) else ""
+
+
+def engineer_features(
+    records: Sequence[Mapping[str, Any]], matcher: Optional[TermMatcher] = None
+) -> Dict[str, Any]:
+    """
+    Computes every column the final `ColumnTransformer` can select, as
+    NumPy arrays (or a list of strings for `full_request_text`). Terms are
+    counted with `matcher`, by default the shared one from `lexicons.py`.
+    """
+    raw = {name: [r[name] for r in records] for name in NUMERIC_INPUT_COLUMNS}
+    raw["unix_timestamp_of_request_utc"] = [r["unix_timestamp_of_request_utc"] for r in records]
+    for name in ("request_title", "request_text_edit_aware", "requester_username"):
+        raw[name] = [r.get(name) for r in records]
+    return engineer_column_features(raw, matcher)
+
+
+def engineer_column_features(
+    raw: Mapping[str, Sequence[Any]], matcher: Optional[TermMatcher] = None
+) -> Dict[str, Any]:
+    """`engineer_features` of requests given column-wise, one sequence per raw column."""
+    columns: Dict[str, Any] = {}
+    for name in NUMERIC_INPUT_COLUMNS:
+        columns[name] = np.asarray(raw[name], dtype=np.float64)
+
+    # stage 2: time features
+    hour, day = time_features(raw["unix_timestamp_of_request_utc"])
+    columns["hour_of_request"] = hour
+    columns["day_of_week"] = day
+
+    # stage 3: engineered features
+    texts = [_text(t) for t in raw["request_text_edit_aware"]]
+    columns["request_length"] = np.array([len(t) for t in texts], dtype=np.float64)
+    columns["raop_post_ratio"] = columns[
+        "requester_number_of_posts_on_raop_at_request"
+    ] / (columns["requester_number_of_posts_at_request"] + 1e-6)
+    full_texts = [
+        _text(title) + " " + text + " " + _text(username)
+        for title, text, username in zip(
+            raw["request_title"], texts, raw["requester_username"]
+        )
+    ]
+    columns["full_request_text"] = full_texts
+
+    # stage 4: politeness features
+    matcher = matcher or get_term_matcher()
+    counts = matcher.count_many(full_texts).astype(np.float64)
+    for i, category in enumerate(matcher.categories):
+        columns[f"{category}_terms_count"] = counts[:, i]
+    columns["politeness_score"] = (
+        columns["polite_terms_count"]
+        + columns["humility_terms_count"]
+        + columns["reciprocity_terms_count"]
+    )
+    return columns
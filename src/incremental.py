@@ -0,0 +1,237 @@
+# incremental.py
+"""
+Incremental updates of a Naive Bayes model from newly labeled requests.
+
+    python -m src.incremental --data data/dataset.json   # bootstrap from a labeled file
+    python -m src.incremental                            # consume new outcomes from the database
+
+Labels are the rows of `prediction_outcomes` (recorded with `POST /outcomes`)
+joined onto the logged request with the same request_id. They are read in
+mini-batches of `--batch-size`, after the last outcome id already consumed,
+and each batch updates the model with `SparseGaussianNB.partial_fit`. An
+update therefore costs time proportional to the new rows only, not to
+everything seen so far.
+
+The features come from `build_hashing_pipeline`: hashed text and fixed
+one-hot categories need no vocabulary, and the numeric scaler is fitted on
+the first batch and then frozen, so earlier updates stay valid as new
+batches arrive.
+
+The model is always read from and written back to `INCREMENTAL_MODEL_PATH`
+(`--model`), with the consumed outcome id and the content hashes of the
+files bootstrapped from stored in it, in one atomic write; a failed run is
+simply rerun, and a file already learned from is refused. Any other artifact there is refused,
+so a served TF-IDF pipeline is never updated by mistake.
+
+The API serves the model as a joblib pipeline, and there is no NumPy bundle
+for hashed text. `--publish-to models/pizza_request_model.joblib` copies it
+over the served artifact. The bundle next to that path would be served
+first, so it is moved aside to `<bundle>.replaced`.
+"""
+import argparse
+import os
+import shutil
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.pipeline import Pipeline
+from sqlalchemy import select
+
+from .model_loader import artifact_version
+from .models import PredictionLog, PredictionOutcome
+from .naive_bayes import SparseGaussianNB
+from .pipeline import build_hashing_pipeline
+from .score import read_chunks
+from .train import save_model
+
+INCREMENTAL_MODEL_PATH = os.path.join("models", "pizza_request_model_incremental.joblib")
+HASHING_N_FEATURES = 2**12
+LABEL = "requester_received_pizza"
+# same classes_ as the model trained by train.py
+CLASSES = np.array([False, True])
+
+Batch = Tuple[List[Dict[str, Any]], List[bool]]
+
+
+def initial_state() -> Dict[str, Any]:
+    return {
+        "last_outcome_id": 0,
+        "rows_seen": 0,
+        "unmatched_outcomes": 0,
+        # content hashes of the --data files already learned from
+        "bootstrapped_files": [],
+    }
+
+
+def load_incremental_model(path: str = INCREMENTAL_MODEL_PATH):
+    """(pipeline, state) of a published incremental model, (None, fresh state) if none."""
+    if not os.path.exists(path):
+        return None, initial_state()
+    pipeline = joblib.load(path)
+    if not hasattr(pipeline, "incremental_state_"):
+        raise ValueError(
+            f"{path} is not an incremental model; refusing to update it. "
+            "Use --publish-to to deploy the incremental model over another artifact."
+        )
+    return pipeline, dict(pipeline.incremental_state_)
+
+
+def partial_fit(
+    pipeline: Optional[Pipeline],
+    rows: List[Dict[str, Any]],
+    labels: List[bool],
+    n_text_features: int = HASHING_N_FEATURES,
+) -> Pipeline:
+    """Updates `pipeline` with one mini-batch; the first batch also creates it."""
+    X = pd.DataFrame(rows)
+    if pipeline is None:
+        pipeline = Pipeline(
+            steps=[
+                ("preprocessor", build_hashing_pipeline(n_text_features).fit(X)),
+                ("classifier", SparseGaussianNB()),
+            ]
+        )
+    features = pipeline.named_steps["preprocessor"].transform(X)
+    pipeline.named_steps["classifier"].partial_fit(
+        features, np.asarray(labels, dtype=bool), classes=CLASSES
+    )
+    return pipeline
+
+
+def iter_file_batches(path: str, batch_size: int) -> Iterator[Batch]:
+    """Mini-batches of a labeled dataset file (the format of data/dataset.json)."""
+    for chunk in read_chunks(path, batch_size):
+        yield chunk, [bool(row.pop(LABEL)) for row in chunk]
+
+
+def iter_outcome_batches(
+    session, after_id: int, batch_size: int
+) -> Iterator[Tuple[int, Batch, int]]:
+    """
+    (last outcome id, batch, unmatched outcomes) for the outcomes recorded
+    after `after_id`. Outcomes whose request was never logged are skipped.
+    """
+    while True:
+        outcomes = session.execute(
+            select(
+                PredictionOutcome.id,
+                PredictionOutcome.request_id,
+                PredictionOutcome.requester_received_pizza,
+            )
+            .where(PredictionOutcome.id > after_id)
+            .order_by(PredictionOutcome.id)
+            .limit(batch_size)
+        ).all()
+        if not outcomes:
+            return
+        after_id = outcomes[-1].id
+        logged = dict(
+            session.execute(
+                select(PredictionLog.request_id, PredictionLog.raw_request)
+                .where(PredictionLog.request_id.in_({o.request_id for o in outcomes}))
+                .order_by(PredictionLog.id)
+            ).all()
+        )
+        rows, labels = [], []
+        for outcome in outcomes:
+            if outcome.request_id in logged:
+                rows.append(logged[outcome.request_id])
+                labels.append(outcome.requester_received_pizza)
+        yield after_id, (rows, labels), len(outcomes) - len(rows)
+
+
+def update(
+    pipeline: Optional[Pipeline],
+    state: Dict[str, int],
+    batches,
+    n_text_features: int = HASHING_N_FEATURES,
+):
+    """
+    Applies `batches` (as yielded by `iter_outcome_batches`) to the model;
+    returns the updated (pipeline, state).
+    """
+    state = dict(state)
+    for last_outcome_id, (rows, labels), unmatched in batches:
+        if rows:
+            pipeline = partial_fit(pipeline, rows, labels, n_text_features)
+        state["last_outcome_id"] = last_outcome_id
+        state["rows_seen"] += len(rows)
+        state["unmatched_outcomes"] += unmatched
+        print(f"Consumed outcomes up to id {last_outcome_id}: {state['rows_seen']} rows seen.")
+    return pipeline, state
+
+
+def publish(pipeline: Pipeline, state: Dict[str, Any], path: str = INCREMENTAL_MODEL_PATH):
+    pipeline.incremental_state_ = state
+    save_model(pipeline, path, f"{os.path.splitext(path)[0]}.npz")
+
+
+def publish_to(source: str, target: str):
+    """
+    Copies the incremental model at `source` over the served artifact
+    `target`, then moves the bundle of `target` aside so the API loads the
+    joblib file. The joblib file is replaced first: until the bundle is
+    gone the API keeps serving it, never a half-published state.
+    """
+    tmp_path = f"{target}.tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    bundle_path = f"{os.path.splitext(target)[0]}.npz"
+    if os.path.exists(bundle_path):
+        os.replace(bundle_path, f"{bundle_path}.replaced")
+        print(f"Moved {bundle_path} aside to {bundle_path}.replaced.")
+    print(f"Incremental model published to {target}.")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--data", help="labeled dataset file to learn from instead of the database")
+    parser.add_argument(
+        "--model", default=INCREMENTAL_MODEL_PATH, help="incremental model and state to update"
+    )
+    parser.add_argument("--publish-to", help="also copy the model over this served artifact")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument(
+        "--n-features", type=int, default=HASHING_N_FEATURES,
+        help="hashed text features, when the model is created",
+    )
+    args = parser.parse_args(argv)
+    if args.publish_to and os.path.abspath(args.publish_to) == os.path.abspath(args.model):
+        parser.error("--publish-to must differ from --model")
+
+    try:
+        pipeline, previous_state = load_incremental_model(args.model)
+    except ValueError as e:
+        parser.error(str(e))
+    state = previous_state
+    if args.data:
+        data_version = artifact_version(args.data)
+        bootstrapped = previous_state.get("bootstrapped_files", [])
+        if data_version in bootstrapped:
+            parser.error(f"{args.data} was already learned from (content {data_version})")
+        batches = (
+            (state["last_outcome_id"], batch, 0)
+            for batch in iter_file_batches(args.data, args.batch_size)
+        )
+        pipeline, state = update(pipeline, state, batches, args.n_features)
+        # saved with the model below, in the same write
+        state["bootstrapped_files"] = bootstrapped + [data_version]
+    else:
+        from .database import SessionLocal
+
+        with SessionLocal() as session:
+            batches = iter_outcome_batches(session, state["last_outcome_id"], args.batch_size)
+            pipeline, state = update(pipeline, state, batches, args.n_features)
+
+    if pipeline is None or state["rows_seen"] == previous_state["rows_seen"]:
+        print("No new labeled rows; nothing updated.")
+    else:
+        publish(pipeline, state, args.model)
+    if args.publish_to and os.path.exists(args.model):
+        publish_to(args.model, args.publish_to)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,450 @@
+# inference.py
+"""
+Fast scoring path for the fitted production pipeline.
+
+`FastScorer` pulls the fitted parameters out of the sklearn pipeline built
+in `train.py` (scaler mean/scale, one-hot categories, TF-IDF vocabulary and
+idf, Gaussian NB statistics) and scores request dicts with NumPy only: no
+DataFrame is built, the frame is not copied between stages, and label and
+probability come out of one pass instead of separate `predict` and
+`predict_proba` calls.
+
+`save` writes those parameters to a compact `.npz` bundle and `load` reads
+it back, so the API can serve without importing sklearn, pandas or joblib:
+
+    python -m src.inference models/pizza_request_model.joblib models/pizza_request_model.npz
+"""
+import json
+import os
+import re
+import struct
+import sys
+import time
+import zipfile
+from collections import Counter
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .features import engineer_column_features, engineer_features
+from .lexicons import TermMatcher, get_term_matcher
+
+BUNDLE_FORMAT = "pizza-fast-scorer"
+BUNDLE_VERSION = 1
+
+# Stages of `FastScorer.score`, reported to its `observe` callback with their
+# duration: the engineered feature columns, their scaled / one-hot / TF-IDF
+# encoding, and the Naive Bayes likelihoods.
+FAST_STAGES = ("fast_features", "fast_transform", "fast_likelihood")
+
+# FunctionTransformer stages the fast path knows how to reproduce.
+SUPPORTED_STAGES = (
+    "drop_leakage_and_redundant_cols",
+    "create_time_features",
+    "create_engineered_features",
+    "create_politeness_features",
+)
+
+
+# observe(stage, seconds)
+StageObserver = Callable[[str, float], None]
+
+
+def _timed(observe: Optional[StageObserver], stage: str, fn, *args):
+    """fn(*args), its duration reported to `observe` as `stage`."""
+    if observe is None:
+        return fn(*args)
+    start = time.perf_counter()
+    result = fn(*args)
+    observe(stage, time.perf_counter() - start)
+    return result
+
+
+class UnsupportedPipelineError(ValueError):
+    """The fitted pipeline has a shape the fast path cannot reproduce."""
+
+
+def n_records(records) -> int:
+    """
+    Number of requests in `records`: a sequence of request dicts, or a
+    mapping of column name to values (the columnar request formats).
+    """
+    if isinstance(records, Mapping):
+        return len(next(iter(records.values()), ()))
+    return len(records)
+
+
+def _read_bundle(path: str, mmap_mode: Optional[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Arrays of an `.npz` bundle. With `mmap_mode` every non-empty member is
+    memory-mapped straight from the (uncompressed) archive instead of read
+    into memory, so all processes serving the same file share its pages.
+    """
+    if mmap_mode is None:
+        with np.load(path, allow_pickle=False) as bundle:
+            return {name: bundle[name] for name in bundle.files}
+
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed and cannot be memory-mapped.")
+            # local file header: 30 fixed bytes, then the file name and extra field
+            f.seek(info.header_offset)
+            header = f.read(30)
+            if header[:4] != b"PK\x03\x04":
+                raise ValueError(f"{path} is not a valid .npz archive.")
+            name_length, extra_length = struct.unpack("<HH", header[26:30])
+            start = info.header_offset + 30 + name_length + extra_length
+            f.seek(start)
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+            if dtype.hasobject:
+                raise ValueError(f"{path} contains pickled objects.")
+            name = info.filename[: -len(".npy")]
+            if len(shape) == 0 or 0 in shape:
+                # np.memmap cannot map empty or 0-d arrays; these are tiny anyway
+                f.seek(start)
+                arrays[name] = np.lib.format.read_array(f, allow_pickle=False)
+                continue
+            arrays[name] = np.memmap(
+                path,
+                dtype=dtype,
+                mode=mmap_mode,
+                shape=shape,
+                order="F" if fortran_order else "C",
+                offset=f.tell(),
+            )
+    return arrays
+
+
+def _check_tfidf(vectorizer):
+    params = vectorizer.get_params()
+    expected = {
+        "analyzer": "word",
+        "binary": False,
+        "lowercase": True,
+        "ngram_range": (1, 1),
+        "norm": "l2",
+        "preprocessor": None,
+        "strip_accents": None,
+        "sublinear_tf": False,
+        "tokenizer": None,
+        "use_idf": True,
+    }
+    for name, value in expected.items():
+        if params.get(name) != value:
+            raise UnsupportedPipelineError(
+                f"TfidfVectorizer with {name}={params.get(name)!r} is not supported."
+            )
+
+
+class FastScorer:
+    def __init__(
+        self,
+        numeric_columns: List[str],
+        scaler_mean: np.ndarray,
+        scaler_scale: np.ndarray,
+        categorical_columns: List[str],
+        categories: List[np.ndarray],
+        text_column: str,
+        token_pattern: str,
+        vocabulary: Dict[str, int],
+        idf: np.ndarray,
+        classes: np.ndarray,
+        class_prior: np.ndarray,
+        theta: np.ndarray,
+        var: np.ndarray,
+        lexicons: Optional[Mapping[str, Sequence[str]]] = None,
+    ):
+        # the lexicons the model was trained with travel with the scorer
+        self.matcher = TermMatcher(lexicons) if lexicons else get_term_matcher()
+        self.numeric_columns = list(numeric_columns)
+        self.scaler_mean = np.asarray(scaler_mean, dtype=np.float64)
+        self.scaler_scale = np.asarray(scaler_scale, dtype=np.float64)
+        self.categorical_columns = list(categorical_columns)
+        self.categories = [np.asarray(c) for c in categories]
+        self.text_column = text_column
+        self.token_pattern = token_pattern
+        self._token_re = re.compile(token_pattern)
+        self.vocabulary = dict(vocabulary)
+        self.idf = np.asarray(idf, dtype=np.float64)
+        self.classes = np.asarray(classes)
+        self.class_prior = np.asarray(class_prior, dtype=np.float64)
+        self.theta = np.asarray(theta, dtype=np.float64)
+        self.var = np.asarray(var, dtype=np.float64)
+
+        # column offsets, in ColumnTransformer output order: num, cat, text
+        self._category_index = [
+            {value.item(): i for i, value in enumerate(c)} for c in self.categories
+        ]
+        self._n_categorical = sum(len(c) for c in self.categories)
+        self.n_features = (
+            len(self.numeric_columns) + self._n_categorical + len(self.idf)
+        )
+        if self.theta.shape[1] != self.n_features:
+            raise UnsupportedPipelineError(
+                f"Classifier expects {self.theta.shape[1]} features, "
+                f"preprocessor produces {self.n_features}."
+            )
+        # Gaussian NB log-likelihood of an all-zero feature row; scoring only
+        # corrects it for the nonzero entries (see naive_bayes.SparseGaussianNB)
+        self._inv_var = 1.0 / self.var
+        self._theta_inv_var = self.theta * self._inv_var
+        self._zero_row_jll = (
+            np.log(self.class_prior)
+            - 0.5 * np.sum(np.log(2.0 * np.pi * self.var), axis=1)
+            - 0.5 * np.sum(self.theta**2 * self._inv_var, axis=1)
+        )
+
+    @classmethod
+    def from_pipeline(cls, pipeline) -> "FastScorer":
+        """Builds a scorer from the fitted pipeline saved by `train.py`."""
+        try:
+            steps = dict(pipeline.steps)
+            preprocessor = steps["preprocessor"]
+            classifier = steps["classifier"]
+            stage_steps = preprocessor.steps[:-1]
+            column_transformer = preprocessor.steps[-1][1]
+            transformers = {
+                name: (transformer, columns)
+                for name, transformer, columns in column_transformer.transformers_
+            }
+            scaler, numeric_columns = transformers["num"]
+            encoder, categorical_columns = transformers["cat"]
+            vectorizer, text_column = transformers["text"]
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            raise UnsupportedPipelineError(f"Unexpected pipeline layout: {e}") from e
+
+        stage_names = tuple(
+            getattr(getattr(step, "func", None), "__name__", None)
+            for _, step in stage_steps
+        )
+        if stage_names != SUPPORTED_STAGES:
+            raise UnsupportedPipelineError(f"Unsupported feature stages: {stage_names}")
+        if type(classifier).__name__ not in ("GaussianNB", "SparseGaussianNB"):
+            raise UnsupportedPipelineError(
+                f"Unsupported classifier: {type(classifier).__name__}"
+            )
+        if encoder.drop is not None or encoder.handle_unknown != "ignore":
+            raise UnsupportedPipelineError("Unsupported OneHotEncoder settings.")
+        _check_tfidf(vectorizer)
+
+        n_numeric = len(numeric_columns)
+        return cls(
+            numeric_columns=numeric_columns,
+            scaler_mean=(
+                scaler.mean_ if scaler.with_mean else np.zeros(n_numeric)
+            ),
+            scaler_scale=(
+                scaler.scale_ if scaler.with_std else np.ones(n_numeric)
+            ),
+            categorical_columns=categorical_columns,
+            categories=encoder.categories_,
+            text_column=text_column,
+            token_pattern=vectorizer.token_pattern,
+            vocabulary=vectorizer.vocabulary_,
+            idf=vectorizer.idf_,
+            classes=classifier.classes_,
+            class_prior=classifier.class_prior_,
+            theta=classifier.theta_,
+            var=classifier.var_,
+            lexicons=get_term_matcher().lexicons,
+        )
+
+    def save(self, path: str):
+        """
+        Writes the scorer as an uncompressed `.npz` bundle (no pickles). The
+        file is replaced atomically, so servers that memory-mapped the
+        previous bundle keep reading consistent data.
+        """
+        metadata = {
+            "format": BUNDLE_FORMAT,
+            "version": BUNDLE_VERSION,
+            "numeric_columns": self.numeric_columns,
+            "categorical_columns": self.categorical_columns,
+            "text_column": self.text_column,
+            "token_pattern": self.token_pattern,
+            "lexicons": self.matcher.lexicons,
+        }
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        arrays = {f"categories_{i}": c for i, c in enumerate(self.categories)}
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(
+                f,
+                metadata=np.array(json.dumps(metadata)),
+                scaler_mean=self.scaler_mean,
+                scaler_scale=self.scaler_scale,
+                vocabulary=np.array(terms, dtype=str),
+                idf=self.idf,
+                classes=self.classes,
+                class_prior=self.class_prior,
+                theta=self.theta,
+                var=self.var,
+                **arrays,
+            )
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str, mmap_mode: Optional[str] = None) -> "FastScorer":
+        """
+        Reads a bundle written by `save`. `mmap_mode="r"` maps the arrays
+        read-only instead of copying them (see `_read_bundle`).
+        """
+        bundle = _read_bundle(path, mmap_mode)
+        metadata = json.loads(bundle["metadata"].item())
+        if metadata.get("format") != BUNDLE_FORMAT:
+            raise ValueError(f"{path} is not a fast scorer bundle.")
+        if metadata.get("version") != BUNDLE_VERSION:
+            raise ValueError(
+                f"Unsupported bundle version {metadata.get('version')} in {path}."
+            )
+        n_categorical = len(metadata["categorical_columns"])
+        return cls(
+            numeric_columns=metadata["numeric_columns"],
+            scaler_mean=bundle["scaler_mean"],
+            scaler_scale=bundle["scaler_scale"],
+            categorical_columns=metadata["categorical_columns"],
+            categories=[bundle[f"categories_{i}"] for i in range(n_categorical)],
+            text_column=metadata["text_column"],
+            token_pattern=metadata["token_pattern"],
+            vocabulary={str(term): i for i, term in enumerate(bundle["vocabulary"])},
+            idf=bundle["idf"],
+            classes=bundle["classes"],
+            class_prior=bundle["class_prior"],
+            theta=bundle["theta"],
+            var=bundle["var"],
+            lexicons=metadata["lexicons"],
+        )
+
+    def _tfidf_row(self, text: str):
+        """Sorted vocabulary indices and l2-normalised TF-IDF values of a text."""
+        # Stop words never make it into the fitted vocabulary, so filtering
+        # tokens against the vocabulary is enough.
+        counts = Counter(
+            self.vocabulary[token]
+            for token in self._token_re.findall(text.lower())
+            if token in self.vocabulary
+        )
+        indices = np.fromiter(sorted(counts), dtype=np.intp, count=len(counts))
+        values = np.array([counts[i] for i in indices], dtype=np.float64)
+        if len(values):
+            values *= self.idf[indices]
+            values /= np.sqrt(np.dot(values, values))
+        return indices, values
+
+    def _columns(self, records):
+        """Engineered feature columns of request dicts, or of validated columns."""
+        if isinstance(records, Mapping):
+            return engineer_column_features(records, self.matcher)
+        return engineer_features(records, self.matcher)
+
+    def _nonzeros(self, records: Sequence[Mapping[str, Any]], observe=None):
+        """
+        Preprocessor output in coordinate form: (rows, columns, values). Every
+        scaled numeric column is listed, plus the one-hot and TF-IDF entries.
+        """
+        columns = _timed(observe, "fast_features", self._columns, records)
+        return _timed(observe, "fast_transform", self._encode, columns, n_records(records))
+
+    def _encode(self, columns: Dict[str, Any], n_rows: int):
+        rows, cols, vals = [], [], []
+
+        n_numeric = len(self.numeric_columns)
+        numeric = np.column_stack([columns[c] for c in self.numeric_columns])
+        rows.append(np.repeat(np.arange(n_rows), n_numeric))
+        cols.append(np.tile(np.arange(n_numeric), n_rows))
+        vals.append(((numeric - self.scaler_mean) / self.scaler_scale).ravel())
+
+        offset = n_numeric
+        for column, index, categories in zip(
+            self.categorical_columns, self._category_index, self.categories
+        ):
+            positions = [index.get(value) for value in columns[column].tolist()]
+            # handle_unknown="ignore": unseen categories get no entry
+            hits = [(row, p) for row, p in enumerate(positions) if p is not None]
+            rows.append(np.array([row for row, _ in hits], dtype=np.intp))
+            cols.append(np.array([offset + p for _, p in hits], dtype=np.intp))
+            vals.append(np.ones(len(hits)))
+            offset += len(categories)
+
+        for row, text in enumerate(columns[self.text_column]):
+            indices, values = self._tfidf_row(text)
+            rows.append(np.full(len(indices), row, dtype=np.intp))
+            cols.append(offset + indices)
+            vals.append(values)
+
+        return (
+            np.concatenate(rows).astype(np.intp),
+            np.concatenate(cols).astype(np.intp),
+            np.concatenate(vals),
+        )
+
+    def transform(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        """Dense equivalent of the fitted preprocessor's output."""
+        rows, cols, vals = self._nonzeros(records)
+        X = np.zeros((n_records(records), self.n_features), dtype=np.float64)
+        X[rows, cols] = vals
+        return X
+
+    def features(self, records: Sequence[Mapping[str, Any]]):
+        """Sparse (CSR) equivalent of the fitted preprocessor's output."""
+        return self._csr(self._nonzeros(records), n_records(records))
+
+    def _csr(self, nonzeros, n_rows: int):
+        import scipy.sparse as sp
+
+        rows, cols, vals = nonzeros
+        return sp.csr_matrix((vals, (rows, cols)), shape=(n_rows, self.n_features))
+
+    def predict_proba(self, records: Sequence[Mapping[str, Any]]) -> np.ndarray:
+        return self._predict_proba(self._nonzeros(records), n_records(records))
+
+    def _predict_proba(self, nonzeros, n_rows: int) -> np.ndarray:
+        rows, cols, vals = nonzeros
+        jll = np.tile(self._zero_row_jll, (n_rows, 1))
+        for i in range(len(self.classes)):
+            correction = vals * (vals * self._inv_var[i, cols] - 2.0 * self._theta_inv_var[i, cols])
+            jll[:, i] -= 0.5 * np.bincount(rows, weights=correction, minlength=n_rows)
+        jll_max = jll.max(axis=1, keepdims=True)
+        log_prob_x = jll_max + np.log(np.sum(np.exp(jll - jll_max), axis=1, keepdims=True))
+        return np.exp(jll - log_prob_x)
+
+    def score(
+        self, records: Sequence[Mapping[str, Any]], observe: Optional[StageObserver] = None
+    ) -> Tuple[List[int], List[float]]:
+        """
+        Predicted labels and probabilities of success from one pass. With
+        `observe`, the time of each of the `FAST_STAGES` is reported to it.
+        """
+        n_rows = n_records(records)
+        nonzeros = self._nonzeros(records, observe)
+        proba = _timed(observe, "fast_likelihood", self._predict_proba, nonzeros, n_rows)
+        return self._labels(proba)
+
+    def score_with_features(
+        self, records: Sequence[Mapping[str, Any]], observe: Optional[StageObserver] = None
+    ):
+        """`score`, plus the feature matrix it was computed from (see `features`)."""
+        n_rows = n_records(records)
+        nonzeros = self._nonzeros(records, observe)
+        proba = _timed(observe, "fast_likelihood", self._predict_proba, nonzeros, n_rows)
+        return (*self._labels(proba), self._csr(nonzeros, n_rows))
+
+    def _labels(self, proba: np.ndarray) -> Tuple[List[int], List[float]]:
+        success_column = list(self.classes).index(True)
+        predictions = self.classes[proba.argmax(axis=1)]
+        return [int(p) for p in predictions], proba[:, success_column].tolist()
+
+
+if __name__ == "__main__":
+    # python -m src.inference <pipeline.joblib> <bundle.npz>
+    import joblib
+
+    pipeline_path, bundle_path = sys.argv[1:3]
+    FastScorer.from_pipeline(joblib.load(pipeline_path)).save(bundle_path)
+    print(f"Bundle written to {bundle_path}.")
@@ -0,0 +1,159 @@
+# lexicons.py
+"""
+Politeness, humility and reciprocity lexicons and the matcher that counts them.
+
+The built-in lists below are the ones the shipped model was trained with.
+Set `LEXICON_PATH` to a JSON file shaped like
+`{"polite": [...], "humility": [...], "reciprocity": [...]}` to use other
+terms (the model has to be retrained with the same file).
+"""
+import json
+import os
+import re
+from typing import Dict, List, Mapping, Optional, Sequence
+
+import numpy as np
+
+POLITE_TERMS = [
+    "please",
+    "thank",
+    "thanks",
+    "appreciate",
+    "grateful",
+    "kind",
+    "would be nice",
+    "if possible",
+    "if you can",
+    "would be great",
+    "would love",
+    "kindly",
+]
+HUMILITY_TERMS = [
+    "hate asking",
+    "feel like i'm begging",
+    "don't like asking",
+    "give it a shot",
+    "no sob story",
+    "spare you my sob story",
+    "feel awful",
+    "ashamed",
+    "not needy",
+    "too proud to ask",
+    "i know our blessing is coming",
+]
+RECIPROCITY_TERMS = [
+    "pay it forward",
+    "return the favor",
+    "pay it back",
+    "in exchange",
+    "trade for",
+    "will pizza two people",
+    "repay you",
+    "pass on the love",
+]
+
+# category -> terms; each category becomes a `<category>_terms_count` column
+DEFAULT_LEXICONS = {
+    "polite": POLITE_TERMS,
+    "humility": HUMILITY_TERMS,
+    "reciprocity": RECIPROCITY_TERMS,
+}
+
+
+def load_lexicons(path: str) -> Dict[str, List[str]]:
+    """Reads lexicons from a JSON file, checking it defines every category."""
+    with open(path) as f:
+        lexicons = json.load(f)
+    missing = set(DEFAULT_LEXICONS) - set(lexicons)
+    if missing:
+        raise ValueError(f"Lexicon file {path} is missing categories: {sorted(missing)}")
+    return {category: list(lexicons[category]) for category in DEFAULT_LEXICONS}
+
+
+def _trie_pattern(terms: Sequence[str]) -> str:
+    """
+    Regex alternation factored as a trie, e.g. ["pay it back", "pay it forward"]
+    becomes "pay\\ it\\ (?:back|forward)", so matching cost barely grows with
+    the number of terms. At each position the greedy optional groups make it
+    match the longest term starting there.
+    """
+    trie: dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = {}
+
+    def build(node) -> str:
+        is_end = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        if len(branches) == 1 and not is_end:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        return body + "?" if is_end else body
+
+    return build(trie)
+
+
+class TermMatcher:
+    """
+    Counts, per category, how many distinct terms occur in a text (as plain
+    substrings of the lowercased text), with a single regex scan for all
+    categories together.
+
+    The scan finds the longest term starting at each position; every term
+    that is a substring of a found term is then present too, so those are
+    precomputed per term and added to the result without rescanning.
+    """
+
+    def __init__(self, lexicons: Mapping[str, Sequence[str]]):
+        self.lexicons = {category: list(terms) for category, terms in lexicons.items()}
+        self.categories = list(lexicons)
+        terms = sorted({term for category in lexicons.values() for term in category})
+        if not terms:
+            raise ValueError("Lexicons do not contain any term.")
+        if "" in terms:
+            raise ValueError("Lexicon terms must not be empty.")
+        self._pattern = re.compile("(?=(" + _trie_pattern(terms) + "))")
+        self._implied = {t: frozenset(u for u in terms if u in t) for t in terms}
+        self._term_categories = {
+            t: [i for i, c in enumerate(self.categories) if t in lexicons[c]]
+            for t in terms
+        }
+
+    def count(self, text) -> List[int]:
+        """Distinct-term counts of one text, in `self.categories` order."""
+        counts = [0] * len(self.categories)
+        if not isinstance(text, str):
+            return counts
+        found = set()
+        for match in self._pattern.finditer(text.lower()):
+            term = match.group(1)
+            if term not in found:
+                found |= self._implied[term]
+        for term in found:
+            for i in self._term_categories[term]:
+                counts[i] += 1
+        return counts
+
+    def count_many(self, texts) -> np.ndarray:
+        """Counts for a batch of texts, as an (n_texts, n_categories) array."""
+        texts = list(texts)
+        counts = np.zeros((len(texts), len(self.categories)), dtype=np.int64)
+        for row, text in enumerate(texts):
+            counts[row] = self.count(text)
+        return counts
+
+
+_term_matcher: Optional[TermMatcher] = None
+
+
+def get_term_matcher() -> TermMatcher:
+    """Shared matcher built from `LEXICON_PATH`, or the built-in lexicons."""
+    global _term_matcher
+    if _term_matcher is None:
+        path = os.getenv("LEXICON_PATH")
+        _term_matcher = TermMatcher(load_lexicons(path) if path else DEFAULT_LEXICONS)
+    return _term_matcher
@@ -0,0 +1,269 @@
+# log_writer.py
+import datetime
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import PredictionLog
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop", "spill")
+
+
+def insert_prediction_logs(session: Session, rows: List[Dict[str, Any]]):
+    """Adds prediction log rows with one executemany insert (no commit)."""
+    if rows:
+        session.execute(insert(PredictionLog), rows)
+
+
+async def insert_prediction_logs_async(session, rows: List[Dict[str, Any]]):
+    """`insert_prediction_logs` for an `AsyncSession` (no commit)."""
+    if rows:
+        await session.execute(insert(PredictionLog), rows)
+
+
+class PredictionLogWriter:
+    """
+    Writes `PredictionLog` rows from a background thread.
+
+    Request handlers only put rows on a bounded in-memory queue. The writer
+    thread flushes them with a bulk insert and a single commit whenever
+    `flush_batch_size` rows are waiting or `flush_interval_ms` has passed.
+
+    When the queue is full the `overflow_policy` decides what happens:
+    "block" waits up to `block_timeout_ms` for room (then drops), "drop"
+    discards the row immediately and "spill" appends it to a JSONL file.
+    Spilled rows are written to the database by `start`, or by
+
+        python -m src.log_writer --replay
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_queue_size: int = 10000,
+        flush_batch_size: int = 500,
+        flush_interval_ms: float = 200.0,
+        overflow_policy: str = "block",
+        block_timeout_ms: float = 1000.0,
+        spill_path: str = "prediction_logs_spill.jsonl",
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(
+                f"overflow_policy must be one of {OVERFLOW_POLICIES}, got {overflow_policy!r}"
+            )
+        self.session_factory = session_factory
+        self.flush_batch_size = flush_batch_size
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000.0
+        self.spill_path = spill_path
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self._spill_lock = threading.Lock()
+        self.counters = {
+            "queued": 0,
+            "flushed": 0,
+            "dropped": 0,
+            "spilled": 0,
+            "failed": 0,
+            "rejected": 0,
+        }
+
+    def start(self):
+        """Starts the writer thread, after writing back rows spilled by an earlier run."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        try:
+            replayed = self.replay_spill_file()
+            if replayed:
+                logger.info("Replayed %d spilled prediction log rows", replayed)
+        except Exception:
+            # the rows not written are back in the spill file for the next attempt
+            logger.exception("Failed to replay the prediction log spill file")
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="prediction-log-writer", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the writer thread once everything still queued is flushed."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def enqueue(self, rows: List[Dict[str, Any]]):
+        """Queues rows for writing; never touches the database."""
+        now = datetime.datetime.now(datetime.UTC)
+        for row in rows:
+            # stamp the row now, not when it is eventually flushed
+            row.setdefault("created_at", now)
+            try:
+                if self.overflow_policy == "block":
+                    self._queue.put(row, timeout=self.block_timeout)
+                else:
+                    self._queue.put_nowait(row)
+            except queue.Full:
+                if self.overflow_policy == "spill":
+                    self._spill([row])
+                else:
+                    self._count("dropped")
+                continue
+            self._count("queued")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "pending": self._queue.qsize(),
+                "overflow_policy": self.overflow_policy,
+            }
+
+    def replay_spill_file(self) -> int:
+        """
+        Inserts the rows of the spill file synchronously and removes it.
+        The file is first renamed, so several processes replaying at once
+        insert each row once, and rows spilled meanwhile go to a new file.
+        Lines that cannot be parsed (e.g. cut short by a crash) are moved to
+        `<spill_path>.rejected`; on failure the rows not yet written are
+        appended back to the spill file.
+        """
+        replay_path = f"{self.spill_path}.replay-{os.getpid()}"
+        with self._spill_lock:
+            try:
+                os.replace(self.spill_path, replay_path)
+            except FileNotFoundError:
+                return 0
+        try:
+            # undecodable bytes are kept as they are, for the rejected file
+            with open(replay_path, errors="surrogateescape") as f:
+                lines = [line for line in f if line.strip()]
+        except OSError:
+            self._restore_spill_file(replay_path)
+            raise
+        rows, rejected = [], []
+        for line in lines:
+            try:
+                row = json.loads(line)
+                row["created_at"] = datetime.datetime.fromisoformat(row["created_at"])
+            except (ValueError, TypeError, KeyError):
+                rejected.append(line)
+                continue
+            rows.append(row)
+        if rejected:
+            logger.warning(
+                "Moved %d unreadable spilled rows to %s.rejected", len(rejected), self.spill_path
+            )
+            self._append_lines(f"{self.spill_path}.rejected", rejected)
+            self._count("rejected", len(rejected))
+        written = 0
+        try:
+            for i in range(0, len(rows), self.flush_batch_size):
+                batch = rows[i : i + self.flush_batch_size]
+                self._write(batch)
+                written += len(batch)
+        except Exception:
+            # batches already written are not spilled again
+            self._spill(rows[written:])
+            raise
+        finally:
+            os.remove(replay_path)
+        return written
+
+    def _restore_spill_file(self, replay_path: str):
+        """Puts a file that could not be replayed back in place of the spill file."""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                os.replace(replay_path, self.spill_path)
+                return
+        logger.error("Spilled rows left in %s; replay them by hand", replay_path)
+
+    def _append_lines(self, path: str, lines: List[str]):
+        with self._spill_lock:
+            with open(path, "a", errors="surrogateescape") as f:
+                f.writelines(line if line.endswith("\n") else line + "\n" for line in lines)
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def _spill(self, rows: List[Dict[str, Any]]):
+        with self._spill_lock:
+            with open(self.spill_path, "a") as f:
+                for row in rows:
+                    f.write(json.dumps(row, default=str) + "\n")
+        self._count("spilled", len(rows))
+
+    def _write(self, rows: List[Dict[str, Any]]):
+        db = self.session_factory()
+        try:
+            insert_prediction_logs(db, rows)
+            db.commit()
+        finally:
+            db.close()
+
+    def _collect(self) -> List[Dict[str, Any]]:
+        rows = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(rows) < self.flush_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                if remaining <= 0 or self._stopping.is_set():
+                    rows.append(self._queue.get_nowait())
+                else:
+                    rows.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return rows
+
+    def _flush(self, rows: List[Dict[str, Any]]):
+        try:
+            self._write(rows)
+            self._count("flushed", len(rows))
+        except Exception:
+            logger.exception("Failed to write %d prediction log rows", len(rows))
+            if self.overflow_policy == "spill":
+                self._spill(rows)
+            else:
+                self._count("failed", len(rows))
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            rows = self._collect()
+            if rows:
+                self._flush(rows)
+
+
+def main(argv=None):
+    import argparse
+
+    from . import config
+
+    parser = argparse.ArgumentParser(description="Prediction log writer maintenance.")
+    parser.add_argument(
+        "--replay", action="store_true", help="write the spilled rows to prediction_logs"
+    )
+    parser.add_argument("--spill-path", default=config.LOG_WRITER_SPILL_PATH)
+    args = parser.parse_args(argv)
+    if not args.replay:
+        parser.error("nothing to do; pass --replay")
+    writer = PredictionLogWriter(spill_path=args.spill_path)
+    print(f"{writer.replay_spill_file()} spilled prediction log rows written.")
+
+
+if __name__ == "__main__":
+    main()
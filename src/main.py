@@ -1,30 +1,130 @@
 # In main.py
-from fastapi import FastAPI, Depends, HTTPException
-from sqlalchemy.orm import Session
-import joblib
-import pandas as pd
-from .schemas import PizzaRequestInput
-from .models import PredictionLog
-from .database import Base, engine, get_db
+import datetime
 import os
+import secrets
+import time
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Dict, List, Optional
 
-MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+from fastapi import FastAPI, Body, Depends, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse, Response
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from .schemas import PizzaRequestInput, PredictionOutcomeInput
+from .models import PredictionLog, PredictionOutcome
+from .database import Base, SessionLocal, async_engine, engine, get_async_db, get_db
+from .admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    DeadlineExceededError,
+    TokenBucketLimiter,
+    admitted_at,
+    check_deadline,
+    remaining_seconds,
+)
+from .batching import MicroBatcher
+from .drift import DriftMonitor, load_reference, matches
+from .executor import InferenceExecutor, InferenceUnavailableError
+from .model_loader import MODEL_PATH, score_records, score_records_with_features
+from .cache import PredictionCache, request_fingerprint
+from .columnar import (
+    ARROW_STREAM_TYPE,
+    MSGPACK_TYPE,
+    PARQUET_TYPE,
+    ColumnSchemaError,
+    feature_columns,
+    pack_msgpack,
+    read_arrow,
+    read_parquet,
+    result_table,
+    unpack_msgpack,
+    validate_table,
+    write_arrow,
+    write_parquet,
+)
+from .log_writer import (
+    PredictionLogWriter,
+    insert_prediction_logs,
+    insert_prediction_logs_async,
+)
+from .memory import process_memory
+from .registry import ModelLoadError, ModelRegistry, UnknownModelVersionError
+from .rollups import RollupCompactor, read_stats
+from .shadow import ShadowScorer, load_head, parse_shadow_models
+from .metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from .metrics import MetricsMiddleware, MetricsRegistry, request_start
+from .streaming import NDJSONStreamingResponse, iter_ndjson_lines, ndjson_line, orjson
+from . import config
 
 Base.metadata.create_all(bind=engine)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if inference_executor is not None:
+        # blocks until every worker process has loaded the model
+        inference_executor.start()
+    if micro_batcher is not None:
+        micro_batcher.start()
+    if log_writer is not None:
+        log_writer.start()
+    if shadow_scorer is not None:
+        shadow_scorer.start()
+    if drift_monitor is not None:
+        drift_monitor.start()
+    model_registry.start(config.MODEL_WATCH_INTERVAL_SECONDS)
+    if rollup_compactor is not None:
+        rollup_compactor.start()
+    yield
+    model_registry.stop()
+    if rollup_compactor is not None:
+        rollup_compactor.stop()
+    if micro_batcher is not None:
+        micro_batcher.stop()
+    if shadow_scorer is not None:
+        shadow_scorer.stop()
+    if drift_monitor is not None:
+        drift_monitor.stop()
+    if log_writer is not None:
+        # drain queued log rows before the process exits
+        log_writer.stop()
+    if inference_executor is not None:
+        inference_executor.stop()
+    if async_engine is not None:
+        await async_engine.dispose()
+
+
 app = FastAPI(
     title="Pizza Request Success Predictor API",
     description="Predicts whether a Reddit 'Random Acts of Pizza' request will be fulfilled.",
     version="1.0",
+    lifespan=lifespan,
+    # orjson serializes the response bodies several times faster, when installed
+    default_response_class=ORJSONResponse if orjson is not None else JSONResponse,
 )
+# sessions opened outside of a request dependency (the chunks of
+# /predict/stream); tests point it at their own database
+app.state.session_factory = SessionLocal
+
 
-# Load the trained model pipeline
+# Load the trained model. Later versions are swapped in by the registry
+# (POST /admin/models/reload, or the artifact watcher) without a restart.
+_mmap_mode = "r" if config.MODEL_MMAP_ENABLED else None
+model_registry = ModelRegistry(
+    config.MODEL_BUNDLE_PATH,
+    MODEL_PATH,
+    fast_path=config.FAST_PATH_ENABLED,
+    mmap_mode=_mmap_mode,
+    history_size=config.MODEL_HISTORY_SIZE,
+    archive_dir=config.MODEL_ARCHIVE_DIR or None,
+)
 try:
-    model_pipeline = joblib.load(MODEL_PATH)
-    print("Model pipeline loaded successfully.")
-except FileNotFoundError:
-    model_pipeline = None
-    print("FATAL: pizza_request_model.joblib not found.")
+    model_registry.reload()
+except ModelLoadError as e:
+    print(f"FATAL: {e}")
 
 
 @app.get("/")
@@ -33,40 +133,865 @@ def read_root():
     return {"status": "ok", "message": "Welcome to the Pizza Prediction API!"}
 
 
+def _prediction_label(prediction: int) -> str:
+    return "Pizza Received" if prediction == 1 else "No Pizza Received"
+
+
+def _model_available() -> bool:
+    return model_registry.current.available
+
+
+def _score_records(records: List[Dict[str, Any]]):
+    """(predictions, probabilities, model version), all from one registry snapshot."""
+    served = model_registry.current
+    observe = _observe_stage if metrics is not None else None
+    if shadow_scorer is None:
+        predictions, probabilities = score_records(
+            served.pipeline, served.scorer, records, observe
+        )
+    else:
+        # the shadow heads reuse the features computed for the served model
+        predictions, probabilities, features = score_records_with_features(
+            served.pipeline, served.scorer, records, observe
+        )
+        shadow_scorer.submit(records, predictions, served.version, features)
+    _observe_drift(records, probabilities)
+    return predictions, probabilities, served.version
+
+
+def _score_micro_batch(records: List[Dict[str, Any]]):
+    predictions, probabilities, version = _score_records(records)
+    return [(p, q, version) for p, q in zip(predictions, probabilities)]
+
+
+# Optional micro-batcher: concurrent /predict calls are scored together.
+micro_batcher = (
+    MicroBatcher(
+        _score_micro_batch,
+        max_batch_size=config.MICROBATCH_MAX_BATCH_SIZE,
+        max_wait_ms=config.MICROBATCH_MAX_WAIT_MS,
+    )
+    if config.MICROBATCH_ENABLED
+    else None
+)
+
+
+# Optional process pool: scoring runs in worker processes that each load the
+# model, so one API process can use every core.
+inference_executor = (
+    InferenceExecutor(
+        max_workers=config.INFERENCE_WORKERS,
+        max_pending=config.INFERENCE_MAX_PENDING,
+        bundle_path=model_registry.current.bundle_path,
+        model_path=model_registry.current.model_path,
+        fast_path=config.FAST_PATH_ENABLED,
+        mmap_mode=_mmap_mode,
+        model_version=model_registry.current.version,
+    )
+    if config.INFERENCE_EXECUTOR_ENABLED and _model_available()
+    else None
+)
+
+
+def _drift_reference(version: Optional[str]):
+    """The saved drift reference if it belongs to model `version`, else None."""
+    if not os.path.exists(config.DRIFT_REFERENCE_PATH):
+        print(
+            f"WARNING: no drift reference at {config.DRIFT_REFERENCE_PATH}; "
+            "run train.py to write one. Drift is not monitored until then."
+        )
+        return None
+    try:
+        reference = load_reference(config.DRIFT_REFERENCE_PATH)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: drift reference {config.DRIFT_REFERENCE_PATH} is unreadable: {e}")
+        return None
+    return reference if matches(reference, version) else None
+
+
+# Optional drift monitor: histograms of the scored traffic, updated off the
+# response path and compared with the training reference (GET /drift).
+drift_monitor = (
+    DriftMonitor(
+        _drift_reference(model_registry.current.version),
+        window_size=config.DRIFT_WINDOW_SIZE,
+        max_queued_rows=config.DRIFT_QUEUE_ROWS,
+        psi_threshold=config.DRIFT_PSI_THRESHOLD,
+    )
+    if config.DRIFT_ENABLED
+    else None
+)
+
+
+def _observe_drift(records, probabilities: List[float]):
+    if drift_monitor is not None:
+        drift_monitor.observe(records, probabilities)
+
+
+def _on_model_swap(served):
+    # the workers load a new version before the registry serves it
+    if inference_executor is not None:
+        inference_executor.reload(served.bundle_path, served.model_path, served.version)
+    if drift_monitor is not None:
+        # live counts of another model's probabilities are not comparable
+        drift_monitor.set_reference(_drift_reference(served.version))
+
+
+model_registry.on_swap = _on_model_swap
+
+
+def _shadow_features(records: List[Dict[str, Any]]):
+    # calls scored by the inference workers: featurize again, off the response path
+    served = model_registry.current
+    *_, features = score_records_with_features(served.pipeline, served.scorer, records)
+    return features, served.version
+
+
+def _after_executor_scoring(records: List[Dict[str, Any]], predictions, probabilities, version):
+    """Hands a call scored by the inference workers to the shadow and drift threads."""
+    if shadow_scorer is not None:
+        shadow_scorer.submit(records, predictions, version)
+    _observe_drift(records, probabilities)
+
+
+# Optional shadow models: challenger classifier heads scored off the response
+# path, on the features of the served model (see shadow.py).
+shadow_scorer = (
+    ShadowScorer(
+        [load_head(*entry) for entry in parse_shadow_models(config.SHADOW_MODELS)],
+        max_queue_size=config.SHADOW_QUEUE_SIZE,
+        featurize=_shadow_features,
+    )
+    if config.SHADOW_MODELS
+    else None
+)
+
+
+# Optional background log writer: rows are bulk inserted off the request thread.
+log_writer = (
+    PredictionLogWriter(
+        max_queue_size=config.LOG_WRITER_MAX_QUEUE_SIZE,
+        flush_batch_size=config.LOG_WRITER_FLUSH_BATCH_SIZE,
+        flush_interval_ms=config.LOG_WRITER_FLUSH_INTERVAL_MS,
+        overflow_policy=config.LOG_WRITER_OVERFLOW_POLICY,
+        block_timeout_ms=config.LOG_WRITER_BLOCK_TIMEOUT_MS,
+        spill_path=config.LOG_WRITER_SPILL_PATH,
+    )
+    if config.LOG_WRITER_ENABLED
+    else None
+)
+
+
+# Optional background compaction of new prediction logs into the /stats rollups.
+rollup_compactor = (
+    RollupCompactor(
+        interval_seconds=config.ROLLUP_INTERVAL_SECONDS,
+        batch_size=config.ROLLUP_BATCH_SIZE,
+        lag_seconds=config.ROLLUP_LAG_SECONDS,
+    )
+    if config.ROLLUP_ENABLED
+    else None
+)
+
+
+def _log_row(
+    raw_data_dict: Dict[str, Any], prediction: int, probability: float, version: Optional[str]
+):
+    """A `PredictionLog` row for one request, scored by model `version`."""
+    return {
+        "request_id": raw_data_dict["request_id"],
+        "model_version": version,
+        "raw_request": raw_data_dict,
+        "prediction_label": _prediction_label(prediction),
+        "prediction_value": prediction,
+        "probability_of_success": probability,
+    }
+
+
+def _log_predictions(rows: List[Dict[str, Any]], db: Session):
+    """
+    Hands rows to the background writer when it is enabled. Otherwise they are
+    inserted and committed in the request thread. The session is only used in
+    that second case, so no connection is checked out when the writer is on.
+    """
+    if log_writer is not None:
+        log_writer.enqueue(rows)
+        return
+    insert_prediction_logs(db, rows)
+    db.commit()
+
+
+# Session of the /predict log write: an AsyncSession with ASYNC_DB_ENABLED,
+# so the insert is awaited on the event loop, the regular Session otherwise.
+get_log_db = get_async_db if config.ASYNC_DB_ENABLED else get_db
+
+
+async def _log_predictions_async(rows: List[Dict[str, Any]], db):
+    if log_writer is None and not isinstance(db, Session):
+        await insert_prediction_logs_async(db, rows)
+        await db.commit()
+        return
+    await run_in_threadpool(_log_predictions, rows, db)
+
+
+# Optional admission control of the prediction endpoints: requests beyond the
+# in-flight cap wait in a bounded queue or get 503, clients over their rate
+# get 429, and work past its deadline is skipped (see admission.py).
+admission_controller = (
+    AdmissionController(
+        max_in_flight=config.ADMISSION_MAX_IN_FLIGHT,
+        max_queue=config.ADMISSION_MAX_QUEUE,
+        queue_timeout_ms=config.ADMISSION_QUEUE_TIMEOUT_MS,
+        retry_after_seconds=config.ADMISSION_RETRY_AFTER_SECONDS,
+    )
+    if config.ADMISSION_ENABLED
+    else None
+)
+rate_limiter = (
+    TokenBucketLimiter(
+        config.RATE_LIMIT_PER_SECOND,
+        config.RATE_LIMIT_BURST,
+        max_clients=config.RATE_LIMIT_MAX_CLIENTS,
+    )
+    if config.RATE_LIMIT_PER_SECOND > 0
+    else None
+)
+if admission_controller is not None or rate_limiter is not None:
+    # added before the metrics middleware, which then counts the rejections
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission_controller,
+        limiter=rate_limiter,
+        timeout_ms=config.REQUEST_TIMEOUT_MS if admission_controller is not None else 0.0,
+        client_header=config.RATE_LIMIT_CLIENT_HEADER or None,
+        observe_wait=(
+            (lambda seconds: _observe_stage("admission_wait", seconds))
+            if config.METRICS_ENABLED
+            else None
+        ),
+    )
+
+
+# Optional Prometheus metrics (GET /metrics): per-stage latency histograms,
+# request counters by route and status, and queue depth / model gauges.
+metrics = MetricsRegistry() if config.METRICS_ENABLED else None
+if metrics is not None:
+    stage_seconds = metrics.histogram(
+        "pizza_stage_duration_seconds",
+        "Time spent in each stage of serving predictions.",
+        ["stage"],
+    )
+    app.add_middleware(
+        MetricsMiddleware,
+        requests=metrics.counter(
+            "pizza_http_requests_total", "HTTP requests handled.", ["method", "route", "status"]
+        ),
+        errors=metrics.counter(
+            "pizza_http_errors_total",
+            "HTTP requests answered with a 4xx or 5xx status.",
+            ["method", "route", "status"],
+        ),
+        unavailable=metrics.counter(
+            "pizza_http_unavailable_total",
+            "HTTP requests answered with 503 Service Unavailable.",
+            ["method", "route"],
+        ),
+        duration=metrics.histogram(
+            "pizza_http_request_duration_seconds",
+            "Time from receiving a request to the end of its response.",
+            ["method", "route"],
+        ),
+    )
+    metrics.gauge(
+        "pizza_model_info",
+        "Version of the served model, as a label.",
+        lambda: {(model_registry.current.version or "none",): 1},
+        ["version"],
+    )
+    metrics.gauge(
+        "pizza_queue_depth",
+        "Items waiting in each background queue.",
+        lambda: {
+            (name,): component.stats()["pending"]
+            for name, component in (
+                ("micro_batcher", micro_batcher),
+                ("log_writer", log_writer),
+                ("inference_executor", inference_executor),
+                ("admission", admission_controller),
+                ("drift_monitor", drift_monitor),
+            )
+            if component is not None
+        },
+        ["queue"],
+    )
+    if drift_monitor is not None:
+        metrics.gauge(
+            "pizza_feature_drift_psi",
+            "Population stability index of each monitored feature against training.",
+            lambda: {(name,): score for name, score in drift_monitor.scores().items()},
+            ["feature"],
+        )
+
+
+def _observe_stage(stage: str, seconds: float):
+    stage_seconds.observe(seconds, stage)
+
+
+@contextmanager
+def _timed_stage(stage: str):
+    """Times the enclosed block as `stage` when metrics are enabled."""
+    if metrics is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        _observe_stage(stage, time.perf_counter() - start)
+
+
+# Optional caches: identical feature payloads skip the model, and a repeated
+# request_id gets its first response back without a new log row.
+prediction_cache = (
+    PredictionCache(
+        max_size=config.PREDICTION_CACHE_MAX_SIZE,
+        ttl_seconds=config.PREDICTION_CACHE_TTL_SECONDS,
+    )
+    if config.PREDICTION_CACHE_ENABLED
+    else None
+)
+idempotency_cache = (
+    PredictionCache(
+        max_size=config.IDEMPOTENCY_MAX_SIZE,
+        ttl_seconds=config.IDEMPOTENCY_TTL_SECONDS,
+    )
+    if config.IDEMPOTENCY_ENABLED
+    else None
+)
+
+
+def _naive_utc(moment: Optional[datetime.datetime]) -> Optional[datetime.datetime]:
+    # created_at is stored as naive UTC
+    if moment is None or moment.tzinfo is None:
+        return moment
+    return moment.astimezone(datetime.UTC).replace(tzinfo=None)
+
+
+@app.get("/logs")
+def read_logs(
+    limit: int = Query(100, ge=1, le=config.LOGS_MAX_PAGE_SIZE),
+    cursor: Optional[int] = Query(None, description="`next_cursor` of the previous page"),
+    request_id: Optional[str] = None,
+    model_version: Optional[str] = None,
+    prediction_value: Optional[int] = None,
+    since: Optional[datetime.datetime] = Query(None, description="created_at >= since"),
+    until: Optional[datetime.datetime] = Query(None, description="created_at < until"),
+    include_request: bool = Query(False, description="add the logged request body"),
+    db: Session = Depends(get_db),
+):
+    """
+    Prediction logs, newest first, one page at a time. Pages are keyed on
+    the log id rather than an OFFSET, and every filter has an index, so a
+    page costs the same however deep it is and however large the table.
+    """
+    columns = [
+        PredictionLog.id,
+        PredictionLog.created_at,
+        PredictionLog.request_id,
+        PredictionLog.model_version,
+        PredictionLog.prediction_label,
+        PredictionLog.prediction_value,
+        PredictionLog.probability_of_success,
+    ]
+    if include_request:
+        columns.append(PredictionLog.raw_request)
+    query = select(*columns).order_by(PredictionLog.id.desc()).limit(limit + 1)
+    if cursor is not None:
+        query = query.where(PredictionLog.id < cursor)
+    if request_id is not None:
+        query = query.where(PredictionLog.request_id == request_id)
+    if model_version is not None:
+        query = query.where(PredictionLog.model_version == model_version)
+    if prediction_value is not None:
+        query = query.where(PredictionLog.prediction_value == prediction_value)
+    if since is not None:
+        query = query.where(PredictionLog.created_at >= _naive_utc(since))
+    if until is not None:
+        query = query.where(PredictionLog.created_at < _naive_utc(until))
+
+    rows = db.execute(query).mappings().all()
+    # the extra row only tells whether there is a next page
+    next_cursor = rows[limit - 1]["id"] if len(rows) > limit else None
+    return {"items": [dict(row) for row in rows[:limit]], "next_cursor": next_cursor}
+
+
+@app.get("/stats")
+def read_prediction_stats(
+    days: int = Query(7, ge=1, le=config.STATS_MAX_DAYS, description="UTC days, today included"),
+    model_version: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Prediction volume and predicted success rate by hour, day of week and
+    probability bucket. Read from the rollup tables only, so the cost grows
+    with `days`, not with the number of logged predictions. Logs newer than
+    the last compaction are not counted yet.
+    """
+    until = datetime.datetime.now(datetime.UTC).date()
+    since = until - datetime.timedelta(days=days - 1)
+    return read_stats(db, since, until, model_version)
+
+
+@app.get("/drift")
+def read_drift():
+    """
+    Population stability index of each monitored input, engineered feature
+    and of the predicted probability: recent traffic against the training
+    data of the served model. Computed from fixed-size histograms kept in
+    this worker, so the cost does not depend on traffic volume.
+    """
+    if drift_monitor is None:
+        raise HTTPException(status_code=404, detail="Drift monitoring is disabled.")
+    return {"model_version": model_registry.current.version, **drift_monitor.report()}
+
+
+@app.get("/status")
+def read_status():
+    """Counters of the optional background components, and this worker's memory."""
+    return {
+        "model_version": model_registry.current.version,
+        "model_registry": model_registry.stats(),
+        "worker": process_memory(),
+        "inference_executor": inference_executor.stats() if inference_executor else None,
+        "micro_batcher": micro_batcher.stats() if micro_batcher else None,
+        "log_writer": log_writer.stats() if log_writer else None,
+        "shadow_scorer": shadow_scorer.stats() if shadow_scorer else None,
+        "drift_monitor": drift_monitor.stats() if drift_monitor else None,
+        "rollup_compactor": rollup_compactor.stats() if rollup_compactor else None,
+        "prediction_cache": prediction_cache.stats() if prediction_cache else None,
+        "idempotency_cache": idempotency_cache.stats() if idempotency_cache else None,
+        "admission": admission_controller.stats() if admission_controller else None,
+        "rate_limiter": rate_limiter.stats() if rate_limiter else None,
+    }
+
+
+def _score_one(raw_data_dict: Dict[str, Any]):
+    """Scores a single request in the calling thread (or its micro-batch)."""
+    # the wait for a thread-pool slot may have used up the deadline
+    check_deadline()
+    if micro_batcher is not None:
+        try:
+            # never wait on the batch past the request deadline
+            return micro_batcher.submit(raw_data_dict, remaining_seconds())
+        except TimeoutError:
+            raise DeadlineExceededError()
+    predictions, probabilities, version = _score_records([raw_data_dict])
+    return predictions[0], probabilities[0], version
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Metrics of this worker process in the Prometheus text format."""
+    if metrics is None:
+        raise HTTPException(status_code=404, detail="Metrics are disabled.")
+    return PlainTextResponse(metrics.render(), media_type=METRICS_CONTENT_TYPE)
+
+
 @app.post("/predict")
-def predict_success(request: PizzaRequestInput, db: Session = Depends(get_db)):
+async def predict_success(
+    request: PizzaRequestInput, http_request: Request, db=Depends(get_log_db)
+):
     """
     Takes raw request data, runs it through the full pipeline,
     predicts success, and logs the request and outcome.
+
+    The endpoint is async so that, with the inference executor enabled,
+    waiting on a worker process does not hold a thread, and with the async
+    database engine the log write is awaited too; the remaining blocking
+    work (in-process scoring, sync database writes) runs in the thread pool.
     """
-    if not model_pipeline:
+    parse_start = admitted_at(http_request.scope) or request_start(http_request.scope)
+    if metrics is not None and parse_start is not None:
+        # reading the body, validating it and opening the session
+        _observe_stage("request_parse", time.perf_counter() - parse_start)
+    if not _model_available():
         raise HTTPException(status_code=503, detail="Model is not available.")
 
-    # Convert the pydantic model to a df.
     raw_data_dict = request.model_dump()
-    input_df = pd.DataFrame([raw_data_dict])
+
+    if idempotency_cache is not None:
+        stored_response = idempotency_cache.get(raw_data_dict["request_id"])
+        if stored_response is not None:
+            return stored_response
+
+    version = model_registry.current.version
+    cached = None
+    if prediction_cache is not None:
+        cached = prediction_cache.get(request_fingerprint(raw_data_dict, version))
+
+    if cached is None:
+        # the client gave up, or the request waited too long: skip the work
+        check_deadline()
 
     # predict using the model pipeline
     try:
-        prediction = int(model_pipeline.predict(input_df)[0])
-        probability = float(model_pipeline.predict_proba(input_df)[0][1])
-        prediction_label = "Pizza Received" if prediction == 1 else "No Pizza Received"
+        if cached is not None:
+            prediction, probability = cached
+        elif inference_executor is not None:
+            with _timed_stage("score"):
+                predictions, probabilities, version = (
+                    await inference_executor.score_versioned_async([raw_data_dict])
+                )
+            _after_executor_scoring([raw_data_dict], predictions, probabilities, version)
+            prediction, probability = predictions[0], probabilities[0]
+        else:
+            with _timed_stage("score"):
+                prediction, probability, version = await run_in_threadpool(
+                    _score_one, raw_data_dict
+                )
+        prediction_label = _prediction_label(prediction)
+    except InferenceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except DeadlineExceededError:
+        raise
     except Exception as e:
         # can catch issues if the raw data is malformed in a way the pipeline can't handle
         raise HTTPException(status_code=400, detail=f"Error processing request: {e}")
+    if prediction_cache is not None and cached is None:
+        # keyed by the version that scored it, which a reload may have changed
+        prediction_cache.put(request_fingerprint(raw_data_dict, version), (prediction, probability))
 
     # Log to database
-    log_entry = PredictionLog(
-        raw_request=raw_data_dict,
-        prediction_label=prediction_label,
-        prediction_value=prediction,
-        probability_of_success=probability,
-    )
-    db.add(log_entry)
-    db.commit()
+    with _timed_stage("db_log"):
+        await _log_predictions_async(
+            [_log_row(raw_data_dict, prediction, probability, version)], db
+        )
 
-    return {
+    response = {
         "prediction_label": prediction_label,
         "prediction_value": prediction,
         "probability_of_success": probability,
     }
+    if idempotency_cache is not None:
+        idempotency_cache.put(raw_data_dict["request_id"], response)
+    return response
+
+
+@app.post("/predict/batch")
+def predict_batch(
+    requests: List[Dict[str, Any]] = Body(...), db: Session = Depends(get_db)
+):
+    """
+    Scores a list of raw requests with a single pass through the pipeline.
+    Items are validated one by one, so an invalid item gets its own error
+    entry instead of rejecting the whole batch.
+    """
+    if not _model_available():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    return _predict_batch(requests, db)
+
+
+def _check_batch_size(n: int):
+    if n > config.MAX_BATCH_SIZE:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: {n} items (max {config.MAX_BATCH_SIZE}).",
+        )
+
+
+def _score_batch(records):
+    """
+    Scores request dicts, or validated columns, in one call to the model
+    (or the inference workers); HTTP errors for failures.
+    """
+    check_deadline()
+    try:
+        with _timed_stage("score"):
+            if inference_executor is None:
+                return _score_records(records)
+            if isinstance(records, dict):
+                # the workers take request dicts
+                records = _columns_to_records(records)
+            predictions, probabilities, version = inference_executor.score_versioned(records)
+            _after_executor_scoring(records, predictions, probabilities, version)
+            return predictions, probabilities, version
+    except InferenceUnavailableError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Error processing request: {e}")
+
+
+def _columns_to_records(columns: Dict[str, Any]) -> List[Dict[str, Any]]:
+    values = [c.tolist() if hasattr(c, "tolist") else c for c in columns.values()]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
+
+def _predict_batch(requests: List[Dict[str, Any]], db: Session):
+    _check_batch_size(len(requests))
+
+    results: List[Dict[str, Any]] = [None] * len(requests)
+    valid_indices = []
+    valid_rows = []
+    with _timed_stage("validation"):
+        for index, item in enumerate(requests):
+            try:
+                valid_rows.append(PizzaRequestInput.model_validate(item).model_dump())
+                valid_indices.append(index)
+            except ValidationError as e:
+                results[index] = {
+                    "index": index,
+                    "error": e.errors(include_url=False, include_context=False),
+                }
+
+    if valid_rows:
+        predictions, probabilities, version = _score_batch(valid_rows)
+
+        log_rows = []
+        for index, raw_data_dict, prediction, probability in zip(
+            valid_indices, valid_rows, predictions, probabilities
+        ):
+            prediction_label = _prediction_label(prediction)
+            results[index] = {
+                "index": index,
+                "request_id": raw_data_dict["request_id"],
+                "prediction_label": prediction_label,
+                "prediction_value": prediction,
+                "probability_of_success": probability,
+            }
+            log_rows.append(_log_row(raw_data_dict, prediction, probability, version))
+
+        # One executemany insert and one commit for the whole batch.
+        with _timed_stage("db_log"):
+            _log_predictions(log_rows, db)
+
+    return {
+        "n_succeeded": len(valid_rows),
+        "n_failed": len(requests) - len(valid_rows),
+        "results": results,
+    }
+
+
+def _predict_table(table, db: Session):
+    """Scores and logs an Arrow table of requests; returns the result table."""
+    _check_batch_size(table.num_rows)
+    with _timed_stage("validation"):
+        try:
+            validated, valid_indices, row_errors = validate_table(table)
+        except ColumnSchemaError as e:
+            raise HTTPException(status_code=422, detail=e.errors)
+
+    scored = {}
+    if valid_indices:
+        columns = feature_columns(validated)
+        predictions, probabilities, version = _score_batch(columns)
+        # request dicts only for the log rows, built by Arrow in one call
+        raw_rows = validated.to_pylist()
+        log_rows = []
+        for index, raw, prediction, probability in zip(
+            valid_indices, raw_rows, predictions, probabilities
+        ):
+            label = _prediction_label(prediction)
+            scored[index] = (raw["request_id"], label, prediction, probability)
+            log_rows.append(_log_row(raw, prediction, probability, version))
+        with _timed_stage("db_log"):
+            _log_predictions(log_rows, db)
+    return result_table(table.num_rows, scored, row_errors)
+
+
+async def _read_table(request: Request, reader):
+    body = await request.body()
+    try:
+        return reader(body)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable request body: {e}")
+
+
+@app.post("/predict/arrow")
+async def predict_arrow(request: Request, db: Session = Depends(get_db)):
+    """
+    Scores an Arrow IPC body (stream or file format) whose columns are the
+    fields of `PizzaRequestInput`, and answers with an Arrow IPC stream of
+    one result per row: index, request_id, prediction_label,
+    prediction_value, probability_of_success, or error. Columns are
+    validated as a whole; a row with a missing required value gets an error.
+    """
+    if not _model_available():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    table = await _read_table(request, read_arrow)
+    result = await run_in_threadpool(_predict_table, table, db)
+    return Response(write_arrow(result), media_type=ARROW_STREAM_TYPE)
+
+
+@app.post("/predict/parquet")
+async def predict_parquet(request: Request, db: Session = Depends(get_db)):
+    """Same as `/predict/arrow`, with Parquet request and response bodies."""
+    if not _model_available():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    table = await _read_table(request, read_parquet)
+    result = await run_in_threadpool(_predict_table, table, db)
+    return Response(write_parquet(result), media_type=PARQUET_TYPE)
+
+
+@app.post("/predict/msgpack")
+async def predict_msgpack(request: Request, db: Session = Depends(get_db)):
+    """
+    `/predict/batch` with msgpack bodies, for small payloads: an array of
+    request maps (or a single map) in, the batch response map out.
+    """
+    if not _model_available():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    body = await request.body()
+    try:
+        requests = unpack_msgpack(body)
+    except ImportError:
+        raise HTTPException(status_code=415, detail="msgpack is not installed on this server.")
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Unreadable request body: {e}")
+    if isinstance(requests, dict):
+        requests = [requests]
+    if not isinstance(requests, list):
+        raise HTTPException(status_code=400, detail="Expected an array of request maps.")
+    result = await run_in_threadpool(_predict_batch, requests, db)
+    return Response(pack_msgpack(jsonable_encoder(result)), media_type=MSGPACK_TYPE)
+
+
+def _log_stream_chunk(rows: List[Dict[str, Any]]):
+    # dependencies are closed before a streaming response is sent, so each
+    # chunk opens its own session
+    db = app.state.session_factory()
+    try:
+        _log_predictions(rows, db)
+    finally:
+        db.close()
+
+
+async def _score_stream_chunk(entries):
+    """
+    Scores the valid entries of a chunk in one pass, logs them, and returns
+    the NDJSON result lines of the whole chunk in input order.
+    """
+    valid = [(line, raw) for line, raw, error in entries if error is None]
+    scored = {}
+    if valid:
+        rows = [raw for _, raw in valid]
+        try:
+            if inference_executor is not None:
+                predictions, probabilities, version = (
+                    await inference_executor.score_versioned_async(rows)
+                )
+                _after_executor_scoring(rows, predictions, probabilities, version)
+            else:
+                predictions, probabilities, version = await run_in_threadpool(
+                    _score_records, rows
+                )
+        except Exception as e:
+            failure = f"Error processing request: {e}"
+            entries = [(line, raw, error or failure) for line, raw, error in entries]
+        else:
+            log_rows = []
+            for (line, raw), prediction, probability in zip(valid, predictions, probabilities):
+                prediction_label = _prediction_label(prediction)
+                scored[line] = {
+                    "line": line,
+                    "request_id": raw["request_id"],
+                    "prediction_label": prediction_label,
+                    "prediction_value": prediction,
+                    "probability_of_success": probability,
+                }
+                log_rows.append(_log_row(raw, prediction, probability, version))
+            await run_in_threadpool(_log_stream_chunk, log_rows)
+    return b"".join(
+        ndjson_line(scored[line] if error is None else {"line": line, "error": error})
+        for line, raw, error in entries
+    )
+
+
+async def _stream_predictions(body):
+    entries = []
+    # bytes of the buffered lines; an invalid line keeps its raw input in the error
+    n_bytes = 0
+    async for line, payload in iter_ndjson_lines(body, config.STREAM_MAX_LINE_BYTES):
+        if payload is None:
+            error = f"Line longer than {config.STREAM_MAX_LINE_BYTES} bytes."
+            entries.append((line, None, error))
+        else:
+            n_bytes += len(payload)
+            try:
+                raw = PizzaRequestInput.model_validate_json(payload).model_dump()
+                entries.append((line, raw, None))
+            except ValidationError as e:
+                # the input of a json_invalid error is the raw line (bytes)
+                error = jsonable_encoder(e.errors(include_url=False, include_context=False))
+                entries.append((line, None, error))
+        # invalid lines count too, so a body of bad lines is streamed back
+        # as it arrives instead of being held until the end
+        full = len(entries) >= config.STREAM_CHUNK_SIZE
+        if full or n_bytes >= config.STREAM_MAX_CHUNK_BYTES:
+            yield await _score_stream_chunk(entries)
+            entries, n_bytes = [], 0
+    if entries:
+        yield await _score_stream_chunk(entries)
+
+
+@app.post("/predict/stream")
+async def predict_stream(request: Request):
+    """
+    Scores an NDJSON body (one `PizzaRequestInput` per line) as it arrives,
+    in chunks of `STREAM_CHUNK_SIZE` lines, and streams one NDJSON
+    result per input line back as each chunk completes. Invalid lines get
+    an error entry; the stream goes on. Memory use does not grow with the
+    size of the body.
+    """
+    if not _model_available():
+        raise HTTPException(status_code=503, detail="Model is not available.")
+    return NDJSONStreamingResponse(_stream_predictions(request.stream()))
+
+
+@app.post("/outcomes")
+def record_outcome(outcome: PredictionOutcomeInput, db: Session = Depends(get_db)):
+    """
+    Records whether a scored request received a pizza. Outcomes are the
+    labels consumed by `python -m src.incremental`.
+    """
+    db.add(PredictionOutcome(**outcome.model_dump()))
+    db.commit()
+    return {"status": "recorded", "request_id": outcome.request_id}
+
+
+def _require_admin(x_admin_token: Optional[str] = Header(None)):
+    # without ADMIN_TOKEN the admin endpoints are open, like the rest of the API
+    if config.ADMIN_TOKEN and not secrets.compare_digest(
+        x_admin_token or "", config.ADMIN_TOKEN
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token.")
+
+
+@app.get("/admin/models", dependencies=[Depends(_require_admin)])
+def list_models():
+    """The served model version and the kept versions a rollback can return to."""
+    return model_registry.versions()
+
+
+@app.post("/admin/models/reload", dependencies=[Depends(_require_admin)])
+def reload_model():
+    """
+    Loads the model artifact on disk, warms it up and serves it if it is a
+    new version. Requests keep being served by the current version
+    meanwhile; if loading fails, it stays in place. Only this worker
+    process reloads: with several workers, rely on the artifact watcher.
+    """
+    try:
+        return model_registry.reload()
+    except ModelLoadError as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/admin/models/rollback", dependencies=[Depends(_require_admin)])
+def rollback_model(version: Optional[str] = Query(None, description="default: the previous version")):
+    """Serves a kept, already loaded version again."""
+    try:
+        return model_registry.rollback(version)
+    except UnknownModelVersionError:
+        raise HTTPException(
+            status_code=404, detail=f"Model version {version or '(previous)'} is not kept."
+        )
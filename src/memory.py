@@ -0,0 +1,48 @@
+# memory.py
+"""
+Memory usage of the current (worker) process, as reported by Linux.
+
+`rss_file_kb` counts file-backed pages such as a memory-mapped model
+bundle, which all workers share through the page cache. `rss_anon_kb` also
+includes the pages a worker inherited from the preloaded master and has not
+written to, which stay shared copy-on-write. `pss_kb` splits shared pages
+evenly between the processes mapping them, so summing it over the workers
+gives the real footprint of the deployment.
+"""
+import os
+from typing import Dict, Optional
+
+_STATUS_FIELDS = {
+    "VmRSS": "rss_kb",
+    "RssAnon": "rss_anon_kb",
+    "RssFile": "rss_file_kb",
+    "RssShmem": "rss_shmem_kb",
+}
+_ROLLUP_FIELDS = {
+    "Pss": "pss_kb",
+    "Shared_Clean": "shared_clean_kb",
+    "Shared_Dirty": "shared_dirty_kb",
+}
+
+
+def _read_kb_fields(path: str, fields: Dict[str, str]) -> Dict[str, int]:
+    values = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                if key in fields:
+                    values[fields[key]] = int(rest.split()[0])
+    except OSError:
+        pass
+    return values
+
+
+def process_memory() -> Dict[str, Optional[int]]:
+    """pid and resident memory counters (kB) of this process; None where unavailable."""
+    usage: Dict[str, Optional[int]] = {"pid": os.getpid()}
+    usage.update({name: None for name in _STATUS_FIELDS.values()})
+    usage.update({name: None for name in _ROLLUP_FIELDS.values()})
+    usage.update(_read_kb_fields("/proc/self/status", _STATUS_FIELDS))
+    usage.update(_read_kb_fields("/proc/self/smaps_rollup", _ROLLUP_FIELDS))
+    return usage
@@ -0,0 +1,165 @@
+# model_loader.py
+"""
+Loads the served model and scores request dicts with it.
+
+Shared by the API process and the inference worker processes
+(`executor.py`), so both pick the same artifact the same way.
+"""
+import hashlib
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from .inference import FastScorer, StageObserver, UnsupportedPipelineError
+
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+
+
+def artifact_version(path: str) -> str:
+    """Short content hash of a model artifact, used as its version."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()[:12]
+
+
+def build_fast_scorer(pipeline, fast_path: bool = True):
+    """NumPy-only scorer for the loaded pipeline, or None to use the pipeline itself."""
+    if pipeline is None or not fast_path:
+        return None
+    try:
+        return FastScorer.from_pipeline(pipeline)
+    except UnsupportedPipelineError as e:
+        print(f"INFO:     Fast scoring path disabled: {e}")
+        return None
+
+
+def load_model(
+    bundle_path: Optional[str],
+    model_path: str = MODEL_PATH,
+    fast_path: bool = True,
+    mmap_mode: Optional[str] = None,
+):
+    """
+    Returns (pipeline, fast_scorer, version). The compact bundle is preferred:
+    loading it needs neither sklearn, pandas nor joblib. Otherwise the joblib
+    pipeline is unpickled and a fast scorer derived from it when possible.
+    """
+    if fast_path and bundle_path and os.path.exists(bundle_path):
+        scorer = FastScorer.load(bundle_path, mmap_mode=mmap_mode)
+        print(f"Model bundle {bundle_path} loaded successfully.")
+        return None, scorer, artifact_version(bundle_path)
+
+    import joblib
+    from .naive_bayes import sparsify_pipeline
+
+    try:
+        # older artifacts densify before GaussianNB; score them on the sparse matrix
+        pipeline = sparsify_pipeline(joblib.load(model_path, mmap_mode=mmap_mode))
+    except FileNotFoundError:
+        print("FATAL: pizza_request_model.joblib not found.")
+        return None, None, None
+    print("Model pipeline loaded successfully.")
+    return pipeline, build_fast_scorer(pipeline, fast_path), artifact_version(model_path)
+
+
+def _leaf_steps(pipeline):
+    """(name, estimator) of a pipeline's steps, nested pipelines flattened."""
+    from sklearn.pipeline import Pipeline
+
+    for name, step in pipeline.steps:
+        if step is None or step == "passthrough":
+            continue
+        if isinstance(step, Pipeline):
+            yield from _leaf_steps(step)
+        else:
+            yield name, step
+
+
+def _predict_with_features(pipeline, X, observe: Optional[StageObserver] = None):
+    """
+    (probabilities, input of the classifier) of `pipeline` on X, computed
+    one step at a time, each step timed with `observe`. The input is None
+    for a model that is not a sklearn Pipeline, which is scored in one call.
+    """
+    from sklearn.pipeline import Pipeline
+
+    if not isinstance(pipeline, Pipeline):
+        start = time.perf_counter()
+        probabilities = pipeline.predict_proba(X)
+        if observe is not None:
+            observe("predict_proba", time.perf_counter() - start)
+        return probabilities, None
+    *transforms, (final_name, final) = _leaf_steps(pipeline)
+    for name, step in transforms:
+        start = time.perf_counter()
+        X = step.transform(X)
+        if observe is not None:
+            observe(name, time.perf_counter() - start)
+    start = time.perf_counter()
+    probabilities = final.predict_proba(X)
+    if observe is not None:
+        observe(final_name, time.perf_counter() - start)
+    return probabilities, X
+
+
+def _labels(probabilities):
+    probabilities = np.asarray(probabilities)
+    # classes_ are [False, True], so the argmax column is the predicted label
+    predictions = probabilities.argmax(axis=1)
+    return [int(p) for p in predictions], [float(p) for p in probabilities[:, 1]]
+
+
+def _timed_dataframe(records, observe: Optional[StageObserver]):
+    # only the pipeline fallback needs pandas
+    import pandas as pd
+
+    start = time.perf_counter()
+    X = pd.DataFrame(records)
+    if observe is not None:
+        observe("dataframe", time.perf_counter() - start)
+    return X
+
+
+def score_records(
+    pipeline,
+    scorer: Optional[FastScorer],
+    records: List[Dict[str, Any]],
+    observe: Optional[StageObserver] = None,
+):
+    """
+    (predictions, probabilities) of raw request dicts, one pass over the
+    model. With `observe`, the time of each stage is reported to it: the
+    fast scorer's `FAST_STAGES` (features, transform, likelihood), or the
+    DataFrame construction and each pipeline step.
+    """
+    if scorer is not None:
+        return scorer.score(records, observe)
+    if observe is None:
+        import pandas as pd
+
+        return _labels(pipeline.predict_proba(pd.DataFrame(records)))
+    probabilities, _ = _predict_with_features(pipeline, _timed_dataframe(records, observe), observe)
+    return _labels(probabilities)
+
+
+def score_records_with_features(
+    pipeline,
+    scorer: Optional[FastScorer],
+    records: List[Dict[str, Any]],
+    observe: Optional[StageObserver] = None,
+):
+    """
+    `score_records`, plus the preprocessed feature matrix the classifier
+    scored, so further classifier heads can reuse it (see shadow.py). The
+    matrix is None when the model has no separate preprocessing step.
+    """
+    if scorer is not None:
+        return scorer.score_with_features(records, observe)
+    probabilities, features = _predict_with_features(
+        pipeline, _timed_dataframe(records, observe), observe
+    )
+    return (*_labels(probabilities), features)
@@ -1,6 +1,7 @@
 # models.py
 import datetime
-from sqlalchemy import Column, Integer, String, Float, JSON, DateTime
+from sqlalchemy import Boolean, Column, Date, Index, Integer, String, Float, JSON, DateTime
+from sqlalchemy.dialects.postgresql import JSONB
 
 # Import the Base class from your database setup
 from .database import Base
@@ -9,10 +10,70 @@ from .database import Base
 # we define your table model here, inheriting from the imported Base
 class PredictionLog(Base):
     __tablename__ = "prediction_logs"
+    # filtered /logs pages: the filter, then the id order of the keyset
+    __table_args__ = (
+        Index("ix_prediction_logs_prediction_value_id", "prediction_value", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
-    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.UTC))
-    raw_request = Column(JSON)
+    created_at = Column(
+        DateTime, default=lambda: datetime.datetime.now(datetime.UTC), index=True
+    )
+    # copied out of raw_request so lookups by request or model use an index
+    request_id = Column(String, index=True)
+    model_version = Column(String, index=True)
+    # binary JSONB on PostgreSQL: smaller and parsed once, on write
+    raw_request = Column(JSON().with_variant(JSONB(), "postgresql"))
     prediction_label = Column(String)
     prediction_value = Column(Integer)
     probability_of_success = Column(Float)
+
+
+# Observed outcome of a logged request, joined onto prediction_logs by
+# request_id when the model is updated incrementally (see incremental.py).
+class PredictionOutcome(Base):
+    __tablename__ = "prediction_outcomes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.UTC))
+    request_id = Column(String, index=True, nullable=False)
+    requester_received_pizza = Column(Boolean, nullable=False)
+
+
+# Prediction counts per UTC day, hour, probability decile and model version,
+# added to by compaction of new prediction_logs (see rollups.py).
+class PredictionRollup(Base):
+    __tablename__ = "prediction_rollups"
+
+    day = Column(Date, primary_key=True)
+    hour = Column(Integer, primary_key=True)
+    probability_bucket = Column(Integer, primary_key=True)
+    # "" for logs written before model_version was recorded
+    model_version = Column(String, primary_key=True, default="")
+    predictions = Column(Integer, nullable=False, default=0)
+    predicted_success = Column(Integer, nullable=False, default=0)
+    probability_sum = Column(Float, nullable=False, default=0.0)
+
+
+# Id of the last prediction_logs row added to the rollups.
+class RollupState(Base):
+    __tablename__ = "rollup_state"
+
+    name = Column(String, primary_key=True)
+    last_log_id = Column(Integer, nullable=False, default=0)
+
+
+# Prediction of a shadow model (see shadow.py), scored off the response path
+# on the features of the logged request with the same request_id.
+class ShadowPredictionLog(Base):
+    __tablename__ = "shadow_prediction_logs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_at = Column(DateTime, default=lambda: datetime.datetime.now(datetime.UTC))
+    request_id = Column(String, index=True)
+    shadow_model = Column(String, index=True, nullable=False)
+    # the served model whose preprocessing produced the features
+    primary_model_version = Column(String)
+    primary_prediction_value = Column(Integer)
+    prediction_value = Column(Integer)
+    probability_of_success = Column(Float)
@@ -0,0 +1,153 @@
+# naive_bayes.py
+import numpy as np
+import scipy.sparse as sp
+from sklearn.naive_bayes import GaussianNB
+from sklearn.pipeline import Pipeline
+from sklearn.utils.multiclass import _check_partial_fit_first_call
+
+
+def _csr_mean_var(X: sp.csr_matrix):
+    """Column means and variances of a CSR matrix without densifying it."""
+    n_samples, n_features = X.shape
+    mean = np.asarray(X.sum(axis=0)).ravel() / n_samples
+    # two-pass variance: stored entries contribute (x - mean)^2 and every
+    # implicit zero contributes mean^2
+    diff = X.data - mean[X.indices]
+    n_stored = np.bincount(X.indices, minlength=n_features)
+    ssd = np.bincount(X.indices, weights=diff**2, minlength=n_features)
+    ssd += (n_samples - n_stored) * mean**2
+    return mean, ssd / n_samples
+
+
+class SparseGaussianNB(GaussianNB):
+    """
+    GaussianNB that fits and scores CSR matrices directly.
+
+    Scoring uses the fact that the log-likelihood of a row is the one of an
+    all-zero row plus a correction for its nonzero entries:
+
+        sum_j (x_j - theta_j)^2 / var_j
+            = sum_j theta_j^2 / var_j + sum_{x_j != 0} (x_j^2 - 2 x_j theta_j) / var_j
+
+    so only the stored entries of the TF-IDF output are touched. Dense input
+    goes through the regular GaussianNB code.
+    """
+
+    @classmethod
+    def from_gaussian_nb(cls, classifier: GaussianNB) -> "SparseGaussianNB":
+        """Copies the fitted state of a GaussianNB (e.g. from an older artifact)."""
+        sparse_classifier = cls(**classifier.get_params())
+        for name, value in vars(classifier).items():
+            if name.endswith("_"):
+                setattr(sparse_classifier, name, value)
+        return sparse_classifier
+
+    def fit(self, X, y, sample_weight=None):
+        if not sp.issparse(X):
+            return super().fit(X, y, sample_weight=sample_weight)
+        y = self._validate_data(y=y)
+        return self._sparse_partial_fit(X, y, np.unique(y), True, sample_weight)
+
+    def partial_fit(self, X, y, classes=None, sample_weight=None):
+        if not sp.issparse(X):
+            return super().partial_fit(X, y, classes, sample_weight=sample_weight)
+        return self._sparse_partial_fit(X, y, classes, False, sample_weight)
+
+    def _sparse_partial_fit(self, X, y, classes, refit, sample_weight):
+        """Sparse counterpart of `GaussianNB._partial_fit`, same update rules."""
+        if sample_weight is not None:
+            raise ValueError("sample_weight is not supported with sparse input.")
+        if refit:
+            self.classes_ = None
+        first_call = _check_partial_fit_first_call(self, classes)
+        X, y = self._validate_data(X, y, accept_sparse="csr", reset=first_call)
+        if not X.has_canonical_format:
+            X = X.copy()
+            X.sum_duplicates()
+
+        self.epsilon_ = self.var_smoothing * _csr_mean_var(X)[1].max()
+
+        if first_call:
+            n_features = X.shape[1]
+            n_classes = len(self.classes_)
+            self.theta_ = np.zeros((n_classes, n_features))
+            self.var_ = np.zeros((n_classes, n_features))
+            self.class_count_ = np.zeros(n_classes, dtype=np.float64)
+            if self.priors is not None:
+                self.class_prior_ = np.asarray(self.priors, dtype=np.float64)
+            else:
+                self.class_prior_ = np.zeros(n_classes, dtype=np.float64)
+        else:
+            if X.shape[1] != self.theta_.shape[1]:
+                msg = "Number of features %d does not match previous data %d."
+                raise ValueError(msg % (X.shape[1], self.theta_.shape[1]))
+            self.var_[:, :] -= self.epsilon_
+
+        unique_y = np.unique(y)
+        if not np.all(np.isin(unique_y, self.classes_)):
+            raise ValueError(
+                "The target label(s) %s in y do not exist in the initial classes %s"
+                % (unique_y[~np.isin(unique_y, self.classes_)], self.classes_)
+            )
+        for y_i in unique_y:
+            i = self.classes_.searchsorted(y_i)
+            X_i = X[y == y_i]
+            n_new = X_i.shape[0]
+            new_mu, new_var = _csr_mean_var(X_i)
+            n_past = self.class_count_[i]
+            if n_past == 0:
+                self.theta_[i, :] = new_mu
+                self.var_[i, :] = new_var
+            else:
+                # same merge as GaussianNB._update_mean_variance
+                n_total = n_past + n_new
+                mu = self.theta_[i, :]
+                total_ssd = (
+                    n_past * self.var_[i, :]
+                    + n_new * new_var
+                    + (n_new * n_past / n_total) * (mu - new_mu) ** 2
+                )
+                self.theta_[i, :] = (n_new * new_mu + n_past * mu) / n_total
+                self.var_[i, :] = total_ssd / n_total
+            self.class_count_[i] += n_new
+
+        self.var_[:, :] += self.epsilon_
+        if self.priors is None:
+            self.class_prior_ = self.class_count_ / self.class_count_.sum()
+        return self
+
+    def _check_X(self, X):
+        return self._validate_data(X, accept_sparse="csr", reset=False)
+
+    def _joint_log_likelihood(self, X):
+        if not sp.issparse(X):
+            return super()._joint_log_likelihood(X)
+        inv_var = 1.0 / self.var_
+        zero_row = (
+            np.log(self.class_prior_)
+            - 0.5 * np.sum(np.log(2.0 * np.pi * self.var_), axis=1)
+            - 0.5 * np.sum(self.theta_**2 * inv_var, axis=1)
+        )
+        correction = X.multiply(X) @ inv_var.T - 2.0 * (X @ (self.theta_ * inv_var).T)
+        return zero_row - 0.5 * np.asarray(correction)
+
+
+def sparsify_pipeline(pipeline: Pipeline) -> Pipeline:
+    """
+    Rewrites a saved `[..., to_dense, GaussianNB]` pipeline into
+    `[..., SparseGaussianNB]` with the same fitted parameters, so older
+    artifacts can be scored without densifying. Other pipelines are
+    returned unchanged.
+    """
+    steps = list(pipeline.steps)
+    if len(steps) < 2:
+        return pipeline
+    (_, dense_step), (clf_name, classifier) = steps[-2], steps[-1]
+    if (
+        getattr(getattr(dense_step, "func", None), "__name__", None) != "to_dense"
+        or type(classifier) is not GaussianNB
+    ):
+        return pipeline
+    return Pipeline(
+        steps[:-2] + [(clf_name, SparseGaussianNB.from_gaussian_nb(classifier))]
+    )
@@ -1,155 +1,147 @@
+from typing import Optional
+
 import pandas as pd
 from sklearn.pipeline import Pipeline
 from sklearn.preprocessing import FunctionTransformer, StandardScaler, OneHotEncoder
-from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfVectorizer
 from sklearn.compose import ColumnTransformer
 
-POLITE_TERMS = [
-    "please",
-    "thank",
-    "thanks",
-    "appreciate",
-    "grateful",
-    "kind",
-    "would be nice",
-    "if possible",
-    "if you can",
-    "would be great",
-    "would love",
-    "kindly",
-]
-HUMILITY_TERMS = [
-    "hate asking",
-    "feel like i'm begging",
-    "don't like asking",
-    "give it a shot",
-    "no sob story",
-    "spare you my sob story",
-    "feel awful",
-    "ashamed",
-    "not needy",
-    "too proud to ask",
-    "i know our blessing is coming",
-]
-RECIPROCITY_TERMS = [
-    "pay it forward",
-    "return the favor",
-    "pay it back",
-    "in exchange",
-    "trade for",
-    "will pizza two people",
-    "repay you",
-    "pass on the love",
-]
+from .features import RAW_INPUT_COLUMNS
+from .lexicons import (
+    POLITE_TERMS,
+    HUMILITY_TERMS,
+    RECIPROCITY_TERMS,
+    get_term_matcher,
+)
+
+
+def _with_columns(df: pd.DataFrame, new_columns: dict, drop=()) -> pd.DataFrame:
+    """
+    Returns a new frame with the columns of `df` (minus `drop`) followed by
+    `new_columns`. Column arrays are shared with `df` rather than copied, so a
+    stage only allocates the columns it creates. No stage writes into its
+    input, which keeps the sharing safe.
+    """
+    columns = {name: df[name] for name in df.columns if name not in drop}
+    columns.update(new_columns)
+    return pd.DataFrame(columns, index=df.index, copy=False)
 
 
 def drop_leakage_and_redundant_cols(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    leakage_cols = [
-        "giver_username_if_known",
-        "requester_user_flair",
-        "post_was_edited",
-    ]
-    retrieval_cols = [col for col in df.columns if "_at_retrieval" in col]
-    redundant_cols = [
-        "request_text",
-        "unix_timestamp_of_request",
-        "request_id",
-        "requester_subreddits_at_request",
-    ]
-    cols_to_drop = leakage_cols + retrieval_cols + redundant_cols
-    existing_cols_to_drop = [col for col in cols_to_drop if col in df.columns]
-    df.drop(columns=existing_cols_to_drop, inplace=True, errors="ignore")
-    return df
+    kept = [col for col in RAW_INPUT_COLUMNS if col in df.columns]
+    return _with_columns(df, {}, drop=set(df.columns) - set(kept))
 
 
 def create_time_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
     request_datetime = pd.to_datetime(df["unix_timestamp_of_request_utc"], unit="s")
-    df["hour_of_request"] = request_datetime.dt.hour
-    df["day_of_week"] = request_datetime.dt.dayofweek
-    df.drop(columns=["unix_timestamp_of_request_utc"], inplace=True)
-    return df
+    return _with_columns(
+        df,
+        {
+            "hour_of_request": request_datetime.dt.hour,
+            "day_of_week": request_datetime.dt.dayofweek,
+        },
+        drop={"unix_timestamp_of_request_utc"},
+    )
 
 
 def create_politeness_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-
-    def _count_terms(text, terms_list):
-        if not isinstance(text, str):
-            return 0
-        lower_text = text.lower()
-        return sum(1 for term in terms_list if term in lower_text)
-
-    df["polite_terms_count"] = df["full_request_text"].apply(
-        _count_terms, args=(POLITE_TERMS,)
-    )
-    df["humility_terms_count"] = df["full_request_text"].apply(
-        _count_terms, args=(HUMILITY_TERMS,)
+    # one scan per text counts the terms of every lexicon
+    matcher = get_term_matcher()
+    counts = matcher.count_many(df["full_request_text"])
+    new_columns = {
+        f"{category}_terms_count": pd.Series(counts[:, i], index=df.index)
+        for i, category in enumerate(matcher.categories)
+    }
+    new_columns["politeness_score"] = (
+        new_columns["polite_terms_count"]
+        + new_columns["humility_terms_count"]
+        + new_columns["reciprocity_terms_count"]
     )
-    df["reciprocity_terms_count"] = df["full_request_text"].apply(
-        _count_terms, args=(RECIPROCITY_TERMS,)
-    )
-    df["politeness_score"] = (
-        df["polite_terms_count"]
-        + df["humility_terms_count"]
-        + df["reciprocity_terms_count"]
-    )
-    return df
+    return _with_columns(df, new_columns)
 
 
 def create_engineered_features(df: pd.DataFrame) -> pd.DataFrame:
-    df = df.copy()
-    df["request_length"] = df["request_text_edit_aware"].str.len().fillna(0)
-    df["raop_post_ratio"] = df["requester_number_of_posts_on_raop_at_request"] / (
-        df["requester_number_of_posts_at_request"] + 1e-6
-    )
-    df["full_request_text"] = (
-        df["request_title"].fillna("")
-        + " "
-        + df["request_text_edit_aware"].fillna("")
-        + " "
-        + df["requester_username"].fillna("")
-    )
-    df.drop(
-        columns=["request_title", "request_text_edit_aware", "requester_username"],
-        inplace=True,
-        errors="ignore",
+    new_columns = {
+        "request_length": df["request_text_edit_aware"].str.len().fillna(0),
+        "raop_post_ratio": df["requester_number_of_posts_on_raop_at_request"]
+        / (df["requester_number_of_posts_at_request"] + 1e-6),
+        # one join per row instead of chained Series concatenation, which
+        # materialises every intermediate string column
+        "full_request_text": pd.Series(
+            [
+                " ".join(parts)
+                for parts in zip(
+                    df["request_title"].fillna(""),
+                    df["request_text_edit_aware"].fillna(""),
+                    df["requester_username"].fillna(""),
+                )
+            ],
+            index=df.index,
+            dtype=object,
+        ),
+    }
+    return _with_columns(
+        df,
+        new_columns,
+        drop={"request_title", "request_text_edit_aware", "requester_username"},
     )
-    return df
-
-
-def build_pipeline(use_tfidf: bool = True) -> Pipeline:
-    numeric_features = [
-        "requester_account_age_in_days_at_request",
-        "requester_days_since_first_post_on_raop_at_request",
-        "requester_number_of_comments_at_request",
-        "requester_number_of_comments_in_raop_at_request",
-        "requester_number_of_posts_at_request",
-        "requester_number_of_posts_on_raop_at_request",
-        "requester_number_of_subreddits_at_request",
-        "requester_upvotes_minus_downvotes_at_request",
-        "requester_upvotes_plus_downvotes_at_request",
-        "request_length",
-        "raop_post_ratio",
-        "politeness_score",
-        "polite_terms_count",
-        "humility_terms_count",
-        "reciprocity_terms_count",
+
+
+NUMERIC_FEATURES = [
+    "requester_account_age_in_days_at_request",
+    "requester_days_since_first_post_on_raop_at_request",
+    "requester_number_of_comments_at_request",
+    "requester_number_of_comments_in_raop_at_request",
+    "requester_number_of_posts_at_request",
+    "requester_number_of_posts_on_raop_at_request",
+    "requester_number_of_subreddits_at_request",
+    "requester_upvotes_minus_downvotes_at_request",
+    "requester_upvotes_plus_downvotes_at_request",
+    "request_length",
+    "raop_post_ratio",
+    "politeness_score",
+    "polite_terms_count",
+    "humility_terms_count",
+    "reciprocity_terms_count",
+]
+CATEGORICAL_FEATURES = ["hour_of_request", "day_of_week"]
+TEXT_FEATURE = "full_request_text"
+
+# TF-IDF settings of the production model; `build_pipeline(tfidf_params=...)`
+# overrides them (train.py searches over a few alternatives).
+DEFAULT_TFIDF_PARAMS = {"max_features": 1000, "stop_words": "english"}
+
+
+def _feature_stages():
+    return [
+        ("1_drop_cols", FunctionTransformer(drop_leakage_and_redundant_cols)),
+        ("2_time_features", FunctionTransformer(create_time_features)),
+        ("3_eng_features", FunctionTransformer(create_engineered_features)),
+        (
+            "4_politeness_features",
+            FunctionTransformer(create_politeness_features),
+        ),
     ]
-    categorical_features = ["hour_of_request", "day_of_week"]
-    text_feature = "full_request_text"
 
+
+def build_pipeline(
+    use_tfidf: bool = True, tfidf_params: Optional[dict] = None, memory=None
+) -> Pipeline:
+    """
+    Feature pipeline: the four stateless stages, then scaling, one-hot
+    encoding and TF-IDF. With `memory` (a `joblib.Memory` or a directory),
+    the output of the stages is cached on disk, keyed on the input data.
+    """
     transformers = [
-        ("num", StandardScaler(), numeric_features),
-        ("cat", OneHotEncoder(handle_unknown="ignore"), categorical_features),
+        ("num", StandardScaler(), NUMERIC_FEATURES),
+        ("cat", OneHotEncoder(handle_unknown="ignore"), CATEGORICAL_FEATURES),
     ]
 
     if use_tfidf:
         text_transformer = (
             "text",
-            TfidfVectorizer(max_features=1000, stop_words="english"),
-            text_feature,
+            TfidfVectorizer(**{**DEFAULT_TFIDF_PARAMS, **(tfidf_params or {})}),
+            TEXT_FEATURE,
         )
         transformers.append(text_transformer)
 
@@ -159,20 +151,46 @@ def build_pipeline(use_tfidf: bool = True) -> Pipeline:
     )
 
     master_pipeline = Pipeline(
-        steps=[
-            ("1_drop_cols", FunctionTransformer(drop_leakage_and_redundant_cols)),
-            ("2_time_features", FunctionTransformer(create_time_features)),
-            ("3_eng_features", FunctionTransformer(create_engineered_features)),
-            (
-                "4_politeness_features",
-                FunctionTransformer(create_politeness_features),
-            ),
-            ("5_preprocessor", final_preprocessor),
-        ]
+        steps=_feature_stages() + [("5_preprocessor", final_preprocessor)],
+        memory=memory,
     )
 
     return master_pipeline
 
 
+def build_hashing_pipeline(n_text_features: int = 2**12) -> Pipeline:
+    """
+    Variant of `build_pipeline` for incremental training (incremental.py):
+    text is hashed instead of TF-IDF weighted and the one-hot categories are
+    fixed, so only the scaler learns from data and the text and categorical
+    columns never change meaning as new rows arrive.
+    """
+    final_preprocessor = ColumnTransformer(
+        transformers=[
+            ("num", StandardScaler(), NUMERIC_FEATURES),
+            (
+                "cat",
+                OneHotEncoder(
+                    categories=[list(range(24)), list(range(7))],
+                    handle_unknown="ignore",
+                ),
+                CATEGORICAL_FEATURES,
+            ),
+            (
+                "text",
+                HashingVectorizer(
+                    n_features=n_text_features,
+                    stop_words="english",
+                    alternate_sign=False,
+                ),
+                TEXT_FEATURE,
+            ),
+        ],
+        remainder="drop",
+    )
+    return Pipeline(steps=_feature_stages() + [("5_preprocessor", final_preprocessor)])
+
+
+# Used by artifacts saved before SparseGaussianNB; kept so they still unpickle.
 def to_dense(X):
     return X.toarray()
@@ -0,0 +1,250 @@
+# registry.py
+"""
+The served model, swapped for a new version without restarting the API.
+
+A reload copies the current artifact into `archive_dir` under its content
+hash, loads it from there, scores one example request to warm it up, and
+only then replaces `ModelRegistry.current`. Requests read `current` once
+and keep that snapshot until they are done, so a swap never blocks them
+and an in-flight request is scored and logged by a single version. The
+last `history_size` versions stay loaded for an immediate rollback.
+
+Reloads are triggered by `POST /admin/models/reload`, or by the watcher
+thread when the artifact file changes (`MODEL_WATCH_INTERVAL_SECONDS`).
+"""
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict, NamedTuple, Optional
+
+from .model_loader import MODEL_PATH, artifact_version, load_model, score_records
+from .schemas import PizzaRequestInput
+
+logger = logging.getLogger(__name__)
+
+WARMUP_RECORD = PizzaRequestInput.model_config["json_schema_extra"]["example"]
+
+
+class ModelLoadError(RuntimeError):
+    """A new model version could not be loaded or warmed up; the old one is kept."""
+
+
+class UnknownModelVersionError(KeyError):
+    """Rollback to a version that is not among the kept ones."""
+
+
+class ServedModel(NamedTuple):
+    pipeline: Any
+    scorer: Any
+    version: Optional[str]
+    # paths the model was loaded from, also used by the inference workers
+    bundle_path: Optional[str] = None
+    model_path: str = MODEL_PATH
+    loaded_at: float = 0.0
+
+    @property
+    def available(self) -> bool:
+        return self.pipeline is not None or self.scorer is not None
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "artifact": self.bundle_path or self.model_path,
+            "fast_path": self.scorer is not None,
+            "loaded_at": self.loaded_at,
+        }
+
+
+# called with the new model before it is swapped in; raising aborts the swap
+SwapHook = Callable[[ServedModel], None]
+
+
+class ModelRegistry:
+    def __init__(
+        self,
+        bundle_path: Optional[str],
+        model_path: str = MODEL_PATH,
+        fast_path: bool = True,
+        mmap_mode: Optional[str] = None,
+        history_size: int = 3,
+        archive_dir: Optional[str] = None,
+        on_swap: Optional[SwapHook] = None,
+    ):
+        self.bundle_path = bundle_path
+        self.model_path = model_path
+        self.fast_path = fast_path
+        self.mmap_mode = mmap_mode
+        self.archive_dir = archive_dir
+        self.on_swap = on_swap
+        self.current = ServedModel(None, None, None)
+        self.history: deque = deque(maxlen=max(history_size, 0))
+        # one reload or rollback at a time; requests never take it
+        self._swap_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._signature = None
+        self._thread = None
+        self._stopping = threading.Event()
+        self.interval = 0.0
+        self.counters = {"reloads": 0, "rollbacks": 0, "failed_reloads": 0}
+
+    def _source(self) -> Optional[str]:
+        """The artifact `load_model` would pick: the bundle, else the joblib file."""
+        if self.fast_path and self.bundle_path and os.path.exists(self.bundle_path):
+            return self.bundle_path
+        return self.model_path if os.path.exists(self.model_path) else None
+
+    def _artifact_signature(self):
+        signature = []
+        for path in (self.bundle_path, self.model_path):
+            if path and os.path.exists(path):
+                stat = os.stat(path)
+                signature.append((path, stat.st_mtime_ns, stat.st_size))
+        return tuple(signature)
+
+    def _archive(self, source: str) -> str:
+        """Copies `source` to `archive_dir/<content hash><ext>` and returns that path."""
+        os.makedirs(self.archive_dir, exist_ok=True)
+        extension = os.path.splitext(source)[1]
+        fd, tmp_path = tempfile.mkstemp(suffix=extension, dir=self.archive_dir)
+        os.close(fd)
+        try:
+            # hash the copy, not the source, in case the source is replaced meanwhile
+            shutil.copyfile(source, tmp_path)
+            path = os.path.join(self.archive_dir, artifact_version(tmp_path) + extension)
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def load(self, unless_version: Optional[str] = None) -> Optional[ServedModel]:
+        """
+        Loads and warms up the current artifact without serving it; None
+        when the artifact is `unless_version`, which is then not loaded again.
+        """
+        signature = self._artifact_signature()
+        source = self._source()
+        if source is None:
+            raise ModelLoadError("No model artifact found.")
+        try:
+            path = self._archive(source) if self.archive_dir else source
+            if unless_version is not None and artifact_version(path) == unless_version:
+                self._signature = signature
+                return None
+            is_bundle = source == self.bundle_path
+            bundle_path = path if is_bundle else None
+            model_path = self.model_path if is_bundle else path
+            pipeline, scorer, version = load_model(
+                bundle_path, model_path, self.fast_path, self.mmap_mode
+            )
+            served = ServedModel(pipeline, scorer, version, bundle_path, model_path, time.time())
+            if not served.available:
+                raise ModelLoadError(f"Model artifact {source} could not be loaded.")
+            score_records(served.pipeline, served.scorer, [WARMUP_RECORD])
+        except ModelLoadError:
+            raise
+        except Exception as e:
+            raise ModelLoadError(f"Model artifact {source} could not be loaded: {e}") from e
+        self._signature = signature
+        return served
+
+    def _activate(self, served: ServedModel):
+        if self.on_swap is not None:
+            self.on_swap(served)
+        with self._lock:
+            previous = self.current
+            if previous.available and previous.version != served.version:
+                self.history.append(previous)
+            kept = [m for m in self.history if m.version != served.version]
+            self.history.clear()
+            self.history.extend(kept)
+            self.current = served
+
+    def reload(self) -> Dict[str, Any]:
+        """Serves the artifact on disk if it is a new version; the old one is kept on failure."""
+        with self._swap_lock:
+            try:
+                served = self.load(unless_version=self.current.version)
+                if served is None:
+                    return {"status": "unchanged", "model_version": self.current.version}
+                self._activate(served)
+            except Exception:
+                with self._lock:
+                    self.counters["failed_reloads"] += 1
+                raise
+            with self._lock:
+                self.counters["reloads"] += 1
+        logger.info("Model version %s is now served.", served.version)
+        return {"status": "reloaded", "model_version": served.version}
+
+    def rollback(self, version: Optional[str] = None) -> Dict[str, Any]:
+        """Serves a kept version again: `version`, or the one served before the current one."""
+        with self._swap_lock:
+            with self._lock:
+                candidates = [m for m in self.history if version in (None, m.version)]
+            if not candidates:
+                raise UnknownModelVersionError(version or "no previous version")
+            served = candidates[-1]
+            self._activate(served)
+            with self._lock:
+                self.counters["rollbacks"] += 1
+        logger.info("Rolled back to model version %s.", served.version)
+        return {"status": "rolled_back", "model_version": served.version}
+
+    def versions(self) -> Dict[str, Any]:
+        with self._lock:
+            current, history = self.current, list(self.history)
+        return {
+            "current": current.describe() if current.available else None,
+            # newest first, the first one is what a plain rollback serves
+            "history": [m.describe() for m in reversed(history)],
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "model_version": self.current.version,
+                "kept_versions": len(self.history),
+                "watching": self._thread is not None,
+                **self.counters,
+            }
+
+    def start(self, interval_seconds: float):
+        """Reloads whenever the artifact file changes, checked every `interval_seconds`."""
+        if interval_seconds <= 0 or (self._thread is not None and self._thread.is_alive()):
+            return
+        self.interval = interval_seconds
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._watch, name="model-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def check(self) -> Optional[Dict[str, Any]]:
+        """Reloads if the artifact changed since it was last loaded."""
+        if self._artifact_signature() == self._signature:
+            return None
+        try:
+            return self.reload()
+        except Exception:
+            logger.exception("Model reload failed; still serving %s.", self.current.version)
+            # retried when the artifact changes again, not on every check
+            self._signature = self._artifact_signature()
+            return None
+
+    def _watch(self):
+        while not self._stopping.wait(self.interval):
+            self.check()
@@ -0,0 +1,272 @@
+# rollups.py
+"""
+Prediction counters rolled up by day, hour, probability bucket and model
+version, for dashboards (`GET /stats`).
+
+Rollups are maintained by compaction: each pass reads the logs added since
+the last one (a log id watermark), aggregates them and adds them to the
+`prediction_rollups` rows, in the same transaction as the new watermark.
+A pass therefore costs time in proportion to the new logs, and a dashboard
+query reads at most 24 x 10 rows per day and model version, however large
+`prediction_logs` grows.
+
+    python -m src.rollups            # one compaction, e.g. from cron
+
+With `ROLLUP_ENABLED`, the API also runs compaction every
+`ROLLUP_INTERVAL_SECONDS` in a background thread. The watermark is only
+moved if no other process moved it in the meantime, so several workers
+compacting at once never count a log twice.
+"""
+import datetime
+import logging
+import threading
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .models import PredictionLog, PredictionRollup, RollupState
+
+logger = logging.getLogger(__name__)
+
+PROBABILITY_BUCKETS = 10
+STATE_NAME = "prediction_rollups"
+
+
+def probability_bucket(probability: Optional[float]) -> int:
+    """0 for [0, 0.1), ..., 9 for [0.9, 1]."""
+    if probability is None:
+        return 0
+    return min(max(int(probability * PROBABILITY_BUCKETS), 0), PROBABILITY_BUCKETS - 1)
+
+
+def _watermark(session: Session) -> int:
+    state = session.get(RollupState, STATE_NAME)
+    if state is None:
+        session.add(RollupState(name=STATE_NAME, last_log_id=0))
+        session.flush()
+        return 0
+    return state.last_log_id
+
+
+def compact(session: Session, batch_size: int = 10000, lag_seconds: float = 5.0) -> int:
+    """
+    Rolls up at most `batch_size` new logs and commits; returns how many.
+    Logs younger than `lag_seconds` are left for the next pass, so a row
+    whose transaction commits after a later id is not skipped.
+    """
+    last_log_id = _watermark(session)
+    logs = session.execute(
+        select(
+            PredictionLog.id,
+            PredictionLog.created_at,
+            PredictionLog.model_version,
+            PredictionLog.prediction_value,
+            PredictionLog.probability_of_success,
+        )
+        .where(PredictionLog.id > last_log_id)
+        .order_by(PredictionLog.id)
+        .limit(batch_size)
+    ).all()
+    cutoff = datetime.datetime.now(datetime.UTC).replace(tzinfo=None) - datetime.timedelta(
+        seconds=lag_seconds
+    )
+
+    totals: Dict[tuple, List[float]] = defaultdict(lambda: [0, 0, 0.0])
+    new_last_log_id = last_log_id
+    for log in logs:
+        created_at = log.created_at
+        if created_at is not None and created_at.tzinfo is not None:
+            created_at = created_at.astimezone(datetime.UTC).replace(tzinfo=None)
+        if created_at is not None and created_at >= cutoff:
+            break
+        created_at = created_at or cutoff
+        key = (
+            created_at.date(),
+            created_at.hour,
+            probability_bucket(log.probability_of_success),
+            log.model_version or "",
+        )
+        counts = totals[key]
+        counts[0] += 1
+        counts[1] += 1 if log.prediction_value == 1 else 0
+        counts[2] += log.probability_of_success or 0.0
+        new_last_log_id = log.id
+    if new_last_log_id == last_log_id:
+        session.rollback()
+        return 0
+
+    for (day, hour, bucket, model_version), (n, n_success, probability_sum) in totals.items():
+        rollup = session.get(PredictionRollup, (day, hour, bucket, model_version))
+        if rollup is None:
+            session.add(
+                PredictionRollup(
+                    day=day,
+                    hour=hour,
+                    probability_bucket=bucket,
+                    model_version=model_version,
+                    predictions=n,
+                    predicted_success=n_success,
+                    probability_sum=probability_sum,
+                )
+            )
+        else:
+            rollup.predictions += n
+            rollup.predicted_success += n_success
+            rollup.probability_sum += probability_sum
+
+    moved = session.execute(
+        update(RollupState)
+        .where(RollupState.name == STATE_NAME, RollupState.last_log_id == last_log_id)
+        .values(last_log_id=new_last_log_id)
+    ).rowcount
+    if moved != 1:
+        # another process rolled these logs up first
+        session.rollback()
+        return 0
+    session.commit()
+    return sum(counts[0] for counts in totals.values())
+
+
+def compact_all(
+    session_factory: Callable[[], Session] = SessionLocal,
+    batch_size: int = 10000,
+    lag_seconds: float = 5.0,
+) -> int:
+    """Compacts until the logs older than `lag_seconds` are all rolled up."""
+    total = 0
+    while True:
+        with session_factory() as session:
+            n = compact(session, batch_size, lag_seconds)
+        total += n
+        if n == 0:
+            return total
+
+
+def _rate(numerator: float, denominator: float) -> Optional[float]:
+    return numerator / denominator if denominator else None
+
+
+def _summary(counts: List[float]) -> Dict[str, Any]:
+    n, n_success, probability_sum = counts
+    return {
+        "predictions": int(n),
+        "predicted_success": int(n_success),
+        "success_rate": _rate(n_success, n),
+        "mean_probability": _rate(probability_sum, n),
+    }
+
+
+def read_stats(
+    session: Session,
+    since: datetime.date,
+    until: datetime.date,
+    model_version: Optional[str] = None,
+) -> Dict[str, Any]:
+    """Volume and predicted success rate from the rollups of days `since` to `until`."""
+    query = select(PredictionRollup).where(
+        PredictionRollup.day >= since, PredictionRollup.day <= until
+    )
+    if model_version is not None:
+        query = query.where(PredictionRollup.model_version == model_version)
+
+    total = [0, 0, 0.0]
+    by_hour = [[0, 0, 0.0] for _ in range(24)]
+    by_day_of_week = [[0, 0, 0.0] for _ in range(7)]
+    by_bucket = [[0, 0, 0.0] for _ in range(PROBABILITY_BUCKETS)]
+    for rollup in session.execute(query).scalars():
+        values = (rollup.predictions, rollup.predicted_success, rollup.probability_sum)
+        for counts in (
+            total,
+            by_hour[rollup.hour],
+            by_day_of_week[rollup.day.weekday()],
+            by_bucket[rollup.probability_bucket],
+        ):
+            for i, value in enumerate(values):
+                counts[i] += value
+
+    state = session.get(RollupState, STATE_NAME)
+    width = 1 / PROBABILITY_BUCKETS
+    return {
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "model_version": model_version,
+        "rolled_up_through_log_id": state.last_log_id if state else 0,
+        "total": _summary(total),
+        "by_hour": [{"hour": h, **_summary(c)} for h, c in enumerate(by_hour)],
+        # 0 is Monday, as in the day_of_week model feature
+        "by_day_of_week": [
+            {"day_of_week": d, **_summary(c)} for d, c in enumerate(by_day_of_week)
+        ],
+        "by_probability_bucket": [
+            {
+                "probability_from": round(b * width, 2),
+                "probability_to": round((b + 1) * width, 2),
+                **_summary(c),
+            }
+            for b, c in enumerate(by_bucket)
+        ],
+    }
+
+
+class RollupCompactor:
+    """Runs `compact_all` every `interval_seconds` in a background thread."""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session] = SessionLocal,
+        interval_seconds: float = 60.0,
+        batch_size: int = 10000,
+        lag_seconds: float = 5.0,
+    ):
+        self.session_factory = session_factory
+        self.interval = interval_seconds
+        self.batch_size = batch_size
+        self.lag_seconds = lag_seconds
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {"passes": 0, "logs_rolled_up": 0, "failed_passes": 0}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="prediction-rollup-compactor", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters)
+
+    def run_once(self) -> int:
+        try:
+            n = compact_all(self.session_factory, self.batch_size, self.lag_seconds)
+        except Exception:
+            logger.exception("Prediction rollup compaction failed")
+            with self._lock:
+                self.counters["failed_passes"] += 1
+            return 0
+        with self._lock:
+            self.counters["passes"] += 1
+            self.counters["logs_rolled_up"] += n
+        return n
+
+    def _run(self):
+        while not self._stopping.wait(self.interval):
+            self.run_once()
+
+
+if __name__ == "__main__":
+    print(f"{compact_all()} prediction logs rolled up.")
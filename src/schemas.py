@@ -84,3 +84,13 @@ class PizzaRequestInput(BaseModel):
     unix_timestamp_of_request: Optional[float] = Field(
         None, json_schema_extra={"example": 1380481858.0}
     )
+
+
+class PredictionOutcomeInput(BaseModel):
+    """
+    Whether a previously scored request received a pizza, used as a label
+    for incremental model updates.
+    """
+
+    request_id: str = Field(..., json_schema_extra={"example": "t3_w5491"})
+    requester_received_pizza: bool = Field(..., json_schema_extra={"example": True})
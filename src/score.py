@@ -0,0 +1,338 @@
+# score.py
+"""
+Offline bulk scoring of a request dataset, without going through the API.
+
+    python -m src.score data/dataset.json scores/ --workers 4
+    python -m src.score requests.jsonl scores/ --format csv --chunk-size 50000
+
+The input (a JSON array, JSONL or Parquet file) is read in chunks of
+`--chunk-size` rows. Each chunk is validated with `PizzaRequestInput`, scored
+by a pool of worker processes that load the model once, and written by the
+worker as `part-000123.parquet` (or `.csv`) in the output directory. Rows
+that fail validation are kept with their error, so row numbers line up with
+the input.
+
+Part files are written atomically, so a rerun with the same arguments
+resumes by skipping the chunks that already have one. The run's manifest
+records the model version, so a run is never resumed with another model. Progress and rows/sec
+are reported on stderr.
+"""
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+from pydantic import ValidationError
+
+from .model_loader import MODEL_PATH, artifact_version, load_model, score_records
+from .schemas import PizzaRequestInput
+
+DEFAULT_BUNDLE_PATH = os.path.join("models", "pizza_request_model.npz")
+OUTPUT_FORMATS = ("parquet", "csv")
+OUTPUT_COLUMNS = [
+    "row",
+    "request_id",
+    "prediction_value",
+    "prediction_label",
+    "probability_of_success",
+    "error",
+]
+MANIFEST_NAME = "_manifest.json"
+
+_READ_BLOCK_SIZE = 1 << 20
+# whitespace and commas between the elements of a JSON array
+_SEPARATORS = re.compile(r"[\s,]*")
+
+
+# -- Readers: each yields lists of at most `chunk_size` row dicts --
+
+
+def _chunked(rows: Iterator[Dict[str, Any]], chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) == chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _iter_jsonl(path: str) -> Iterator[Dict[str, Any]]:
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def _iter_json_array(path: str) -> Iterator[Dict[str, Any]]:
+    """Objects of a top-level JSON array, decoded one at a time."""
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8") as f:
+        buffer = f.read(_READ_BLOCK_SIZE)
+        pos = _SEPARATORS.match(buffer).end()
+        if buffer[pos : pos + 1] != "[":
+            raise ValueError(f"{path} does not contain a JSON array.")
+        pos += 1
+        eof = False
+        while True:
+            pos = _SEPARATORS.match(buffer, pos).end()
+            if buffer.startswith("]", pos):
+                return
+            try:
+                row, pos = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # the object continues in the next block
+                block = f.read(_READ_BLOCK_SIZE)
+                eof = not block
+                buffer = buffer[pos:] + block
+                pos = 0
+                continue
+            yield row
+
+
+def _iter_parquet_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as e:
+        raise SystemExit("Reading Parquet needs pyarrow (pip install pyarrow).") from e
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+        yield batch.to_pylist()
+
+
+def read_chunks(path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Chunks of rows of a `.json` (array), `.jsonl`/`.ndjson` or `.parquet` file."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".jsonl", ".ndjson"):
+        return _chunked(_iter_jsonl(path), chunk_size)
+    if extension == ".json":
+        return _chunked(_iter_json_array(path), chunk_size)
+    if extension == ".parquet":
+        return _iter_parquet_chunks(path, chunk_size)
+    raise SystemExit(f"Unsupported input format: {path} (use .json, .jsonl or .parquet)")
+
+
+# -- Writers --
+
+
+def _write_part(path: str, rows: List[Dict[str, Any]], output_format: str):
+    tmp_path = f"{path}.tmp"
+    if output_format == "parquet":
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pylist(
+            rows,
+            schema=pa.schema(
+                [
+                    ("row", pa.int64()),
+                    ("request_id", pa.string()),
+                    ("prediction_value", pa.int64()),
+                    ("prediction_label", pa.string()),
+                    ("probability_of_success", pa.float64()),
+                    ("error", pa.string()),
+                ]
+            ),
+        )
+        pq.write_table(table, tmp_path)
+    else:
+        with open(tmp_path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=OUTPUT_COLUMNS)
+            writer.writeheader()
+            writer.writerows(rows)
+    # a part file either exists complete or not at all, which is what resuming relies on
+    os.replace(tmp_path, path)
+
+
+def part_path(output_dir: str, chunk_index: int, output_format: str) -> str:
+    return os.path.join(output_dir, f"part-{chunk_index:06d}.{output_format}")
+
+
+# -- Worker processes --
+
+_worker_model = None
+
+
+def _init_worker(bundle_path: Optional[str], model_path: str, model_version: str):
+    global _worker_model
+    pipeline, scorer, version = load_model(bundle_path, model_path, True, "r")
+    if pipeline is None and scorer is None:
+        raise RuntimeError("Model is not available in the scoring worker.")
+    if version != model_version:
+        # replaced since the run started: its chunks must not mix two models
+        raise RuntimeError(f"Model changed during the run ({model_version} -> {version}).")
+    _worker_model = (pipeline, scorer)
+
+
+def score_chunk(first_row: int, rows: List[Dict[str, Any]], path: str, output_format: str):
+    """Validates, scores and writes one chunk; returns (rows, failed rows)."""
+    results = []
+    valid_positions = []
+    valid_rows = []
+    for offset, row in enumerate(rows):
+        result = dict.fromkeys(OUTPUT_COLUMNS)
+        result["row"] = first_row + offset
+        result["request_id"] = row.get("request_id") if isinstance(row, dict) else None
+        try:
+            valid_rows.append(PizzaRequestInput.model_validate(row).model_dump())
+            valid_positions.append(offset)
+        except ValidationError as e:
+            result["error"] = json.dumps(
+                e.errors(include_url=False, include_context=False, include_input=False)
+            )
+        results.append(result)
+
+    if valid_rows:
+        pipeline, scorer = _worker_model
+        predictions, probabilities = score_records(pipeline, scorer, valid_rows)
+        for offset, prediction, probability in zip(valid_positions, predictions, probabilities):
+            results[offset]["prediction_value"] = prediction
+            results[offset]["prediction_label"] = (
+                "Pizza Received" if prediction == 1 else "No Pizza Received"
+            )
+            results[offset]["probability_of_success"] = probability
+
+    _write_part(path, results, output_format)
+    return len(rows), len(rows) - len(valid_rows)
+
+
+# -- Driver --
+
+
+def model_version(bundle_path: Optional[str], model_path: str) -> str:
+    """Version of the model the workers load: the bundle's if there is one."""
+    if bundle_path and os.path.exists(bundle_path):
+        return artifact_version(bundle_path)
+    if not os.path.exists(model_path):
+        raise SystemExit(f"No model at {model_path}.")
+    return artifact_version(model_path)
+
+
+def _check_manifest(output_dir: str, manifest: Dict[str, Any], resume: bool):
+    """Refuses to resume into a directory written with other settings."""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if resume and os.path.exists(path):
+        with open(path) as f:
+            previous = json.load(f)
+        if previous != manifest:
+            raise SystemExit(
+                f"{output_dir} holds results of another run ({previous}); "
+                "use a new output directory or --no-resume."
+            )
+    with open(path, "w") as f:
+        json.dump(manifest, f, indent=2)
+
+
+def run(
+    input_path: str,
+    output_dir: str,
+    output_format: str = "parquet",
+    chunk_size: int = 10000,
+    workers: int = os.cpu_count() or 1,
+    bundle_path: Optional[str] = DEFAULT_BUNDLE_PATH,
+    model_path: str = MODEL_PATH,
+    resume: bool = True,
+    log=sys.stderr,
+) -> Dict[str, Any]:
+    """Scores `input_path` into part files in `output_dir`; returns the run totals."""
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(f"output_format must be one of {OUTPUT_FORMATS}")
+    os.makedirs(output_dir, exist_ok=True)
+    stat = os.stat(input_path)
+    version = model_version(bundle_path, model_path)
+    _check_manifest(
+        output_dir,
+        {
+            "input": os.path.abspath(input_path),
+            "input_size": stat.st_size,
+            "input_mtime": stat.st_mtime,
+            "chunk_size": chunk_size,
+            "format": output_format,
+            "model_version": version,
+        },
+        resume,
+    )
+
+    totals = {"rows": 0, "failed": 0, "chunks": 0, "chunks_skipped": 0}
+    started = time.perf_counter()
+    max_in_flight = 2 * workers
+    pending = set()
+
+    def report(done):
+        for future in done:
+            n_rows, n_failed = future.result()
+            totals["rows"] += n_rows
+            totals["failed"] += n_failed
+            totals["chunks"] += 1
+        elapsed = time.perf_counter() - started
+        print(
+            f"{totals['rows']} rows scored ({totals['failed']} invalid), "
+            f"{totals['rows'] / elapsed:,.0f} rows/sec",
+            file=log,
+        )
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(bundle_path, model_path, version),
+    ) as pool:
+        first_row = 0
+        for chunk_index, rows in enumerate(read_chunks(input_path, chunk_size)):
+            path = part_path(output_dir, chunk_index, output_format)
+            if resume and os.path.exists(path):
+                totals["chunks_skipped"] += 1
+            else:
+                if len(pending) >= max_in_flight:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    report(done)
+                pending.add(pool.submit(score_chunk, first_row, rows, path, output_format))
+            first_row += len(rows)
+        if pending:
+            report(wait(pending)[0])
+
+    totals["seconds"] = round(time.perf_counter() - started, 3)
+    totals["rows_per_sec"] = round(totals["rows"] / max(totals["seconds"], 1e-9), 1)
+    print(
+        f"Done: {totals['rows']} rows in {totals['chunks']} chunks "
+        f"({totals['chunks_skipped']} already done) in {totals['seconds']}s, "
+        f"{totals['rows_per_sec']:,.0f} rows/sec.",
+        file=log,
+    )
+    return totals
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("input", help="dataset to score (.json array, .jsonl or .parquet)")
+    parser.add_argument("output_dir", help="directory receiving the part files")
+    parser.add_argument("--format", choices=OUTPUT_FORMATS, default="parquet")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--bundle", default=DEFAULT_BUNDLE_PATH, help="NumPy model bundle")
+    parser.add_argument("--model", default=MODEL_PATH, help="joblib pipeline, used without a bundle")
+    parser.add_argument(
+        "--no-resume", dest="resume", action="store_false",
+        help="rescore chunks that already have a part file",
+    )
+    args = parser.parse_args(argv)
+    run(
+        args.input,
+        args.output_dir,
+        output_format=args.format,
+        chunk_size=args.chunk_size,
+        workers=args.workers,
+        bundle_path=args.bundle,
+        model_path=args.model,
+        resume=args.resume,
+    )
+
+
+if __name__ == "__main__":
+    main()
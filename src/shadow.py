@@ -0,0 +1,284 @@
+# shadow.py
+"""
+Shadow models: challenger classifiers evaluated on production traffic.
+
+A shadow model is a classifier head only, trained on the output of the
+served pipeline's fitted preprocessor:
+
+    python -m src.shadow logistic_regression --output models/shadow/lr.joblib
+    SHADOW_MODELS="lr=models/shadow/lr.joblib@0.25,xgb=models/shadow/xgb.joblib"
+
+The API hands the features it computed for the served model to
+`ShadowScorer`, whose thread scores them with every head and writes the
+predictions to `shadow_prediction_logs`. Shadows never delay a response
+and add no preprocessing: their cost is their own `predict_proba`. Each
+head scores the share of requests given after `@` (all by default); the
+share is picked by a hash of the request id, so a request is in or out of
+a head's sample on every replay.
+"""
+import argparse
+import datetime
+import logging
+import os
+import queue
+import threading
+import zlib
+from typing import Any, Callable, Dict, List, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from .database import SessionLocal
+from .model_loader import MODEL_PATH, artifact_version
+from .models import ShadowPredictionLog
+
+logger = logging.getLogger(__name__)
+
+
+class ShadowHead(NamedTuple):
+    name: str
+    classifier: Any
+    sample_rate: float
+    n_features: int
+    # versions of the served model whose features the head was trained on;
+    # empty to accept any model with the same number of features
+    model_versions: Tuple[str, ...] = ()
+
+    def accepts(self, model_version: Optional[str], n_features: int) -> bool:
+        if n_features != self.n_features:
+            return False
+        return not self.model_versions or model_version in self.model_versions
+
+
+def parse_shadow_models(spec: str) -> List[Tuple[str, str, float]]:
+    """(name, path, sample rate) of each `name=path[@rate]` entry of `SHADOW_MODELS`."""
+    entries = []
+    for entry in filter(None, (e.strip() for e in spec.split(","))):
+        name, sep, path = entry.partition("=")
+        if not sep or not name or not path:
+            raise ValueError(f"Shadow model entry {entry!r} is not name=path[@rate].")
+        path, _, rate = path.partition("@")
+        sample_rate = float(rate) if rate else 1.0
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError(f"Sample rate of shadow model {name!r} must be within [0, 1].")
+        entries.append((name.strip(), path.strip(), sample_rate))
+    return entries
+
+
+def load_head(name: str, path: str, sample_rate: float = 1.0) -> ShadowHead:
+    import joblib
+
+    artifact = joblib.load(path)
+    return ShadowHead(
+        name,
+        artifact["classifier"],
+        sample_rate,
+        artifact["n_features"],
+        tuple(artifact.get("model_versions", ())),
+    )
+
+
+def in_sample(request_id: str, name: str, sample_rate: float) -> bool:
+    if sample_rate >= 1.0:
+        return True
+    return zlib.crc32(f"{name}:{request_id}".encode()) < sample_rate * 2**32
+
+
+# featurize(records) -> (features, model version), for calls scored elsewhere
+Featurizer = Callable[[List[Dict[str, Any]]], Tuple[Any, Optional[str]]]
+
+
+class ShadowScorer:
+    """
+    Scores shadow heads from a background thread. `submit` only puts the
+    batch on a bounded queue and drops it when the queue is full, so a slow
+    head costs shadow coverage, never request latency.
+    """
+
+    def __init__(
+        self,
+        heads: Sequence[ShadowHead],
+        session_factory: Callable[[], Session] = SessionLocal,
+        max_queue_size: int = 1000,
+        featurize: Optional[Featurizer] = None,
+    ):
+        self.heads = list(heads)
+        self.session_factory = session_factory
+        self.featurize = featurize
+        self._queue: "queue.Queue" = queue.Queue(maxsize=max_queue_size)
+        self._thread = None
+        self._stopping = threading.Event()
+        self._lock = threading.Lock()
+        self.counters = {"submitted": 0, "dropped": 0, "incompatible": 0, "failed": 0}
+        self.scored = {head.name: 0 for head in self.heads}
+
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="shadow-scorer", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0):
+        """Stops the thread once the queued batches are scored."""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(
+        self,
+        records: List[Dict[str, Any]],
+        predictions: List[int],
+        model_version: Optional[str],
+        features=None,
+    ) -> bool:
+        """
+        Queues a scored batch. `features` are the served model's preprocessed
+        rows of `records`; without them the thread computes them (`featurize`).
+        """
+        created_at = datetime.datetime.now(datetime.UTC)
+        try:
+            self._queue.put_nowait((records, predictions, model_version, features, created_at))
+        except queue.Full:
+            self._count("dropped")
+            return False
+        self._count("submitted")
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.counters,
+                "pending": self._queue.qsize(),
+                "scored": dict(self.scored),
+            }
+
+    def _count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] += n
+
+    def score(self, records, predictions, model_version, features, created_at=None):
+        """Scores one batch with every head and writes the predictions."""
+        if features is None:
+            if self.featurize is None:
+                return
+            features, model_version = self.featurize(records)
+            if features is None:
+                return
+        if isinstance(records, Mapping):
+            request_ids = list(records["request_id"])
+        else:
+            request_ids = [record["request_id"] for record in records]
+        rows = []
+        for head in self.heads:
+            if not head.accepts(model_version, features.shape[1]):
+                self._count("incompatible")
+                continue
+            sampled = [
+                i
+                for i, request_id in enumerate(request_ids)
+                if in_sample(request_id, head.name, head.sample_rate)
+            ]
+            if not sampled:
+                continue
+            try:
+                proba = head.classifier.predict_proba(features[sampled])
+                success_column = list(head.classifier.classes_).index(True)
+            except Exception:
+                logger.exception("Shadow model %s failed to score", head.name)
+                self._count("failed")
+                continue
+            labels = proba.argmax(axis=1)
+            for i, label, probability in zip(sampled, labels, proba[:, success_column]):
+                rows.append(
+                    {
+                        "created_at": created_at or datetime.datetime.now(datetime.UTC),
+                        "request_id": request_ids[i],
+                        "shadow_model": head.name,
+                        "primary_model_version": model_version,
+                        "primary_prediction_value": predictions[i],
+                        "prediction_value": int(label == success_column),
+                        "probability_of_success": float(probability),
+                    }
+                )
+            with self._lock:
+                self.scored[head.name] += len(sampled)
+        if rows:
+            db = self.session_factory()
+            try:
+                db.execute(insert(ShadowPredictionLog), rows)
+                db.commit()
+            finally:
+                db.close()
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            try:
+                item = self._queue.get(timeout=0.1)
+            except queue.Empty:
+                continue
+            try:
+                self.score(*item)
+            except Exception:
+                logger.exception("Failed to score a batch with the shadow models")
+                self._count("failed")
+
+
+def train_head(model_name: str, primary_path: str = MODEL_PATH, data_path: Optional[str] = None):
+    """
+    Fits a `train.MODEL_CANDIDATES` classifier on the features of the
+    pipeline at `primary_path`; returns the head artifact and its holdout
+    scores. The fitted preprocessor has seen the holdout rows too, so the
+    scores are comparable between heads rather than unbiased.
+    """
+    import joblib
+    from sklearn.model_selection import train_test_split
+
+    from . import train
+    from .naive_bayes import sparsify_pipeline
+
+    X, y = train.load_data(data_path or train.DATA_PATH)
+    primary = sparsify_pipeline(joblib.load(primary_path))
+    features = primary[:-1].transform(X)
+    X_train, X_test, y_train, y_test = train_test_split(
+        features, y, test_size=0.2, random_state=42, stratify=y
+    )
+    factory = train.MODEL_CANDIDATES[model_name]
+    scores = train.evaluate(factory(), X_train, y_train, X_test, y_test)
+    # the served version is the bundle's when there is one next to the pipeline
+    versions = [artifact_version(primary_path)]
+    bundle_path = os.path.splitext(primary_path)[0] + ".npz"
+    if os.path.exists(bundle_path):
+        versions.append(artifact_version(bundle_path))
+    artifact = {
+        "classifier": factory().fit(features, y),
+        "n_features": features.shape[1],
+        "model_versions": versions,
+        "model": model_name,
+    }
+    return artifact, scores
+
+
+def main(argv=None):
+    from . import train
+
+    parser = argparse.ArgumentParser(description="Train a shadow classifier head.")
+    parser.add_argument("model", choices=sorted(train.MODEL_CANDIDATES))
+    parser.add_argument("--output", required=True)
+    parser.add_argument("--primary", default=MODEL_PATH, help="served pipeline to share")
+    parser.add_argument("--data", default=train.DATA_PATH)
+    args = parser.parse_args(argv)
+
+    import joblib
+
+    artifact, scores = train_head(args.model, args.primary, args.data)
+    print(f"Holdout F1={scores['f1']:.4f}  ROC AUC={scores['roc_auc']:.4f}")
+    os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+    joblib.dump(artifact, args.output)
+    print(f"Shadow head saved to {args.output}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+# streaming.py
+"""
+Helpers of the streaming NDJSON endpoint (`POST /predict/stream`).
+"""
+import json
+from typing import Any, AsyncIterator, Optional, Tuple
+
+from starlette.requests import ClientDisconnect
+from starlette.responses import StreamingResponse
+from starlette.types import Receive, Scope, Send
+
+try:
+    # optional fast encoder, also behind the default JSON responses
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints that keep reading the request body while
+    the response is being sent.
+
+    Below ASGI spec 2.4 (uvicorn reports 2.3) the base class runs a task that
+    calls `receive()` to watch for a disconnect, which would swallow request
+    body chunks the endpoint has not read yet. Here the body iterator is the
+    only reader; a disconnect surfaces to it as `ClientDisconnect` from
+    `request.stream()`, or as an error on send.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        try:
+            await self.stream_response(send)
+        except OSError:
+            raise ClientDisconnect()
+        if self.background is not None:
+            await self.background()
+
+
+def ndjson_line(payload: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(payload) + b"\n"
+    return json.dumps(payload, separators=(",", ":")).encode() + b"\n"
+
+
+async def iter_ndjson_lines(
+    chunks: AsyncIterator[bytes], max_line_bytes: int
+) -> AsyncIterator[Tuple[int, Optional[bytes]]]:
+    """
+    Splits a chunked body into (line_number, line) pairs, line numbers
+    starting at 1, blank lines skipped. A line longer than `max_line_bytes`
+    is discarded as it arrives and reported with `None` instead, so the
+    memory held is bounded by that limit whatever the body size.
+    """
+    buffer = bytearray()
+    line_number = 0
+    oversized = False
+    async for chunk in chunks:
+        start = 0
+        while True:
+            end = chunk.find(b"\n", start)
+            if end < 0:
+                break
+            line_number += 1
+            if oversized:
+                yield line_number, None
+            else:
+                buffer += chunk[start:end]
+                if len(buffer) > max_line_bytes:
+                    yield line_number, None
+                elif buffer.strip():
+                    yield line_number, bytes(buffer)
+            buffer.clear()
+            oversized = False
+            start = end + 1
+        if not oversized:
+            buffer += chunk[start:]
+            if len(buffer) > max_line_bytes:
+                oversized = True
+                buffer.clear()
+    if oversized or buffer.strip():
+        line_number += 1
+        yield line_number, None if oversized else bytes(buffer)
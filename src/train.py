@@ -1,73 +1,355 @@
-# src/train.py (The new, improved version with FLAML)
+# src/train.py
+"""
+Trains the production model and saves it to `models/`.
+
+    python -m src.train                          # Naive Bayes, default TF-IDF
+    python -m src.train --search --time-budget 600 --n-jobs -1
+
+The fitted preprocessor output is cached on disk (`--cache-dir`) with
+`joblib.Memory`, keyed on the input data, the TF-IDF settings and a hash of
+the feature code and lexicons. Retraining only recomputes the features that
+changed: a new TF-IDF setting reuses the cached output of the four feature
+stages, and an unchanged setting reuses everything.
+
+`--search` evaluates every combination of `TFIDF_CANDIDATES` and
+`MODEL_CANDIDATES` on the holdout set, in parallel across `--n-jobs`
+processes. Candidates that have not started when `--time-budget` runs out
+are skipped. With FLAML installed, the remaining budget is then given to
+an AutoML search on the best TF-IDF setting. The best candidate by
+`--metric` (F1 by default, as for the model selection in the notebook) is
+refitted on the full dataset and saved.
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import time
 
 import pandas as pd
 import joblib
+from joblib import Memory, Parallel, delayed
+from sklearn.base import clone
+from sklearn.linear_model import LogisticRegression
 from sklearn.model_selection import train_test_split
 from sklearn.pipeline import Pipeline
-from sklearn.naive_bayes import GaussianNB
-from sklearn.preprocessing import FunctionTransformer
 from sklearn.metrics import f1_score, roc_auc_score, classification_report
 
 
-from .pipeline import build_pipeline, to_dense
+from . import drift, features, lexicons, pipeline
+from .pipeline import build_pipeline
+from .naive_bayes import SparseGaussianNB
+from .inference import FastScorer, UnsupportedPipelineError
+from .model_loader import artifact_version
+
+DATA_PATH = "data/dataset.json"
+MODEL_FILENAME = "models/pizza_request_model.joblib"
+BUNDLE_FILENAME = "models/pizza_request_model.npz"
+DRIFT_FILENAME = drift.reference_path(MODEL_FILENAME)
+CACHE_DIR = os.path.join(".cache", "train")
+
+# TF-IDF settings tried by --search, on top of `pipeline.DEFAULT_TFIDF_PARAMS`.
+# They only change the vocabulary, which the NumPy fast path (inference.py)
+# supports; it does not support other classifiers than Naive Bayes, which the
+# API then serves through the joblib pipeline.
+TFIDF_CANDIDATES = [
+    {},
+    {"max_features": 500},
+    {"max_features": 2000},
+    {"max_features": 5000},
+    {"max_features": 2000, "min_df": 2},
+]
+
+
+def _xgboost_classifier():
+    from xgboost import XGBClassifier
+
+    return XGBClassifier(
+        n_estimators=300, max_depth=4, learning_rate=0.1, tree_method="hist", n_jobs=1
+    )
+
+
+# name -> factory of an unfitted classifier; a factory raising ImportError
+# (optional dependency not installed) drops the candidate
+MODEL_CANDIDATES = {
+    "naive_bayes": SparseGaussianNB,
+    "logistic_regression": lambda: LogisticRegression(
+        C=1.0, class_weight="balanced", max_iter=2000, solver="liblinear"
+    ),
+    "xgboost": _xgboost_classifier,
+}
+
+
+def load_data(path: str = DATA_PATH):
+    print("Loading raw data...")
+    raw_df = pd.read_json(path)
+    raw_df.drop_duplicates(subset=["request_id"], keep="first", inplace=True)
+    y = raw_df["requester_received_pizza"]
+    X = raw_df.drop("requester_received_pizza", axis=1)
+    return X, y
+
+
+def feature_code_version() -> str:
+    """
+    Hash of the feature code and lexicons. joblib keys cached stage output on
+    the stage functions by name only, so the cache lives in a directory per
+    version and editing a stage or a lexicon starts a fresh one.
+    """
+    digest = hashlib.sha256()
+    for module in (pipeline, features, lexicons):
+        digest.update(inspect.getsource(module).encode())
+    matcher = lexicons.get_term_matcher()
+    digest.update(json.dumps(matcher.lexicons, sort_keys=True).encode())
+    return digest.hexdigest()[:12]
+
+
+def make_memory(cache_dir):
+    if not cache_dir:
+        return None
+    return Memory(os.path.join(cache_dir, feature_code_version()), verbose=0)
+
+
+def _fit_features(tfidf_params, X_train, y_train, X_test, memory):
+    preprocessor = build_pipeline(tfidf_params=tfidf_params, memory=memory)
+    X_train_processed = preprocessor.fit_transform(X_train, y_train)
+    X_test_processed = preprocessor.transform(X_test)
+    preprocessor.set_params(memory=None)
+    return preprocessor, X_train_processed, X_test_processed
 
-print("Loading raw data...")
-raw_df = pd.read_json("data/dataset.json")
-raw_df.drop_duplicates(subset=["request_id"], keep="first", inplace=True)
 
-y = raw_df["requester_received_pizza"]
-X = raw_df.drop("requester_received_pizza", axis=1)
+def fit_features(tfidf_params, X_train, y_train, X_test, memory=None):
+    """
+    Fits the preprocessor on the training rows and transforms both splits;
+    cached per (TF-IDF settings, data) when `memory` is set.
+    """
+    if memory is None:
+        return _fit_features(tfidf_params, X_train, y_train, X_test, None)
+    return memory.cache(_fit_features, ignore=["memory"])(
+        tfidf_params, X_train, y_train, X_test, memory
+    )
 
-# Split the data, + a temporary holdout/test set
-X_train, X_test, y_train, y_test = train_test_split(
-    X, y, test_size=0.2, random_state=42, stratify=y
-)
-print(f"Data split: {len(X_train)} training samples, {len(X_test)} test samples.")
 
+def evaluate(classifier, X_train_processed, y_train, X_test_processed, y_test):
+    classifier.fit(X_train_processed, y_train)
+    y_pred = classifier.predict(X_test_processed)
+    y_pred_proba = classifier.predict_proba(X_test_processed)[:, 1]
+    return {
+        "f1": float(f1_score(y_test, y_pred)),
+        "roc_auc": float(roc_auc_score(y_test, y_pred_proba)),
+    }
 
-# Get the full pipeline structure, but remove the final classifier step for now.
-# This leaves us with just the data cleaning and feature transformation part.
-preprocessor_pipeline = build_pipeline()
-print("Fitting the preprocessor on the training data...")
-X_train_processed = preprocessor_pipeline.fit_transform(X_train, y_train)
-X_test_processed = preprocessor_pipeline.transform(X_test)
-print(f"Shape of processed training data: {X_train_processed.shape}")
 
+def _run_candidate(tfidf_params, model_name, X_train, y_train, X_test, y_test, memory, deadline):
+    candidate = {"tfidf": tfidf_params, "model": model_name}
+    if time.time() > deadline:
+        return {**candidate, "skipped": "time budget exhausted"}
+    started = time.time()
+    _, X_train_processed, X_test_processed = fit_features(
+        tfidf_params, X_train, y_train, X_test, memory
+    )
+    classifier = MODEL_CANDIDATES[model_name]()
+    scores = evaluate(classifier, X_train_processed, y_train, X_test_processed, y_test)
+    return {**candidate, **scores, "seconds": round(time.time() - started, 2)}
 
-# Since Naive Bayes needs a dense array, we convert the sparse matrix
-X_train_dense = X_train_processed.toarray()
-X_test_dense = X_test_processed.toarray()
 
-print("\nTraining and evaluating Naive Bayes model...")
-nb_model = GaussianNB()
-nb_model.fit(X_train_dense, y_train)
+def _run_flaml(
+    tfidf_params, X_train, y_train, X_test, y_test, memory, time_budget, n_jobs, metric
+):
+    try:
+        from flaml import AutoML
+    except ImportError:
+        return None
+    _, X_train_processed, X_test_processed = fit_features(
+        tfidf_params, X_train, y_train, X_test, memory
+    )
+    automl = AutoML(
+        task="classification",
+        metric=metric,
+        time_budget=time_budget,
+        # learners backed by packages in requirements.txt (FLAML defaults to lightgbm)
+        estimator_list=["xgboost", "xgb_limitdepth", "rf", "extra_tree", "lrl1"],
+        n_jobs=n_jobs,
+        verbose=0,
+    )
+    try:
+        automl.fit(X_train_processed, y_train)
+    except Exception as e:
+        print(f"FLAML search failed, keeping the grid results: {e}")
+        return None
+    best = automl.model.estimator
+    scores = evaluate(clone(best), X_train_processed, y_train, X_test_processed, y_test)
+    return {"tfidf": tfidf_params, "model": "flaml", "estimator": best, **scores}
 
-# evaluate on the holdout test set to confirm performance
-y_pred = nb_model.predict(X_test_dense)
-y_pred_proba = nb_model.predict_proba(X_test_dense)[:, 1]
 
-print("\n--- Naive Bayes Performance on Holdout Test Set ---")
-print(classification_report(y_test, y_pred))
-print(f"F1 Score: {f1_score(y_test, y_pred):.4f}")
-print(f"ROC AUC:  {roc_auc_score(y_test, y_pred_proba):.4f}")
+def search(X_train, y_train, X_test, y_test, memory, time_budget, n_jobs, metric="f1"):
+    """Evaluates the candidates in parallel; returns their results, best first."""
+    deadline = time.time() + time_budget
+    available = []
+    for name, factory in MODEL_CANDIDATES.items():
+        try:
+            factory()
+            available.append(name)
+        except ImportError:
+            print(f"Skipping {name}: its package is not installed.")
 
+    if memory is not None:
+        # features first, once per TF-IDF setting, so the model jobs hit the cache
+        Parallel(n_jobs=n_jobs)(
+            delayed(fit_features)(params, X_train, y_train, X_test, memory)
+            for params in TFIDF_CANDIDATES
+        )
+    results = Parallel(n_jobs=n_jobs)(
+        delayed(_run_candidate)(
+            params, name, X_train, y_train, X_test, y_test, memory, deadline
+        )
+        for params in TFIDF_CANDIDATES
+        for name in available
+    )
+    scored = [r for r in results if "roc_auc" in r]
+    scored.sort(key=lambda r: r[metric], reverse=True)
 
-# build
+    remaining = deadline - time.time()
+    if scored and remaining > 10:
+        flaml_result = _run_flaml(
+            scored[0]["tfidf"], X_train, y_train, X_test, y_test, memory,
+            remaining, n_jobs, metric,
+        )
+        if flaml_result is not None:
+            scored.append(flaml_result)
+            scored.sort(key=lambda r: r[metric], reverse=True)
 
-print("\nBuilding the final production pipeline with the best model...")
-final_production_pipeline = Pipeline(
-    steps=[
-        ("preprocessor", build_pipeline()),
-        ("to_dense", FunctionTransformer(to_dense)),
-        ("classifier", GaussianNB()),
+    print(f"\n--- Candidates on Holdout Test Set (by {metric}) ---")
+    for r in scored:
+        print(f"{r['model']:<20} tfidf={r['tfidf']}  F1={r['f1']:.4f}  ROC AUC={r['roc_auc']:.4f}")
+    skipped = [r for r in results if "skipped" in r]
+    if skipped:
+        print(f"{len(skipped)} candidates skipped: time budget exhausted.")
+    return scored
+
+
+def save_model(final_pipeline, model_filename=MODEL_FILENAME, bundle_filename=BUNDLE_FILENAME):
+    print(f"Saving final pipeline to {model_filename}...")
+    # written aside then renamed, so a reader never loads a partial file
+    joblib.dump(final_pipeline, f"{model_filename}.tmp")
+    os.replace(f"{model_filename}.tmp", model_filename)
+    print("Model saved successfully. This file is ready for deployment.")
+
+    # Compact NumPy bundle served by the API without sklearn (see src/inference.py)
+    try:
+        scorer = FastScorer.from_pipeline(final_pipeline)
+    except UnsupportedPipelineError as e:
+        # the API prefers the bundle, so an old one must not outlive its model
+        if os.path.exists(bundle_filename):
+            os.remove(bundle_filename)
+        print(f"No model bundle exported ({e}); the API will serve the joblib pipeline.")
+        return
+    print(f"Exporting model bundle to {bundle_filename}...")
+    scorer.save(bundle_filename)
+    print("Model bundle saved successfully.")
+
+
+def save_drift_reference(
+    final_pipeline,
+    X,
+    model_filename=MODEL_FILENAME,
+    bundle_filename=BUNDLE_FILENAME,
+    drift_filename=DRIFT_FILENAME,
+):
+    """
+    Saves the reference sketches of the drift monitor (src/drift.py): the
+    training features, and the probabilities of `final_pipeline` on them.
+    Those are in-sample scores, a little more confident than on new data.
+    """
+    print(f"Saving drift reference to {drift_filename}...")
+    success_column = list(final_pipeline.classes_).index(True)
+    probabilities = final_pipeline.predict_proba(X)[:, success_column]
+    # the API serves the bundle when there is one, else the joblib file
+    versions = [
+        artifact_version(path)
+        for path in (model_filename, bundle_filename)
+        if os.path.exists(path)
     ]
-)
+    reference = drift.build_reference(X.to_dict("records"), probabilities, versions)
+    drift.save_reference(reference, drift_filename)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Train the pizza request model.")
+    parser.add_argument("--data", default=DATA_PATH)
+    parser.add_argument("--search", action="store_true", help="search TF-IDF settings and models")
+    parser.add_argument("--time-budget", type=float, default=300.0, help="seconds, with --search")
+    parser.add_argument("--n-jobs", type=int, default=-1, help="parallel jobs, with --search")
+    parser.add_argument(
+        "--metric", choices=("f1", "roc_auc"), default="f1",
+        help="holdout metric selecting the best candidate, with --search",
+    )
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="feature cache ('' disables it)")
+    args = parser.parse_args(argv)
+
+    X, y = load_data(args.data)
+    memory = make_memory(args.cache_dir)
+
+    # Split the data, + a temporary holdout/test set
+    X_train, X_test, y_train, y_test = train_test_split(
+        X, y, test_size=0.2, random_state=42, stratify=y
+    )
+    print(f"Data split: {len(X_train)} training samples, {len(X_test)} test samples.")
+
+    if args.search:
+        results = search(
+            X_train, y_train, X_test, y_test, memory,
+            args.time_budget, args.n_jobs, args.metric,
+        )
+        if not results:
+            raise SystemExit("No candidate finished within the time budget.")
+        best = results[0]
+        tfidf_params = best["tfidf"]
+        classifier = (
+            clone(best["estimator"]) if "estimator" in best
+            else MODEL_CANDIDATES[best["model"]]()
+        )
+        print(f"\nBest candidate: {best['model']} with TF-IDF {tfidf_params}.")
+    else:
+        tfidf_params = {}
+        print("Fitting the preprocessor on the training data...")
+        _, X_train_processed, X_test_processed = fit_features(
+            tfidf_params, X_train, y_train, X_test, memory
+        )
+        print(f"Shape of processed training data: {X_train_processed.shape}")
+
+        # SparseGaussianNB works on the sparse matrix directly, no need to densify it
+        print("\nTraining and evaluating Naive Bayes model...")
+        nb_model = SparseGaussianNB()
+        nb_model.fit(X_train_processed, y_train)
+
+        # evaluate on the holdout test set to confirm performance
+        y_pred = nb_model.predict(X_test_processed)
+        y_pred_proba = nb_model.predict_proba(X_test_processed)[:, 1]
+
+        print("\n--- Naive Bayes Performance on Holdout Test Set ---")
+        print(classification_report(y_test, y_pred))
+        print(f"F1 Score: {f1_score(y_test, y_pred):.4f}")
+        print(f"ROC AUC:  {roc_auc_score(y_test, y_pred_proba):.4f}")
+        classifier = SparseGaussianNB()
+
+    # build
+
+    print("\nBuilding the final production pipeline with the best model...")
+    final_production_pipeline = Pipeline(
+        steps=[
+            ("preprocessor", build_pipeline(tfidf_params=tfidf_params, memory=memory)),
+            ("classifier", classifier),
+        ]
+    )
+
+    print("Fitting the final production pipeline on the full dataset...")
+    final_production_pipeline.fit(X, y)
+    # the cache location is a training detail, keep it out of the artifact
+    final_production_pipeline.set_params(preprocessor__memory=None)
+
+    save_model(final_production_pipeline)
+    save_drift_reference(final_production_pipeline, X)
 
-print("Fitting the final production pipeline on the full dataset...")
-final_production_pipeline.fit(X, y)
 
-# Saving
-model_filename = "models/pizza_request_model.joblib"
-print(f"Saving final pipeline to {model_filename}...")
-joblib.dump(final_production_pipeline, model_filename)
-print("Model saved successfully. This file is ready for deployment.")
+if __name__ == "__main__":
+    main()
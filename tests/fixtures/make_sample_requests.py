@@ -0,0 +1,129 @@
+# make_sample_requests.py
+"""
+Writes tests/fixtures/sample_requests.json, the request sample the fast
+scorer is checked against the sklearn pipeline on (tests/test_inference.py).
+
+    python -m tests.fixtures.make_sample_requests
+
+With data/dataset.json present, the sample is 300 rows of it. The dump is
+not in the repository, so otherwise the sample is drawn from what the
+served model learned from it: texts are made of the fitted TF-IDF
+vocabulary, common terms more often, and the numeric inputs follow the
+means and spreads of the fitted scaler. A few hand-written records add the
+edge cases of real requests (empty body, non-ASCII text, negative karma).
+"""
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+from src.schemas import PizzaRequestInput
+
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+DATASET_PATH = os.path.join("data", "dataset.json")
+OUTPUT_PATH = os.path.join("tests", "fixtures", "sample_requests.json")
+N_RECORDS = 300
+FIELDS = list(PizzaRequestInput.model_fields)
+_SUBREDDITS = ["AskReddit", "funny", "pics", "IAmA", "gaming", "WTF", "Random_Acts_Of_Pizza"]
+
+EDGE_CASES = [
+    {"request_title": "[Request] Hungry", "request_text_edit_aware": ""},
+    {
+        "request_title": "[REQUEST] Café crème & crêpes? No, just pizza 🍕",
+        "request_text_edit_aware": "Jalapeño, naïve façade… “smart quotes” — and\ttabs\nnewlines.",
+    },
+    {
+        "request_title": "   ",
+        "request_text_edit_aware": "please " * 700,
+        "requester_upvotes_minus_downvotes_at_request": -85,
+        "requester_upvotes_plus_downvotes_at_request": 85,
+    },
+    {
+        "request_title": "Request: first post, brand new account",
+        "request_text_edit_aware": "EDIT: Thank you so much!!! I will pay it forward.",
+        "requester_account_age_in_days_at_request": 0.0,
+        "requester_number_of_comments_at_request": 0,
+        "requester_number_of_posts_at_request": 0,
+        "requester_number_of_subreddits_at_request": 0,
+        "requester_upvotes_minus_downvotes_at_request": 0,
+        "requester_upvotes_plus_downvotes_at_request": 0,
+        "requester_subreddits_at_request": [],
+    },
+]
+
+
+def _lognormal(rng, mean: float, std: float, n: int) -> np.ndarray:
+    """Non-negative values with the given mean and standard deviation."""
+    mean = max(mean, 1e-3)
+    sigma2 = np.log1p((std / mean) ** 2)
+    return rng.lognormal(np.log(mean) - sigma2 / 2, np.sqrt(sigma2), n)
+
+
+def _from_model(pipeline, n: int, seed: int) -> list:
+    rng = np.random.default_rng(seed)
+    columns = pipeline.named_steps["preprocessor"].named_steps["5_preprocessor"]
+    scaler = columns.named_transformers_["num"]
+    stats = dict(zip(columns.transformers_[0][2], zip(scaler.mean_, scaler.scale_)))
+    tfidf = columns.named_transformers_["text"]
+    terms = np.array(sorted(tfidf.vocabulary_, key=tfidf.vocabulary_.get))
+    # idf = ln((1 + docs) / (1 + df)) + 1: draw terms in proportion to their document frequency
+    weights = np.exp(-tfidf.idf_)
+    weights /= weights.sum()
+
+    def text(n_terms):
+        return " ".join(rng.choice(terms, size=max(int(n_terms), 0), p=weights))
+
+    body_lengths = _lognormal(rng, *stats["request_length"], n) / 7
+    timestamps = rng.uniform(1.2975e9, 1.3815e9, n)
+    records = []
+    for i in range(n):
+        record = {
+            "request_id": f"t3_s{i:04x}",
+            "request_title": "[Request] " + text(rng.integers(3, 12)),
+            "request_text_edit_aware": text(body_lengths[i]),
+            "requester_username": f"sample_user_{i}",
+            "unix_timestamp_of_request_utc": float(timestamps[i]),
+            "unix_timestamp_of_request": float(timestamps[i]) + 3600 * rng.integers(-8, 1),
+        }
+        for name in FIELDS:
+            if name not in stats:
+                continue
+            value = _lognormal(rng, *stats[name], 1)[0]
+            # requesters with no history yet
+            if rng.random() < 0.05:
+                value = 0.0
+            is_int = PizzaRequestInput.model_fields[name].annotation is int
+            record[name] = int(round(value)) if is_int else float(value)
+        # karma is net of downvotes, sometimes below zero
+        record["requester_upvotes_minus_downvotes_at_request"] -= int(rng.integers(0, 30))
+        n_subreddits = record["requester_number_of_subreddits_at_request"]
+        record["requester_subreddits_at_request"] = [
+            str(s) for s in rng.choice(_SUBREDDITS, size=min(n_subreddits, len(_SUBREDDITS)))
+        ]
+        records.append(record)
+    for i, overrides in enumerate(EDGE_CASES):
+        records[i] = {**records[i], **overrides}
+    return records
+
+
+def _from_dataset(path: str, n: int, seed: int) -> list:
+    raw_df = pd.read_json(path)
+    return raw_df[FIELDS].sample(n=min(n, len(raw_df)), random_state=seed).to_dict("records")
+
+
+def main():
+    if os.path.exists(DATASET_PATH):
+        records = _from_dataset(DATASET_PATH, N_RECORDS, seed=0)
+    else:
+        records = _from_model(joblib.load(MODEL_PATH), N_RECORDS, seed=0)
+    records = [PizzaRequestInput(**r).model_dump() for r in records]
+    with open(OUTPUT_PATH, "w", encoding="utf-8") as f:
+        # one record per line: a JSON array that still diffs line by line
+        f.write("[\n" + ",\n".join(json.dumps(r, ensure_ascii=False) for r in records) + "\n]\n")
+    print(f"{len(records)} sample requests written to {OUTPUT_PATH}.")
+
+
+if __name__ == "__main__":
+    main()
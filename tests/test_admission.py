@@ -0,0 +1,106 @@
+import asyncio
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from src.admission import (
+    AdmissionController,
+    AdmissionMiddleware,
+    AdmissionRejectedError,
+    TokenBucketLimiter,
+    check_deadline,
+)
+
+
+def test_controller_queues_then_sheds():
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout_ms=50)
+        await controller.acquire()
+        # the second request waits for the slot, the third finds the queue full
+        waiting = asyncio.ensure_future(controller.acquire())
+        await asyncio.sleep(0)
+        with pytest.raises(AdmissionRejectedError) as e:
+            await controller.acquire()
+        assert (e.value.reason, e.value.status) == ("queue_full", 503)
+
+        controller.release()
+        await waiting
+        assert controller.stats()["in_flight"] == 1
+
+        # nobody releases: the waiter gives up after the queue timeout
+        started = time.monotonic()
+        with pytest.raises(AdmissionRejectedError) as e:
+            await controller.acquire()
+        assert e.value.reason == "queue_timeout"
+        assert time.monotonic() - started < 1
+        controller.release()
+        return controller.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["in_flight"] == 0 and stats["pending"] == 0
+    assert stats["admitted"] == 2
+    assert stats["rejected_queue_full"] == stats["rejected_queue_timeout"] == 1
+
+
+def test_token_bucket_refills_at_its_rate(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr("src.admission.time.monotonic", lambda: now[0])
+    limiter = TokenBucketLimiter(rate=2.0, burst=2, max_clients=1)
+    assert limiter.allow("a") == (True, 0)
+    assert limiter.allow("a") == (True, 0)
+    assert limiter.allow("a") == (False, 1)
+    now[0] += 0.5
+    assert limiter.allow("a")[0]
+    # only one client is tracked: "a" is forgotten and starts full again
+    assert limiter.allow("b")[0]
+    assert limiter.stats() == {"clients": 1, "limited": 1}
+
+
+def test_middleware_rate_limits_and_enforces_deadlines():
+    app = FastAPI()
+    controller = AdmissionController(max_in_flight=2)
+
+    @app.post("/predict")
+    def predict():
+        time.sleep(0.05)
+        check_deadline()
+        return {"ok": True}
+
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=controller,
+        limiter=TokenBucketLimiter(rate=0.001, burst=2),
+        timeout_ms=1000,
+        client_header="X-Client-Id",
+    )
+
+    with TestClient(app) as client:
+        assert client.post("/predict", headers={"X-Client-Id": "a"}).status_code == 200
+        # a 10 ms client timeout has passed when the endpoint checks it
+        response = client.post(
+            "/predict", headers={"X-Client-Id": "a", "X-Request-Timeout-Ms": "10"}
+        )
+        assert response.status_code == 503
+        response = client.post("/predict", headers={"X-Client-Id": "a"})
+        assert response.status_code == 429
+        assert int(response.headers["Retry-After"]) >= 1
+        assert client.post("/predict", headers={"X-Client-Id": "b"}).status_code == 200
+    assert controller.stats()["in_flight"] == 0
+    assert controller.stats()["deadline_exceeded"] == 1
+
+
+def test_middleware_keys_clients_on_their_address_by_default():
+    app = FastAPI()
+
+    @app.post("/predict")
+    def predict():
+        return {"ok": True}
+
+    app.add_middleware(AdmissionMiddleware, limiter=TokenBucketLimiter(rate=0.001, burst=1))
+
+    with TestClient(app) as client:
+        assert client.post("/predict", headers={"X-Client-Id": "a"}).status_code == 200
+        # a new header value does not make a new client
+        assert client.post("/predict", headers={"X-Client-Id": "b"}).status_code == 429
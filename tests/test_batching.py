@@ -0,0 +1,159 @@
+import threading
+import time
+
+import pytest
+
+from src.batching import MicroBatcher
+
+
+@pytest.fixture
+def batcher():
+    calls = []
+
+    def score_fn(records):
+        calls.append(len(records))
+        return [record["x"] * 2 for record in records]
+
+    micro_batcher = MicroBatcher(score_fn, max_batch_size=8, max_wait_ms=50)
+    micro_batcher.calls = calls
+    micro_batcher.start()
+    yield micro_batcher
+    micro_batcher.stop()
+
+
+def test_concurrent_submits_are_coalesced(batcher):
+    """
+    GIVEN a running micro-batcher with a 50 ms wait window
+    WHEN 8 callers submit at the same time
+    THEN each caller gets its own result and the items are scored in fewer calls
+    """
+    results = {}
+    barrier = threading.Barrier(8)
+
+    def caller(i):
+        barrier.wait()
+        results[i] = batcher.submit({"x": i}, timeout=5)
+
+    threads = [threading.Thread(target=caller, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert results == {i: i * 2 for i in range(8)}
+    assert sum(batcher.calls) == 8
+    assert len(batcher.calls) < 8
+    assert batcher.stats()["items_scored"] == 8
+
+
+def test_scoring_error_is_raised_in_every_caller():
+    def failing_score_fn(records):
+        raise ValueError("bad batch")
+
+    micro_batcher = MicroBatcher(failing_score_fn, max_wait_ms=1)
+    micro_batcher.start()
+    try:
+        with pytest.raises(ValueError, match="bad batch"):
+            micro_batcher.submit({"x": 1}, timeout=5)
+    finally:
+        micro_batcher.stop()
+
+
+def test_a_bad_record_only_fails_its_own_caller():
+    def score_fn(records):
+        if any(record["x"] < 0 for record in records):
+            raise ValueError("negative")
+        # a short result list must not leave a caller waiting forever
+        return [record["x"] for record in records if record["x"] != 99]
+
+    micro_batcher = MicroBatcher(score_fn, max_batch_size=8, max_wait_ms=50)
+    micro_batcher.start()
+    outcomes = {}
+    barrier = threading.Barrier(3)
+
+    def caller(x):
+        barrier.wait()
+        try:
+            outcomes[x] = micro_batcher.submit({"x": x}, timeout=5)
+        except Exception as e:
+            outcomes[x] = type(e).__name__
+
+    threads = [threading.Thread(target=caller, args=(x,)) for x in (1, -1, 99)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    micro_batcher.stop()
+
+    assert outcomes == {1: 1, -1: "ValueError", 99: "RuntimeError"}
+    with pytest.raises(RuntimeError, match="not running"):
+        micro_batcher.submit({"x": 1})
+
+
+def test_stop_past_its_timeout_fails_queued_callers():
+    """
+    GIVEN a worker stuck on a slow batch and a caller queued behind it
+    WHEN stop times out
+    THEN the queued caller fails instead of waiting, and the worker is kept
+    """
+    entered, release = threading.Event(), threading.Event()
+
+    def slow_score_fn(records):
+        entered.set()
+        release.wait(5)
+        return [record["x"] for record in records]
+
+    micro_batcher = MicroBatcher(slow_score_fn, max_batch_size=1, max_wait_ms=1)
+    micro_batcher.start()
+    outcomes = {}
+
+    def caller(x):
+        try:
+            outcomes[x] = micro_batcher.submit({"x": x}, timeout=5)
+        except Exception as e:
+            outcomes[x] = type(e).__name__
+
+    first = threading.Thread(target=caller, args=(1,))
+    first.start()
+    assert entered.wait(5)
+    second = threading.Thread(target=caller, args=(2,))
+    second.start()
+    while not micro_batcher.stats()["pending"]:
+        time.sleep(0.01)
+
+    micro_batcher.stop(timeout=0.05)
+    second.join(1)
+    assert outcomes == {2: "RuntimeError"}
+    assert micro_batcher._thread is not None
+
+    release.set()
+    micro_batcher.stop()
+    first.join(1)
+    assert outcomes == {1: 1, 2: "RuntimeError"}
+    assert micro_batcher._thread is None
+
+
+def test_a_caller_that_times_out_is_not_scored():
+    entered, release = threading.Event(), threading.Event()
+    scored = []
+
+    def slow_score_fn(records):
+        entered.set()
+        release.wait(5)
+        scored.extend(record["x"] for record in records)
+        return [record["x"] for record in records]
+
+    micro_batcher = MicroBatcher(slow_score_fn, max_batch_size=1, max_wait_ms=1)
+    micro_batcher.start()
+    try:
+        blocker = threading.Thread(target=micro_batcher.submit, args=({"x": 1}, 5))
+        blocker.start()
+        # the worker is busy with the first record
+        assert entered.wait(5)
+        with pytest.raises(TimeoutError):
+            micro_batcher.submit({"x": 2}, timeout=0.05)
+        release.set()
+        blocker.join(5)
+    finally:
+        micro_batcher.stop()
+    assert scored == [1]
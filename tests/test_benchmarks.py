@@ -0,0 +1,35 @@
+import os
+
+os.environ["TESTING"] = "true"
+
+from benchmarks import bench_api, bench_stages, compare
+
+
+def test_stage_benchmark_times_every_step():
+    result = bench_stages.run((1, 20), repeats=1)
+    assert [b["batch_size"] for b in result["batches"]] == [1, 20]
+    timings = result["batches"][1]["median_ms"]
+    assert {"1_drop_cols", "5_preprocessor", "classifier", "pipeline_total"} <= timings.keys()
+
+
+def test_api_benchmark_reports_latency_percentiles():
+    result = bench_api.run(20, (1, 4), warmup=2, db="memory")
+    for level in result["levels"]:
+        assert level["requests"] == 10 and level["errors"] == 0
+        assert level["latency"]["p50_ms"] <= level["latency"]["p99_ms"]
+
+
+def test_compare_flags_regressions_by_direction():
+    baseline = {
+        "api": {"levels": [{"concurrency": 8, "throughput_rps": 100.0, "requests": 10}]},
+        "stages": {"batches": [{"batch_size": 1, "median_ms": {"classifier": 1.0}}]},
+    }
+    candidate = {
+        "api": {"levels": [{"concurrency": 8, "throughput_rps": 70.0, "requests": 20}]},
+        "stages": {"batches": [{"batch_size": 1, "median_ms": {"classifier": 0.5}}]},
+    }
+    rows = {row[0]: row[4] for row in compare.compare(baseline, candidate, 0.2)}
+    assert rows == {
+        "api.levels.concurrency=8.throughput_rps": True,
+        "stages.batches.batch_size=1.median_ms.classifier": False,
+    }
@@ -0,0 +1,54 @@
+from src.cache import PredictionCache, request_fingerprint
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_lru_eviction_keeps_recently_used_entries():
+    cache = PredictionCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # "a" is now the most recently used
+    cache.put("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    stats = cache.stats()
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_entries_expire_after_ttl():
+    clock = FakeClock()
+    cache = PredictionCache(ttl_seconds=10, clock=clock)
+    cache.put("a", 1)
+    clock.now = 9.9
+    assert cache.get("a") == 1
+    clock.now = 10.0
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_fingerprint_ignores_non_feature_fields_and_tracks_model_version():
+    request = {
+        "request_id": "t3_1",
+        "request_title": "title",
+        "request_text_edit_aware": "text",
+        "requester_username": "user",
+        "unix_timestamp_of_request_utc": 1380000000.0,
+        "requester_subreddits_at_request": ["pizza"],
+    }
+    resubmitted = {**request, "request_id": "t3_2", "requester_subreddits_at_request": []}
+    edited = {**request, "request_text_edit_aware": "other text"}
+
+    assert request_fingerprint(request, "v1") == request_fingerprint(resubmitted, "v1")
+    assert request_fingerprint(request, "v1") != request_fingerprint(edited, "v1")
+    assert request_fingerprint(request, "v1") != request_fingerprint(request, "v2")
@@ -0,0 +1,39 @@
+import pyarrow as pa
+import pytest
+
+from src.columnar import ColumnSchemaError, feature_columns, validate_table
+from src.schemas import PizzaRequestInput
+from tests.test_inference import SYNTHETIC_RECORDS
+
+RECORDS = [PizzaRequestInput(**r).model_dump() for r in SYNTHETIC_RECORDS]
+
+
+def test_valid_columns_match_per_object_validation():
+    table = pa.Table.from_pylist([{**r, "extra_column": 1} for r in SYNTHETIC_RECORDS])
+    validated, valid_indices, row_errors = validate_table(table)
+    assert valid_indices == list(range(len(RECORDS))) and row_errors == {}
+    assert validated.to_pylist() == RECORDS
+    assert list(feature_columns(validated)["requester_number_of_posts_at_request"]) == [
+        r["requester_number_of_posts_at_request"] for r in RECORDS
+    ]
+
+
+def test_a_null_rejects_its_row_and_a_bad_column_the_batch():
+    rows = [dict(r) for r in SYNTHETIC_RECORDS[:3]]
+    rows[1]["request_title"] = None
+    _, valid_indices, row_errors = validate_table(pa.Table.from_pylist(rows))
+    assert valid_indices == [0, 2]
+    assert row_errors[1][0]["loc"] == ["request_title"]
+
+    table = pa.Table.from_pylist(rows[:1])
+    table = table.set_column(
+        table.column_names.index("requester_number_of_posts_at_request"),
+        "requester_number_of_posts_at_request",
+        pa.array([1.5]),
+    ).drop_columns(["request_id"])
+    with pytest.raises(ColumnSchemaError) as e:
+        validate_table(table)
+    assert {tuple(err["loc"]) for err in e.value.errors} == {
+        ("body", "request_id"),
+        ("body", "requester_number_of_posts_at_request"),
+    }
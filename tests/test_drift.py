@@ -0,0 +1,78 @@
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+
+os.environ["TESTING"] = "true"
+
+from benchmarks.synthetic import make_records
+from src import drift, train
+from src.model_loader import artifact_version
+
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+BUNDLE_PATH = os.path.join("models", "pizza_request_model.npz")
+RECORDS = make_records(400, seed=5)
+PROBABILITIES = np.random.default_rng(5).beta(2, 5, len(RECORDS))
+
+
+def test_same_traffic_is_stable_and_shifted_traffic_drifts():
+    reference = drift.build_reference(RECORDS, PROBABILITIES, ["v1"])
+    assert set(reference["features"]) == set(drift.MONITORED_FEATURES) | {drift.PROBABILITY}
+    assert all(len(f["shares"]) <= drift.BINS for f in reference["features"].values())
+
+    monitor = drift.DriftMonitor(reference, window_size=500)
+    monitor.update(RECORDS, PROBABILITIES)
+    report = monitor.report()
+    assert report["drifted"] == [] and report["window_rows"] == len(RECORDS)
+    assert report["features"]["politeness_score"]["psi"] < 0.01
+
+    # newer accounts and more confident predictions; the earlier window is kept
+    shifted = [
+        {**r, "requester_account_age_in_days_at_request": 0.0} for r in RECORDS
+    ]
+    monitor.update(shifted, 1 - PROBABILITIES)
+    report = monitor.report()
+    assert report["window_rows"] == 2 * len(RECORDS)
+    assert "requester_account_age_in_days_at_request" in report["drifted"]
+    assert drift.PROBABILITY in report["drifted"]
+    assert "raop_post_ratio" not in report["drifted"]
+
+    # full windows push the oldest counts out: only shifted traffic is left
+    monitor.update(shifted, 1 - PROBABILITIES)
+    monitor.update(shifted, 1 - PROBABILITIES)
+    report = monitor.report()
+    assert report["window_rows"] == 2 * len(RECORDS)
+    assert report["features"]["requester_account_age_in_days_at_request"]["live_shares"][0] == 1.0
+
+
+def test_monitor_thread_updates_off_the_caller():
+    monitor = drift.DriftMonitor(
+        drift.build_reference(RECORDS, PROBABILITIES), max_queued_rows=15
+    )
+    assert monitor.observe(RECORDS[:10], PROBABILITIES[:10])
+    # the queue holds 15 rows and nobody drains it yet: 5 of 10 are kept
+    assert monitor.observe(RECORDS[:10], PROBABILITIES[:10])
+    assert not monitor.observe(RECORDS[:10], PROBABILITIES[:10])
+    assert monitor.stats()["pending"] == 15
+    monitor.start()
+    monitor.stop()
+    columns = {k: np.array([r.get(k) for r in RECORDS[10:30]]) for k in RECORDS[0]}
+    monitor.start()
+    assert monitor.observe(columns, PROBABILITIES[10:30])
+    monitor.stop()
+    assert monitor.stats() == {
+        "observed": 30, "dropped": 20, "failed": 0, "pending": 0, "window_rows": 30
+    }
+
+
+def test_train_saves_a_reference_for_the_served_versions(tmp_path):
+    pipeline = joblib.load(MODEL_PATH)
+    path = str(tmp_path / "model.drift.json")
+    train.save_drift_reference(
+        pipeline, pd.DataFrame(RECORDS), MODEL_PATH, BUNDLE_PATH, path
+    )
+    reference = drift.load_reference(path)
+    assert reference["rows"] == len(RECORDS)
+    assert drift.matches(reference, artifact_version(BUNDLE_PATH))
+    assert not drift.matches(reference, "another-version")
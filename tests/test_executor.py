@@ -0,0 +1,62 @@
+import asyncio
+import os
+import signal
+
+import pytest
+
+from src.executor import ExecutorOverloadedError, InferenceExecutor, WorkerCrashedError
+from src.inference import FastScorer
+from src.schemas import PizzaRequestInput
+from tests.test_inference import SYNTHETIC_RECORDS
+
+BUNDLE_PATH = os.path.join("models", "pizza_request_model.npz")
+
+RECORDS = [PizzaRequestInput(**r).model_dump() for r in SYNTHETIC_RECORDS] * 50
+
+
+@pytest.fixture(scope="module")
+def executor():
+    executor = InferenceExecutor(
+        max_workers=2, max_pending=8, bundle_path=BUNDLE_PATH, min_chunk_size=16
+    )
+    executor.start()
+    yield executor
+    executor.stop()
+
+
+def test_scores_match_in_process_scorer(executor):
+    expected = FastScorer.load(BUNDLE_PATH).score(RECORDS)
+    assert executor.score(RECORDS) == expected
+    assert asyncio.run(executor.score_async(RECORDS[:1])) == (
+        expected[0][:1],
+        expected[1][:1],
+    )
+
+
+def test_rejects_calls_beyond_max_pending(executor):
+    # 200 records in chunks of at least 16 over 2 workers: 2 chunks per call
+    futures = [executor._submit(executor._chunks(RECORDS))[1] for _ in range(4)]
+    with pytest.raises(ExecutorOverloadedError):
+        executor.score(RECORDS)
+    for call in futures:
+        for future in call:
+            future.result()
+    assert executor.stats()["calls_rejected"] == 1
+    assert executor.stats()["pending"] == 0
+
+
+def test_pool_is_replaced_after_a_worker_crash(executor):
+    os.kill(next(iter(executor._pool._processes)), signal.SIGKILL)
+    with pytest.raises(WorkerCrashedError):
+        executor.score(RECORDS)
+    assert executor.stats()["pool_restarts"] == 1
+    assert len(executor.score(RECORDS)[0]) == len(RECORDS)
+
+
+def test_reload_swaps_workers_to_another_artifact(executor):
+    model_path = os.path.join("models", "pizza_request_model.joblib")
+    executor.reload(None, model_path, "joblib-version")
+    predictions, probabilities, version = executor.score_versioned(RECORDS)
+    assert version == "joblib-version"
+    assert len(predictions) == len(RECORDS)
+    assert executor.stats()["reloads"] == 1
@@ -0,0 +1,111 @@
+import json
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+os.environ["TESTING"] = "true"
+
+from benchmarks.synthetic import make_records
+from src import incremental
+from src.database import Base
+from src.model_loader import load_model, score_records
+from src.models import PredictionLog, PredictionOutcome
+from src.naive_bayes import SparseGaussianNB
+
+RECORDS = make_records(120, seed=1)
+LABELS = list(np.random.default_rng(1).random(len(RECORDS)) < 0.4)
+
+
+def test_mini_batches_match_a_single_fit():
+    pipeline = None
+    for start in range(0, len(RECORDS), 50):
+        pipeline = incremental.partial_fit(
+            pipeline, RECORDS[start : start + 50], LABELS[start : start + 50], 256
+        )
+    updated = pipeline.named_steps["classifier"]
+    features = pipeline.named_steps["preprocessor"].transform(pd.DataFrame(RECORDS))
+    full = SparseGaussianNB().fit(features, LABELS)
+    np.testing.assert_array_equal(updated.class_count_, full.class_count_)
+    np.testing.assert_allclose(updated.theta_, full.theta_, atol=1e-10)
+    np.testing.assert_allclose(
+        updated.var_ - updated.epsilon_, full.var_ - full.epsilon_, rtol=1e-6, atol=1e-8
+    )
+
+
+def test_outcomes_are_consumed_once(tmp_path):
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    with Session(engine) as session:
+        session.add_all(
+            PredictionLog(request_id=r["request_id"], raw_request=r) for r in RECORDS[:60]
+        )
+        session.add_all(
+            PredictionOutcome(request_id=r["request_id"], requester_received_pizza=bool(y))
+            for r, y in zip(RECORDS[:60], LABELS)
+        )
+        session.add(PredictionOutcome(request_id="t3_unknown", requester_received_pizza=True))
+        session.commit()
+
+        batches = incremental.iter_outcome_batches(session, 0, 25)
+        pipeline, state = incremental.update(None, incremental.initial_state(), batches, 256)
+        assert state == {
+            "last_outcome_id": 61,
+            "rows_seen": 60,
+            "unmatched_outcomes": 1,
+            "bootstrapped_files": [],
+        }
+
+        path = str(tmp_path / "model.joblib")
+        incremental.publish(pipeline, state, path)
+        pipeline, state = incremental.load_incremental_model(path)
+        assert state["last_outcome_id"] == 61
+        batches = incremental.iter_outcome_batches(session, state["last_outcome_id"], 25)
+        assert list(batches) == []
+
+        # only the new outcome is read by the next update
+        session.add(PredictionLog(request_id=RECORDS[60]["request_id"], raw_request=RECORDS[60]))
+        session.add(
+            PredictionOutcome(request_id=RECORDS[60]["request_id"], requester_received_pizza=True)
+        )
+        session.commit()
+        batches = incremental.iter_outcome_batches(session, state["last_outcome_id"], 25)
+        pipeline, state = incremental.update(pipeline, state, batches)
+        assert state["rows_seen"] == 61
+        assert pipeline.named_steps["classifier"].class_count_.sum() == 61
+
+
+def test_published_model_is_served(tmp_path):
+    data_path = tmp_path / "dataset.json"
+    data_path.write_text(
+        json.dumps([dict(r, requester_received_pizza=bool(y)) for r, y in zip(RECORDS, LABELS)])
+    )
+    model_path = str(tmp_path / "incremental.joblib")
+    # a served TF-IDF model and its bundle
+    served_path = tmp_path / "served.joblib"
+    shutil.copyfile(os.path.join("models", "pizza_request_model.joblib"), served_path)
+    (tmp_path / "served.npz").write_bytes(b"bundle")
+
+    # the served model is not an incremental one, so it is never updated
+    with pytest.raises(SystemExit):
+        incremental.main(["--data", str(data_path), "--model", str(served_path)])
+
+    incremental.main([
+        "--data", str(data_path), "--model", model_path, "--batch-size", "40",
+        "--publish-to", str(served_path),
+    ])
+    assert not (tmp_path / "served.npz").exists()
+    assert (tmp_path / "served.npz.replaced").exists()
+    # the same file is not learned from twice
+    with pytest.raises(SystemExit):
+        incremental.main(["--data", str(data_path), "--model", model_path])
+    assert incremental.load_incremental_model(model_path)[1]["rows_seen"] == len(RECORDS)
+
+    pipeline, scorer, _ = load_model(str(tmp_path / "served.npz"), str(served_path))
+    assert scorer is None and pipeline.incremental_state_["rows_seen"] == len(RECORDS)
+    predictions, probabilities = score_records(pipeline, scorer, RECORDS[:5])
+    assert len(predictions) == 5 and all(0.0 <= p <= 1.0 for p in probabilities)
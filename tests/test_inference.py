@@ -0,0 +1,150 @@
+import json
+import os
+import subprocess
+import sys
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.inference import FastScorer, UnsupportedPipelineError
+from src.schemas import PizzaRequestInput
+
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+DATASET_PATH = os.path.join("data", "dataset.json")
+# written by `python -m tests.fixtures.make_sample_requests`
+SAMPLE_PATH = os.path.join("tests", "fixtures", "sample_requests.json")
+
+BASE_RECORD = {
+    "request_id": "t3_w5491",
+    "request_title": "Broke college student hoping for a pizza",
+    "request_text_edit_aware": "I have an exam tomorrow and haven't eaten all day. A pizza would be a lifesaver!",
+    "requester_username": "studious_student",
+    "unix_timestamp_of_request_utc": 1380481858.0,
+    "requester_account_age_in_days_at_request": 365.5,
+    "requester_days_since_first_post_on_raop_at_request": 0.0,
+    "requester_number_of_comments_at_request": 25,
+    "requester_number_of_comments_in_raop_at_request": 2,
+    "requester_number_of_posts_at_request": 10,
+    "requester_number_of_posts_on_raop_at_request": 1,
+    "requester_number_of_subreddits_at_request": 5,
+    "requester_upvotes_minus_downvotes_at_request": 150,
+    "requester_upvotes_plus_downvotes_at_request": 250,
+    "requester_subreddits_at_request": ["funny", "askreddit", "pics"],
+    "unix_timestamp_of_request": 1380481858.0,
+}
+
+SYNTHETIC_RECORDS = [
+    BASE_RECORD,
+    {
+        **BASE_RECORD,
+        "request_title": "[Request] PLEASE, I'd be so grateful. Thank you!!",
+        "request_text_edit_aware": "I hate asking, but I promise to pay it forward and return the favor. Café déjà vu",
+        "unix_timestamp_of_request_utc": 1378857599.9999,
+    },
+    {
+        **BASE_RECORD,
+        "request_title": "",
+        "request_text_edit_aware": "",
+        "requester_username": "",
+        "requester_number_of_posts_at_request": 0,
+        "requester_number_of_posts_on_raop_at_request": 0,
+        "unix_timestamp_of_request_utc": 0.0,
+    },
+    {
+        **BASE_RECORD,
+        "request_text_edit_aware": "pizza " * 500,
+        "requester_account_age_in_days_at_request": 5000.0,
+        "requester_upvotes_minus_downvotes_at_request": -40,
+    },
+]
+
+
+@pytest.fixture(scope="module")
+def pipeline():
+    return joblib.load(MODEL_PATH)
+
+
+@pytest.fixture(scope="module")
+def scorer(pipeline):
+    return FastScorer.from_pipeline(pipeline)
+
+
+def _assert_parity(pipeline, scorer, records):
+    input_df = pd.DataFrame(records)
+    expected_features = pipeline[:-1].transform(input_df)
+    np.testing.assert_allclose(
+        scorer.transform(records), expected_features, rtol=1e-12, atol=1e-12
+    )
+    np.testing.assert_allclose(
+        scorer.predict_proba(records),
+        pipeline.predict_proba(input_df),
+        rtol=1e-9,
+        atol=1e-12,
+    )
+    predictions, probabilities = scorer.score(records)
+    assert predictions == [int(p) for p in pipeline.predict(input_df)]
+    assert len(probabilities) == len(records)
+
+
+def test_fast_path_matches_pipeline_on_synthetic_requests(pipeline, scorer):
+    records = [PizzaRequestInput(**r).model_dump() for r in SYNTHETIC_RECORDS]
+    _assert_parity(pipeline, scorer, records)
+
+
+def test_fast_path_matches_pipeline_on_sample_requests(pipeline, scorer):
+    with open(SAMPLE_PATH, encoding="utf-8") as f:
+        records = [PizzaRequestInput(**r).model_dump() for r in json.load(f)]
+    assert len(records) >= 300
+    _assert_parity(pipeline, scorer, records)
+
+
+@pytest.mark.skipif(
+    not os.path.exists(DATASET_PATH), reason="data/dataset.json is not available"
+)
+def test_fast_path_matches_pipeline_on_dataset(pipeline, scorer):
+    raw_df = pd.read_json(DATASET_PATH)
+    fields = list(PizzaRequestInput.model_fields)
+    records = raw_df[fields].to_dict(orient="records")
+    for start in range(0, len(records), 1000):
+        _assert_parity(pipeline, scorer, records[start : start + 1000])
+
+
+def test_unsupported_pipeline_is_rejected():
+    with pytest.raises(UnsupportedPipelineError):
+        FastScorer.from_pipeline(object())
+
+
+def test_bundle_round_trip_matches_pipeline(pipeline, scorer, tmp_path):
+    bundle_path = tmp_path / "model.npz"
+    scorer.save(bundle_path)
+    loaded = FastScorer.load(bundle_path)
+    records = [PizzaRequestInput(**r).model_dump() for r in SYNTHETIC_RECORDS]
+    _assert_parity(pipeline, loaded, records)
+
+
+def test_memory_mapped_bundle_matches_pipeline(pipeline, scorer, tmp_path):
+    bundle_path = tmp_path / "model.npz"
+    scorer.save(bundle_path)
+    loaded = FastScorer.load(bundle_path, mmap_mode="r")
+    assert not loaded.theta.flags.writeable
+    records = [PizzaRequestInput(**r).model_dump() for r in SYNTHETIC_RECORDS]
+    _assert_parity(pipeline, loaded, records)
+
+
+def test_serving_from_bundle_does_not_import_sklearn_or_pandas():
+    code = (
+        "import sys, src.main as m; "
+        "served = m.model_registry.current; "
+        "assert served.scorer is not None and served.pipeline is None; "
+        "print(sorted(k for k in ('sklearn', 'pandas', 'joblib') if k in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        env={**os.environ, "TESTING": "true", "FAST_PATH_ENABLED": "true"},
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    assert result.stdout.strip().splitlines()[-1] == "[]"
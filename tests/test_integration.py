@@ -1,3 +1,6 @@
+import asyncio
+import datetime
+import json
 import os
 import pytest
 from fastapi.testclient import TestClient
@@ -9,8 +12,11 @@ os.environ["TESTING"] = "true"
 
 from src.main import app, get_db
 from src.database import Base
-from src.models import PredictionLog
+from src.models import PredictionLog, PredictionOutcome
 import src.main  
+from src import rollups
+from src.registry import ServedModel
+from src.drift import DriftMonitor
 
 # test database engine and session factory 
 TEST_DB_FILE = "./test_integration.db"
@@ -67,10 +73,15 @@ def client(db_setup_and_teardown, monkeypatch):
     mock_model = Mock()
     mock_model.predict.return_value = [1]
     mock_model.predict_proba.return_value = [[0.1, 0.9]]
-    monkeypatch.setattr(src.main, "model_pipeline", mock_model)
+    # score through the (mocked) pipeline rather than the NumPy fast path
+    monkeypatch.setattr(
+        src.main.model_registry, "current", ServedModel(mock_model, None, "test-version")
+    )
 
     # Apply the dependency override for the /predict endpoint
     app.dependency_overrides[get_db] = override_get_db
+    # and the sessions the app opens itself (streamed chunks)
+    monkeypatch.setattr(app.state, "session_factory", TestingSessionLocal)
 
     # Now that everything is patched and the DB is set up, create the client
     with TestClient(app) as test_client:
@@ -131,6 +142,8 @@ def test_valid_prediction(client, db_session):
     assert log_entry is not None
     assert log_entry.prediction_value == 1
     assert log_entry.raw_request["request_title"] == "Valid integration test"
+    assert log_entry.request_id == "test_123"
+    assert log_entry.model_version == "test-version"
 
 
 def test_invalid_prediction_missing_field(client, db_session):
@@ -163,3 +176,382 @@ def test_invalid_prediction_missing_field(client, db_session):
     # Database Log
     log_count = db_session.query(PredictionLog).count()
     assert log_count == 0
+
+
+def test_batch_prediction_with_invalid_item(client, db_session):
+    """
+    GIVEN a batch with two valid items and one item missing a required field
+    WHEN the /predict/batch endpoint is called
+    THEN valid items are scored in one pipeline call, the invalid one gets an
+    error entry, and only the valid items are logged
+    """
+    base_payload = {
+        "request_id": "test_batch_0",
+        "request_title": "Batch integration test",
+        "request_text_edit_aware": "This is a batch test for the integration.",
+        "requester_username": "test_user",
+        "unix_timestamp_of_request_utc": 1380000000.0,
+        "requester_account_age_in_days_at_request": 100,
+        "requester_days_since_first_post_on_raop_at_request": 10,
+        "requester_number_of_comments_at_request": 5,
+        "requester_number_of_comments_in_raop_at_request": 1,
+        "requester_number_of_posts_at_request": 2,
+        "requester_number_of_posts_on_raop_at_request": 1,
+        "requester_number_of_subreddits_at_request": 3,
+        "requester_upvotes_minus_downvotes_at_request": 50,
+        "requester_upvotes_plus_downvotes_at_request": 100,
+        "requester_subreddits_at_request": ["test", "pizza"],
+        "unix_timestamp_of_request": 1380000000.0,
+    }
+    invalid_payload = {k: v for k, v in base_payload.items() if k != "request_title"}
+    batch = [base_payload, invalid_payload, {**base_payload, "request_id": "test_batch_2"}]
+
+    src.main.model_registry.current.pipeline.predict_proba.return_value = [[0.1, 0.9], [0.8, 0.2]]
+
+    response = client.post("/predict/batch", json=batch)
+
+    assert response.status_code == 200
+    data = response.json()
+    assert data["n_succeeded"] == 2
+    assert data["n_failed"] == 1
+    assert data["results"][0]["prediction_label"] == "Pizza Received"
+    assert data["results"][1]["error"][0]["loc"] == ["request_title"]
+    assert data["results"][2]["request_id"] == "test_batch_2"
+    assert data["results"][2]["probability_of_success"] == 0.2
+
+    # the whole batch went through the pipeline as a single frame
+    assert src.main.model_registry.current.pipeline.predict_proba.call_count == 1
+    assert len(src.main.model_registry.current.pipeline.predict_proba.call_args[0][0]) == 2
+
+    assert db_session.query(PredictionLog).count() == 2
+
+
+def test_repeated_request_id_is_idempotent(client, db_session, monkeypatch):
+    """
+    GIVEN idempotency and the prediction cache are enabled
+    WHEN the same request_id is sent twice and the same content under a new id
+    THEN the repeat returns the stored result without a new log row, and the
+    new id reuses the cached score but is logged
+    """
+    from src.cache import PredictionCache
+
+    monkeypatch.setattr(src.main, "idempotency_cache", PredictionCache())
+    monkeypatch.setattr(src.main, "prediction_cache", PredictionCache())
+    payload = {
+        "request_id": "test_retry",
+        "request_title": "Retried request",
+        "request_text_edit_aware": "The client retried this request.",
+        "requester_username": "test_user",
+        "unix_timestamp_of_request_utc": 1380000000.0,
+        "requester_account_age_in_days_at_request": 100,
+        "requester_days_since_first_post_on_raop_at_request": 10,
+        "requester_number_of_comments_at_request": 5,
+        "requester_number_of_comments_in_raop_at_request": 1,
+        "requester_number_of_posts_at_request": 2,
+        "requester_number_of_posts_on_raop_at_request": 1,
+        "requester_number_of_subreddits_at_request": 3,
+        "requester_upvotes_minus_downvotes_at_request": 50,
+        "requester_upvotes_plus_downvotes_at_request": 100,
+        "requester_subreddits_at_request": ["test", "pizza"],
+        "unix_timestamp_of_request": 1380000000.0,
+    }
+
+    first = client.post("/predict", json=payload)
+    retry = client.post("/predict", json=payload)
+    resubmitted = client.post("/predict", json={**payload, "request_id": "test_new_id"})
+
+    assert first.json() == retry.json() == resubmitted.json()
+    assert src.main.model_registry.current.pipeline.predict_proba.call_count == 1
+    assert db_session.query(PredictionLog).count() == 2
+
+
+def test_status_reports_worker_memory(client):
+    response = client.get("/status")
+    assert response.status_code == 200
+    worker = response.json()["worker"]
+    assert worker["pid"] == os.getpid()
+    assert {"rss_anon_kb", "rss_file_kb", "pss_kb"} <= set(worker)
+
+
+def test_stream_prediction_reports_bad_lines_and_keeps_going(client, db_session, monkeypatch):
+    """
+    GIVEN an NDJSON body with a valid line, malformed JSON and another valid line
+    WHEN the /predict/stream endpoint is called with a chunk size of one
+    THEN every line gets a result line in order and the valid ones are logged
+    """
+    monkeypatch.setattr(src.main.config, "STREAM_CHUNK_SIZE", 1)
+    payload = {
+        "request_id": "test_stream_1",
+        "request_title": "Stream integration test",
+        "request_text_edit_aware": "This is a stream test for the integration.",
+        "requester_username": "test_user",
+        "unix_timestamp_of_request_utc": 1380000000.0,
+        "requester_account_age_in_days_at_request": 100,
+        "requester_days_since_first_post_on_raop_at_request": 10,
+        "requester_number_of_comments_at_request": 5,
+        "requester_number_of_comments_in_raop_at_request": 1,
+        "requester_number_of_posts_at_request": 2,
+        "requester_number_of_posts_on_raop_at_request": 1,
+        "requester_number_of_subreddits_at_request": 3,
+        "requester_upvotes_minus_downvotes_at_request": 50,
+        "requester_upvotes_plus_downvotes_at_request": 100,
+        "requester_subreddits_at_request": ["test", "pizza"],
+        "unix_timestamp_of_request": 1380000000.0,
+    }
+    body = "\n".join(
+        [json.dumps(payload), "{not json", json.dumps({**payload, "request_id": "test_stream_3"})]
+    )
+
+    response = client.post(
+        "/predict/stream", content=body, headers={"Content-Type": "application/x-ndjson"}
+    )
+
+    assert response.status_code == 200
+    results = [json.loads(line) for line in response.text.splitlines()]
+    assert [r["line"] for r in results] == [1, 2, 3]
+    assert results[0]["prediction_label"] == "Pizza Received"
+    assert results[1]["error"][0]["type"] == "json_invalid"
+    assert results[2]["request_id"] == "test_stream_3"
+    assert db_session.query(PredictionLog).count() == 2
+
+
+def test_stream_of_bad_lines_is_answered_chunk_by_chunk(monkeypatch):
+    """
+    GIVEN an NDJSON body of invalid lines only
+    WHEN it is streamed with a chunk size of two
+    THEN results come back every two lines, not only at the end of the body
+    """
+    monkeypatch.setattr(src.main.config, "STREAM_CHUNK_SIZE", 2)
+
+    async def body():
+        for _ in range(5):
+            yield b"{not json\n"
+
+    async def chunks():
+        return [chunk async for chunk in src.main._stream_predictions(body())]
+
+    assert [chunk.count(b"\n") for chunk in asyncio.run(chunks())] == [2, 2, 1]
+
+
+def test_stream_chunk_is_cut_by_its_byte_budget(monkeypatch):
+    """
+    GIVEN a chunk byte budget smaller than two lines
+    WHEN lines well under the line limit are streamed
+    THEN every line is answered on its own chunk
+    """
+    monkeypatch.setattr(src.main.config, "STREAM_CHUNK_SIZE", 100)
+    monkeypatch.setattr(src.main.config, "STREAM_MAX_CHUNK_BYTES", 15)
+
+    async def body():
+        for _ in range(3):
+            yield b"{not json at all\n"
+
+    async def chunks():
+        return [chunk async for chunk in src.main._stream_predictions(body())]
+
+    assert [chunk.count(b"\n") for chunk in asyncio.run(chunks())] == [1, 1, 1]
+
+
+def test_outcome_is_recorded(client, db_session):
+    """
+    GIVEN the observed outcome of a request
+    WHEN the /outcomes endpoint is called
+    THEN it is stored as a label for incremental updates
+    """
+    response = client.post(
+        "/outcomes", json={"request_id": "test_123", "requester_received_pizza": True}
+    )
+
+    assert response.status_code == 200
+    outcome = db_session.query(PredictionOutcome).one()
+    assert outcome.request_id == "test_123" and outcome.requester_received_pizza is True
+
+
+def test_metrics_report_requests_and_stage_timings(client):
+    """
+    GIVEN a prediction has been served
+    WHEN /metrics is scraped
+    THEN it reports the request, the stage timings and the model gauge
+    """
+    payload = {
+        "request_id": "test_metrics_1",
+        "request_title": "Metrics integration test",
+        "request_text_edit_aware": "This is a metrics test for the integration.",
+        "requester_username": "test_user",
+        "unix_timestamp_of_request_utc": 1380000000.0,
+        "requester_account_age_in_days_at_request": 100,
+        "requester_days_since_first_post_on_raop_at_request": 10,
+        "requester_number_of_comments_at_request": 5,
+        "requester_number_of_comments_in_raop_at_request": 1,
+        "requester_number_of_posts_at_request": 2,
+        "requester_number_of_posts_on_raop_at_request": 1,
+        "requester_number_of_subreddits_at_request": 3,
+        "requester_upvotes_minus_downvotes_at_request": 50,
+        "requester_upvotes_plus_downvotes_at_request": 100,
+        "requester_subreddits_at_request": ["test", "pizza"],
+        "unix_timestamp_of_request": 1380000000.0,
+    }
+    assert client.post("/predict", json=payload).status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    body = response.text
+    assert 'pizza_http_requests_total{method="POST",route="/predict",status="200"}' in body
+    for stage in ("request_parse", "dataframe", "predict_proba", "score", "db_log"):
+        assert f'pizza_stage_duration_seconds_count{{stage="{stage}"}}' in body
+    assert "pizza_model_info{version=" in body
+
+
+def test_logs_are_paged_by_cursor_and_filtered(client, db_session):
+    """
+    GIVEN five logged predictions
+    WHEN /logs is paged two at a time, and filtered
+    THEN pages come newest first without overlap, and filters use the indexed columns
+    """
+    for i in range(5):
+        db_session.add(
+            PredictionLog(
+                request_id=f"t3_{i}",
+                model_version="v1" if i < 3 else "v2",
+                raw_request={"request_id": f"t3_{i}"},
+                prediction_label="Pizza Received" if i % 2 else "No Pizza Received",
+                prediction_value=i % 2,
+                probability_of_success=0.1 * i,
+            )
+        )
+    db_session.commit()
+
+    seen, cursor = [], None
+    while True:
+        params = {"limit": 2, **({"cursor": cursor} if cursor else {})}
+        page = client.get("/logs", params=params).json()
+        seen += [item["request_id"] for item in page["items"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert seen == ["t3_4", "t3_3", "t3_2", "t3_1", "t3_0"]
+
+    page = client.get("/logs", params={"model_version": "v1", "prediction_value": 1}).json()
+    assert [item["request_id"] for item in page["items"]] == ["t3_1"]
+    assert "raw_request" not in page["items"][0]
+
+    page = client.get("/logs", params={"request_id": "t3_2", "include_request": True}).json()
+    assert page["items"][0]["raw_request"] == {"request_id": "t3_2"}
+    assert client.get("/logs", params={"limit": 0}).status_code == 422
+
+
+def test_stats_are_read_from_rollups(client, db_session):
+    """
+    GIVEN logged predictions, some compacted into the rollups
+    WHEN /stats is requested
+    THEN only the compacted logs are counted, by hour, weekday and probability bucket
+    """
+    logged_at = datetime.datetime.now(datetime.UTC) - datetime.timedelta(minutes=1)
+    for probability in (0.05, 0.95, 0.97):
+        db_session.add(
+            PredictionLog(
+                created_at=logged_at,
+                model_version="v1",
+                prediction_value=int(probability > 0.5),
+                probability_of_success=probability,
+            )
+        )
+    db_session.commit()
+    assert rollups.compact_all(TestingSessionLocal, lag_seconds=0) == 3
+    db_session.add(PredictionLog(model_version="v1", prediction_value=1, probability_of_success=0.9))
+    db_session.commit()
+
+    stats = client.get("/stats", params={"days": 2}).json()
+    assert stats["total"]["predictions"] == 3
+    assert stats["total"]["success_rate"] == pytest.approx(2 / 3)
+    assert stats["by_hour"][logged_at.hour]["predictions"] == 3
+    assert stats["by_probability_bucket"][9]["predictions"] == 2
+    assert sum(d["predictions"] for d in stats["by_day_of_week"]) == 3
+    assert client.get("/stats", params={"model_version": "v2"}).json()["total"]["predictions"] == 0
+
+
+def test_admin_model_endpoints(client, monkeypatch):
+    """
+    GIVEN an admin token and a served model without kept versions
+    WHEN the admin endpoints are called
+    THEN the token is required, and a rollback has nothing to return to
+    """
+    monkeypatch.setattr(src.main.config, "ADMIN_TOKEN", "secret")
+    assert client.get("/admin/models").status_code == 403
+    headers = {"X-Admin-Token": "secret"}
+    models = client.get("/admin/models", headers=headers).json()
+    assert models["current"]["version"] == "test-version"
+    assert client.post("/admin/models/rollback", headers=headers).status_code == 404
+
+
+def test_arrow_and_parquet_batches_round_trip(client, db_session):
+    """
+    GIVEN a columnar batch with one row missing a required value
+    WHEN it is posted as Arrow IPC and as Parquet
+    THEN the response is a table of the same format with one row per input
+    row, the invalid row carries an error and only scored rows are logged
+    """
+    import pyarrow as pa
+    from src.columnar import read_arrow, read_parquet, write_arrow, write_parquet
+
+    from src.registry import WARMUP_RECORD as payload
+
+    rows = [
+        {**payload, "request_id": "columnar_0"},
+        {**payload, "request_id": "columnar_1", "request_title": None},
+        {**payload, "request_id": "columnar_2"},
+    ]
+    table = pa.Table.from_pylist(rows)
+    pipeline = src.main.model_registry.current.pipeline
+    pipeline.predict_proba.return_value = [[0.1, 0.9], [0.8, 0.2]]
+
+    response = client.post("/predict/arrow", content=write_arrow(table))
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/vnd.apache.arrow.stream"
+    result = read_arrow(response.content).to_pylist()
+    assert [r["request_id"] for r in result] == ["columnar_0", None, "columnar_2"]
+    assert result[0]["prediction_label"] == "Pizza Received"
+    assert result[2]["probability_of_success"] == 0.2
+    assert "request_title" in result[1]["error"]
+    # the valid rows went through the pipeline as one frame
+    assert len(pipeline.predict_proba.call_args[0][0]) == 2
+    assert db_session.query(PredictionLog).count() == 2
+
+    response = client.post("/predict/parquet", content=write_parquet(table))
+    assert response.status_code == 200
+    assert read_parquet(response.content).num_rows == 3
+
+    assert client.post("/predict/arrow", content=b"not arrow").status_code == 400
+    assert client.post(
+        "/predict/arrow", content=write_arrow(table.drop_columns(["request_id"]))
+    ).status_code == 422
+
+
+def test_msgpack_batch(client):
+    """
+    GIVEN a msgpack list of requests
+    WHEN it is posted to /predict/msgpack
+    THEN the batch response comes back packed with msgpack
+    """
+    msgpack = pytest.importorskip("msgpack")
+    from src.registry import WARMUP_RECORD
+
+    body = msgpack.packb([WARMUP_RECORD])
+    response = client.post("/predict/msgpack", content=body)
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/msgpack"
+    assert msgpack.unpackb(response.content)["n_succeeded"] == 1
+
+
+def test_drift_endpoint_needs_the_monitor(client, monkeypatch):
+    """
+    GIVEN the drift monitor, on or off
+    WHEN /drift is requested
+    THEN it reports the scores, or 404 when monitoring is disabled
+    """
+    monkeypatch.setattr(src.main, "drift_monitor", None)
+    assert client.get("/drift").status_code == 404
+    monkeypatch.setattr(src.main, "drift_monitor", DriftMonitor())
+    report = client.get("/drift").json()
+    assert report["has_reference"] is False and report["model_version"] == "test-version"
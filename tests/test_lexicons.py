@@ -0,0 +1,54 @@
+import json
+import random
+
+import pytest
+
+from src.lexicons import DEFAULT_LEXICONS, TermMatcher, load_lexicons
+
+
+def _reference_count(text, terms):
+    """The original per-term substring scan the matcher replaces."""
+    if not isinstance(text, str):
+        return 0
+    lower_text = text.lower()
+    return sum(1 for term in set(terms) if term in lower_text)
+
+
+def test_matcher_agrees_with_substring_scan():
+    matcher = TermMatcher(DEFAULT_LEXICONS)
+    words = [
+        "Thanks", "thank", "you", "pay", "it", "forward", "back", "kindly",
+        "kind", "I", "hate", "asking", "would", "be", "great", "nice",
+        "no", "sob", "story", "spare", "my", "in", "exchange", "ashamed",
+    ]
+    rng = random.Random(0)
+    texts = [" ".join(rng.choice(words) for _ in range(40)) for _ in range(500)]
+    texts += ["", "Thanks!!", "unkindly grateful", None]
+
+    counts = matcher.count_many(texts)
+    for text, row in zip(texts, counts):
+        expected = [
+            _reference_count(text, DEFAULT_LEXICONS[c]) for c in matcher.categories
+        ]
+        assert list(row) == expected, text
+
+
+def test_overlapping_terms_are_all_counted():
+    matcher = TermMatcher({"polite": ["thank", "thanks", "hank"], "other": ["ks"]})
+    assert matcher.count("THANKS a lot") == [3, 1]
+
+
+def test_lexicons_load_from_file(tmp_path):
+    path = tmp_path / "lexicons.json"
+    path.write_text(
+        json.dumps({"polite": ["merci"], "humility": ["sorry"], "reciprocity": []})
+    )
+    matcher = TermMatcher(load_lexicons(str(path)))
+    assert matcher.count("Merci, sorry!") == [1, 1, 0]
+
+
+def test_lexicon_file_missing_a_category_is_rejected(tmp_path):
+    path = tmp_path / "lexicons.json"
+    path.write_text(json.dumps({"polite": ["merci"]}))
+    with pytest.raises(ValueError):
+        load_lexicons(str(path))
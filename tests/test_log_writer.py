@@ -0,0 +1,142 @@
+import asyncio
+import os
+
+import pytest
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+os.environ["TESTING"] = "true"
+
+from src.database import Base
+from src.log_writer import PredictionLogWriter, insert_prediction_logs_async
+from src.models import PredictionLog
+
+
+@pytest.fixture
+def session_factory(tmp_path):
+    engine = create_engine(
+        f"sqlite:///{tmp_path / 'log_writer.db'}",
+        connect_args={"check_same_thread": False},
+    )
+    Base.metadata.create_all(bind=engine)
+    yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    engine.dispose()
+
+
+def _rows(n):
+    return [
+        {
+            "raw_request": {"request_id": f"t3_{i}"},
+            "prediction_label": "Pizza Received",
+            "prediction_value": 1,
+            "probability_of_success": 0.9,
+        }
+        for i in range(n)
+    ]
+
+
+def test_rows_are_flushed_in_bulk_and_drained_on_stop(session_factory):
+    writer = PredictionLogWriter(
+        session_factory, flush_batch_size=100, flush_interval_ms=10_000
+    )
+    writer.start()
+    writer.enqueue(_rows(250))
+    writer.stop()
+
+    db = session_factory()
+    assert db.query(PredictionLog).count() == 250
+    assert db.query(PredictionLog).first().created_at is not None
+    db.close()
+    stats = writer.stats()
+    assert stats["queued"] == 250
+    assert stats["flushed"] == 250
+    assert stats["pending"] == 0
+
+
+def test_drop_policy_counts_overflow(session_factory):
+    # not started, so nothing is consumed from the queue
+    writer = PredictionLogWriter(
+        session_factory, max_queue_size=2, overflow_policy="drop"
+    )
+    writer.enqueue(_rows(5))
+    assert writer.stats()["queued"] == 2
+    assert writer.stats()["dropped"] == 3
+
+
+def test_spill_policy_writes_overflow_to_file(session_factory, tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    writer = PredictionLogWriter(
+        session_factory,
+        max_queue_size=1,
+        overflow_policy="spill",
+        spill_path=str(spill_path),
+    )
+    writer.enqueue(_rows(3))
+    assert writer.stats()["spilled"] == 2
+    assert len(spill_path.read_text().splitlines()) == 2
+
+    assert writer.replay_spill_file() == 2
+    assert not spill_path.exists()
+    db = session_factory()
+    assert db.query(PredictionLog).count() == 2
+    db.close()
+
+
+def test_spilled_rows_are_written_when_a_writer_starts(session_factory, tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    overflowing = PredictionLogWriter(
+        session_factory, max_queue_size=1, overflow_policy="spill", spill_path=str(spill_path)
+    )
+    overflowing.enqueue(_rows(4))
+
+    # e.g. the next process, after a restart
+    writer = PredictionLogWriter(session_factory, spill_path=str(spill_path))
+    writer.start()
+    writer.stop()
+    assert not spill_path.exists()
+    db = session_factory()
+    assert db.query(PredictionLog).count() == 3
+    db.close()
+
+
+def test_replay_moves_unreadable_lines_aside(session_factory, tmp_path):
+    spill_path = tmp_path / "spill.jsonl"
+    writer = PredictionLogWriter(
+        session_factory, max_queue_size=1, overflow_policy="spill", spill_path=str(spill_path)
+    )
+    writer.enqueue(_rows(3))
+    # a row cut short by a crash in the middle of an append
+    with open(spill_path, "a") as f:
+        f.write('{"raw_request": {"request_id": "t3_')
+
+    assert writer.replay_spill_file() == 2
+    assert writer.stats()["rejected"] == 1
+    assert not spill_path.exists()
+    assert (tmp_path / "spill.jsonl.rejected").read_text().startswith('{"raw_request"')
+    assert not list(tmp_path.glob("spill.jsonl.replay-*"))
+    db = session_factory()
+    assert db.query(PredictionLog).count() == 2
+    db.close()
+
+
+def test_unknown_overflow_policy_is_rejected(session_factory):
+    with pytest.raises(ValueError):
+        PredictionLogWriter(session_factory, overflow_policy="ignore")
+
+
+def test_async_insert_writes_rows(tmp_path):
+    pytest.importorskip("aiosqlite")
+    from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+    async def insert_and_count():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'async.db'}")
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with async_sessionmaker(engine)() as session:
+            await insert_prediction_logs_async(session, _rows(3))
+            await session.commit()
+            count = await session.scalar(select(func.count()).select_from(PredictionLog))
+        await engine.dispose()
+        return count
+
+    assert asyncio.run(insert_and_count()) == 3
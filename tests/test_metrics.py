@@ -0,0 +1,56 @@
+import joblib
+import numpy as np
+
+from src.inference import FAST_STAGES, FastScorer
+from src.metrics import MetricsRegistry
+from src.model_loader import score_records, score_records_with_features
+from src.naive_bayes import sparsify_pipeline
+from tests.test_inference import MODEL_PATH, SYNTHETIC_RECORDS
+
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("requests_total", "Requests.", ["status"])
+    latency = registry.histogram("latency_seconds", "Latency.", ["stage"], buckets=(0.1, 1.0))
+    registry.gauge("queue_depth", "Depth.", lambda: {("log_writer",): 3}, ["queue"])
+    requests.inc("200")
+    requests.inc("200")
+    latency.observe(0.05, "score")
+    latency.observe(0.5, "score")
+    latency.observe(5.0, "score")
+
+    lines = registry.render().splitlines()
+    assert "# TYPE requests_total counter" in lines
+    assert 'requests_total{status="200"} 2' in lines
+    assert 'latency_seconds_bucket{stage="score",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{stage="score",le="1.0"} 2' in lines
+    assert 'latency_seconds_bucket{stage="score",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{stage="score"} 3' in lines
+    assert 'latency_seconds_sum{stage="score"} 5.55' in lines
+    assert 'queue_depth{queue="log_writer"} 3' in lines
+
+
+def test_timed_scoring_matches_pipeline_and_times_every_step():
+    pipeline = sparsify_pipeline(joblib.load(MODEL_PATH))
+    stages = {}
+    timed = score_records(pipeline, None, SYNTHETIC_RECORDS, stages.__setitem__)
+    untimed = score_records(pipeline, None, SYNTHETIC_RECORDS)
+
+    assert timed[0] == untimed[0]
+    np.testing.assert_allclose(timed[1], untimed[1])
+    assert ["dataframe", "1_drop_cols", "5_preprocessor"] == [
+        s for s in stages if s in ("dataframe", "1_drop_cols", "5_preprocessor")
+    ]
+    assert list(stages)[-1] == "classifier"
+
+
+def test_fast_scorer_times_each_of_its_steps():
+    scorer = FastScorer.from_pipeline(joblib.load(MODEL_PATH))
+    stages = {}
+    timed = score_records(None, scorer, SYNTHETIC_RECORDS, stages.__setitem__)
+    assert timed == score_records(None, scorer, SYNTHETIC_RECORDS)
+    assert tuple(stages) == FAST_STAGES and all(s >= 0 for s in stages.values())
+
+    stages.clear()
+    score_records_with_features(None, scorer, SYNTHETIC_RECORDS, stages.__setitem__)
+    assert tuple(stages) == FAST_STAGES
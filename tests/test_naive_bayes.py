@@ -0,0 +1,54 @@
+import joblib
+import numpy as np
+import scipy.sparse as sp
+from sklearn.naive_bayes import GaussianNB
+
+from benchmarks.synthetic import make_requests
+from src.naive_bayes import SparseGaussianNB, sparsify_pipeline
+
+
+def _data(seed=0):
+    rng = np.random.default_rng(seed)
+    X = sp.random(400, 200, density=0.05, format="csr", random_state=seed).toarray()
+    X[:, :5] = rng.normal(size=(400, 5))  # a few dense, scaled-like columns
+    y = rng.random(400) < 0.3
+    return sp.csr_matrix(X), y
+
+
+def test_sparse_fit_matches_dense_gaussian_nb():
+    X, y = _data()
+    dense = GaussianNB().fit(X.toarray(), y)
+    sparse = SparseGaussianNB().fit(X, y)
+
+    np.testing.assert_allclose(sparse.theta_, dense.theta_, rtol=1e-12, atol=1e-15)
+    np.testing.assert_allclose(sparse.var_, dense.var_, rtol=1e-10)
+    np.testing.assert_allclose(
+        sparse.predict_proba(X), dense.predict_proba(X.toarray()), rtol=1e-9, atol=1e-12
+    )
+    assert (sparse.predict(X) == dense.predict(X.toarray())).all()
+
+
+def test_sparse_partial_fit_matches_dense_gaussian_nb():
+    X, y = _data(1)
+    dense, sparse = GaussianNB(), SparseGaussianNB()
+    for start in range(0, 400, 100):
+        chunk = slice(start, start + 100)
+        dense.partial_fit(X[chunk].toarray(), y[chunk], classes=[False, True])
+        sparse.partial_fit(X[chunk], y[chunk], classes=[False, True])
+
+    np.testing.assert_allclose(sparse.var_, dense.var_, rtol=1e-10)
+    np.testing.assert_allclose(
+        sparse.predict_proba(X), dense.predict_proba(X.toarray()), rtol=1e-9, atol=1e-12
+    )
+
+
+def test_sparsified_artifact_matches_saved_pipeline():
+    pipeline = joblib.load("models/pizza_request_model.joblib")
+    sparse_pipeline = sparsify_pipeline(pipeline)
+    assert [name for name, _ in sparse_pipeline.steps] == ["preprocessor", "classifier"]
+    assert isinstance(sparse_pipeline.steps[-1][1], SparseGaussianNB)
+
+    df = make_requests(300)
+    np.testing.assert_allclose(
+        sparse_pipeline.predict_proba(df), pipeline.predict_proba(df), rtol=1e-9, atol=1e-12
+    )
@@ -0,0 +1,29 @@
+import pandas as pd
+
+from benchmarks.bench_feature_stages import CURRENT_STAGES, LEGACY_STAGES
+from benchmarks.synthetic import make_requests
+
+
+def _run(stages, df):
+    for stage in stages:
+        df = stage(df)
+    return df
+
+
+def test_feature_stages_match_copying_implementation():
+    """
+    GIVEN a wide frame with leakage and `_at_retrieval` columns
+    WHEN it goes through the feature stages
+    THEN the engineered columns equal the old copy-per-stage output,
+    unused columns are gone and the input frame is left untouched
+    """
+    df = make_requests(200, wide=True)
+    before = df.copy()
+
+    out = _run(CURRENT_STAGES, df)
+    legacy_out = _run(LEGACY_STAGES, df)
+
+    pd.testing.assert_frame_equal(legacy_out[out.columns], out, check_dtype=False)
+    assert not any("_at_retrieval" in col for col in out.columns)
+    assert "giver_username_if_known" not in out.columns
+    pd.testing.assert_frame_equal(df, before)
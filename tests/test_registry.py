@@ -0,0 +1,64 @@
+import os
+import shutil
+
+import pytest
+
+os.environ["TESTING"] = "true"
+
+from src.model_loader import artifact_version
+from src.registry import ModelLoadError, ModelRegistry, UnknownModelVersionError
+
+BUNDLE_PATH = os.path.join("models", "pizza_request_model.npz")
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+
+
+@pytest.fixture
+def registry(tmp_path):
+    shutil.copy(BUNDLE_PATH, tmp_path / "model.npz")
+    shutil.copy(MODEL_PATH, tmp_path / "model.joblib")
+    registry = ModelRegistry(
+        str(tmp_path / "model.npz"),
+        str(tmp_path / "model.joblib"),
+        history_size=2,
+        archive_dir=str(tmp_path / "versions"),
+    )
+    registry.reload()
+    return registry
+
+
+def test_reload_serves_a_new_version_and_rollback_restores_the_old(registry, tmp_path):
+    bundle_version = artifact_version(BUNDLE_PATH)
+    assert registry.current.version == bundle_version
+    assert registry.current.bundle_path == str(tmp_path / "versions" / f"{bundle_version}.npz")
+    assert registry.reload()["status"] == "unchanged"
+
+    # without the bundle, the joblib pipeline is the artifact on disk
+    os.remove(tmp_path / "model.npz")
+    assert registry.reload() == {
+        "status": "reloaded",
+        "model_version": artifact_version(MODEL_PATH),
+    }
+    assert registry.current.bundle_path is None and registry.current.pipeline is not None
+    assert [m["version"] for m in registry.versions()["history"]] == [bundle_version]
+
+    assert registry.rollback()["model_version"] == bundle_version
+    assert registry.current.pipeline is None
+    assert registry.rollback(artifact_version(MODEL_PATH))["status"] == "rolled_back"
+    with pytest.raises(UnknownModelVersionError):
+        registry.rollback("0123456789ab")
+
+
+def test_a_broken_artifact_keeps_the_served_version(registry, tmp_path):
+    served = registry.current
+    (tmp_path / "model.npz").write_bytes(b"not a model")
+    with pytest.raises(ModelLoadError):
+        registry.reload()
+    assert registry.current is served
+    assert registry.stats()["failed_reloads"] == 1
+
+
+def test_watcher_check_reloads_only_on_change(registry, tmp_path):
+    assert registry.check() is None
+    os.remove(tmp_path / "model.npz")
+    assert registry.check()["status"] == "reloaded"
+    assert registry.check() is None
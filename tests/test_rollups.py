@@ -0,0 +1,89 @@
+import datetime
+import os
+from collections import Counter
+
+from sqlalchemy import create_engine, update
+from sqlalchemy.orm import Session, sessionmaker
+
+os.environ["TESTING"] = "true"
+
+from src import rollups
+from src.database import Base
+from src.models import PredictionLog, PredictionRollup, RollupState
+
+START = datetime.datetime(2024, 3, 4, 22, 0)  # a Monday
+
+
+def _engine():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(engine)
+    return engine
+
+
+def _add_logs(engine, n, offset=0):
+    with Session(engine) as session:
+        session.add_all(
+            PredictionLog(
+                created_at=START + datetime.timedelta(minutes=17 * (offset + i)),
+                model_version="v1",
+                prediction_value=(offset + i) % 3 == 0,
+                probability_of_success=((offset + i) % 10) / 10 + 0.05,
+            )
+            for i in range(n)
+        )
+        session.commit()
+
+
+def test_compaction_in_batches_matches_a_full_group_by():
+    engine = _engine()
+    factory = sessionmaker(bind=engine)
+    _add_logs(engine, 150)
+    assert rollups.compact_all(factory, batch_size=40, lag_seconds=0) == 150
+    _add_logs(engine, 50, offset=150)
+    assert rollups.compact_all(factory, batch_size=40, lag_seconds=0) == 50
+
+    with Session(engine) as session:
+        expected = Counter(
+            (
+                log.created_at.date(),
+                log.created_at.hour,
+                rollups.probability_bucket(log.probability_of_success),
+            )
+            for log in session.query(PredictionLog)
+        )
+        actual = {
+            (r.day, r.hour, r.probability_bucket): r.predictions
+            for r in session.query(PredictionRollup)
+        }
+        assert actual == dict(expected)
+        stats = rollups.read_stats(session, START.date(), START.date() + datetime.timedelta(days=3))
+    assert stats["total"]["predictions"] == 200
+    assert stats["total"]["predicted_success"] == 67
+    assert stats["rolled_up_through_log_id"] == 200
+    assert stats["by_day_of_week"][0]["predictions"] == 8  # 22:00 to midnight on Monday
+    assert sum(b["predictions"] for b in stats["by_probability_bucket"]) == 200
+
+
+def test_recent_logs_wait_for_the_next_pass():
+    engine = _engine()
+    _add_logs(engine, 3)
+    with Session(engine) as session:
+        session.add(PredictionLog(prediction_value=1, probability_of_success=0.5))
+        session.commit()
+    with Session(engine) as session:
+        assert rollups.compact(session, lag_seconds=60) == 3
+        assert session.get(RollupState, rollups.STATE_NAME).last_log_id == 3
+
+
+def test_a_moved_watermark_discards_the_pass(monkeypatch):
+    engine = _engine()
+    _add_logs(engine, 5)
+    with Session(engine) as session:
+        rollups.compact(session, batch_size=2, lag_seconds=0)
+        # another process rolls up logs 3 to 5 after this one read watermark 2
+        monkeypatch.setattr(rollups, "_watermark", lambda session: 2)
+        session.execute(update(RollupState).values(last_log_id=5))
+        session.commit()
+        assert rollups.compact(session, lag_seconds=0) == 0
+    with Session(engine) as session:
+        assert sum(r.predictions for r in session.query(PredictionRollup)) == 2
@@ -0,0 +1,69 @@
+import csv
+import io
+import json
+import os
+
+import pytest
+
+from src.score import _iter_json_array, part_path, run
+from tests.test_inference import SYNTHETIC_RECORDS
+
+ROWS = [dict(r, request_id=f"t3_{i}") for i, r in enumerate(SYNTHETIC_RECORDS * 3)]
+ROWS[4] = {"request_id": "t3_broken"}
+
+
+def _read_csv_parts(output_dir):
+    rows = []
+    for name in sorted(os.listdir(output_dir)):
+        if name.endswith(".csv"):
+            with open(os.path.join(output_dir, name), newline="") as f:
+                rows.extend(csv.DictReader(f))
+    return rows
+
+
+def test_jsonl_is_scored_in_resumable_chunks(tmp_path):
+    input_path = tmp_path / "requests.jsonl"
+    input_path.write_text("".join(json.dumps(r) + "\n" for r in ROWS))
+    output_dir = str(tmp_path / "scores")
+
+    totals = run(str(input_path), output_dir, "csv", chunk_size=5, workers=1, log=io.StringIO())
+    assert totals["rows"] == len(ROWS) and totals["failed"] == 1 and totals["chunks"] == 3
+
+    rows = _read_csv_parts(output_dir)
+    assert [int(r["row"]) for r in rows] == list(range(len(ROWS)))
+    assert rows[4]["error"] and not rows[4]["prediction_value"]
+    assert rows[0]["prediction_label"] in ("Pizza Received", "No Pizza Received")
+
+    # a rerun only scores the chunk whose part file is missing
+    os.remove(part_path(output_dir, 1, "csv"))
+    totals = run(str(input_path), output_dir, "csv", chunk_size=5, workers=1, log=io.StringIO())
+    assert totals["chunks"] == 1 and totals["chunks_skipped"] == 2
+    assert _read_csv_parts(output_dir) == rows
+
+    with pytest.raises(SystemExit):
+        run(str(input_path), output_dir, "csv", chunk_size=4, workers=1, log=io.StringIO())
+    # without the bundle, the joblib pipeline is another model version
+    with pytest.raises(SystemExit):
+        run(
+            str(input_path), output_dir, "csv", chunk_size=5, workers=1,
+            bundle_path=None, log=io.StringIO(),
+        )
+
+
+def test_json_array_and_parquet_inputs(tmp_path):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    valid_rows = ROWS[:4]
+    json_path = tmp_path / "requests.json"
+    json_path.write_text(json.dumps(valid_rows, indent=2))
+    assert list(_iter_json_array(str(json_path))) == valid_rows
+
+    parquet_path = tmp_path / "requests.parquet"
+    pq.write_table(pa.Table.from_pylist(valid_rows), parquet_path)
+    run(str(json_path), str(tmp_path / "from_json"), workers=1, log=io.StringIO())
+    run(str(parquet_path), str(tmp_path / "from_parquet"), workers=1, log=io.StringIO())
+
+    from_json = pq.read_table(part_path(str(tmp_path / "from_json"), 0, "parquet"))
+    from_parquet = pq.read_table(part_path(str(tmp_path / "from_parquet"), 0, "parquet"))
+    assert from_json.equals(from_parquet)
+    assert from_json.column("error").null_count == len(valid_rows)
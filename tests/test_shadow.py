@@ -0,0 +1,86 @@
+import json
+import os
+
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+os.environ["TESTING"] = "true"
+
+from benchmarks.synthetic import make_records
+from src import shadow
+from src.database import Base
+from src.inference import FastScorer
+from src.model_loader import artifact_version, score_records_with_features
+from src.models import ShadowPredictionLog
+from src.naive_bayes import sparsify_pipeline
+
+MODEL_PATH = os.path.join("models", "pizza_request_model.joblib")
+BUNDLE_PATH = os.path.join("models", "pizza_request_model.npz")
+RECORDS = make_records(80, seed=3)
+
+
+@pytest.fixture(scope="module")
+def head(tmp_path_factory):
+    data_path = tmp_path_factory.mktemp("data") / "dataset.json"
+    labels = np.random.default_rng(3).random(len(RECORDS)) < 0.4
+    data_path.write_text(
+        json.dumps([{**r, "requester_received_pizza": bool(y)} for r, y in zip(RECORDS, labels)])
+    )
+    artifact, scores = shadow.train_head("logistic_regression", MODEL_PATH, str(data_path))
+    assert 0.0 <= scores["roc_auc"] <= 1.0
+    head_path = data_path.parent / "lr.joblib"
+    joblib.dump(artifact, head_path)
+    return shadow.load_head("lr", str(head_path))
+
+
+def test_fast_scorer_features_match_the_preprocessor():
+    pipeline = sparsify_pipeline(joblib.load(MODEL_PATH))
+    expected = pipeline[:-1].transform(pd.DataFrame(RECORDS))
+    features = FastScorer.load(BUNDLE_PATH).features(RECORDS)
+    np.testing.assert_allclose(features.toarray(), expected.toarray(), atol=1e-9)
+
+
+def test_shadow_predictions_are_logged_off_the_shared_features(head):
+    # one in-memory database shared with the scorer thread
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+    )
+    Base.metadata.create_all(engine)
+    scorer = shadow.ShadowScorer([head], session_factory=sessionmaker(bind=engine))
+    fast = FastScorer.load(BUNDLE_PATH)
+    predictions, _, features = score_records_with_features(None, fast, RECORDS)
+    scorer.start()
+    assert scorer.submit(RECORDS, predictions, artifact_version(BUNDLE_PATH), features)
+    # a version the head was not trained for is skipped
+    scorer.submit(RECORDS, predictions, "0123456789ab", features)
+    scorer.stop()
+
+    with Session(engine) as session:
+        logged = session.query(ShadowPredictionLog).order_by(ShadowPredictionLog.id).all()
+    expected = head.classifier.predict_proba(features)[:, 1]
+    assert [log.request_id for log in logged] == [r["request_id"] for r in RECORDS]
+    np.testing.assert_allclose([log.probability_of_success for log in logged], expected)
+    assert [log.primary_prediction_value for log in logged] == predictions
+    assert scorer.stats()["incompatible"] == 1
+
+
+def test_sampling_is_deterministic_per_request():
+    ids = [r["request_id"] for r in RECORDS]
+    sampled = [i for i in ids if shadow.in_sample(i, "lr", 0.5)]
+    assert sampled == [i for i in ids if shadow.in_sample(i, "lr", 0.5)]
+    assert 0 < len(sampled) < len(ids)
+    assert not any(shadow.in_sample(i, "lr", 0.0) for i in ids)
+
+
+def test_parse_shadow_models():
+    assert shadow.parse_shadow_models("lr=a.joblib@0.25, nb=b.joblib") == [
+        ("lr", "a.joblib", 0.25),
+        ("nb", "b.joblib", 1.0),
+    ]
+    with pytest.raises(ValueError):
+        shadow.parse_shadow_models("lr=a.joblib@2")
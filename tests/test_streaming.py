@@ -0,0 +1,24 @@
+import asyncio
+
+from src.streaming import iter_ndjson_lines
+
+
+def _lines(chunks, max_line_bytes=100):
+    async def body():
+        for chunk in chunks:
+            yield chunk
+
+    async def collect():
+        return [pair async for pair in iter_ndjson_lines(body(), max_line_bytes)]
+
+    return asyncio.run(collect())
+
+
+def test_lines_split_across_chunks_are_reassembled():
+    chunks = [b'{"a"', b': 1}\n{"b": 2}\n\n', b'{"c":', b" 3}"]
+    assert _lines(chunks) == [(1, b'{"a": 1}'), (2, b'{"b": 2}'), (4, b'{"c": 3}')]
+
+
+def test_oversized_lines_are_reported_without_buffering():
+    chunks = [b"x" * 60, b"x" * 60, b"x" * 60 + b"\nok\n", b"y" * 150]
+    assert _lines(chunks) == [(1, None), (2, b"ok"), (3, None)]
@@ -0,0 +1,41 @@
+import numpy as np
+import pytest
+
+from benchmarks.synthetic import make_requests
+from src import train
+
+
+@pytest.fixture(scope="module")
+def split():
+    X = make_requests(300, seed=0)
+    y = np.random.default_rng(0).random(len(X)) < 0.4
+    return X[:240], y[:240], X[240:], y[240:]
+
+
+def test_features_are_cached_per_tfidf_setting(split, tmp_path):
+    X_train, y_train, X_test, _ = split
+    memory = train.make_memory(str(tmp_path))
+    cached = memory.cache(train._fit_features, ignore=["memory"])
+
+    first = train.fit_features({}, X_train, y_train, X_test, memory)
+    assert cached.check_call_in_cache({}, X_train, y_train, X_test, memory)
+    assert not cached.check_call_in_cache(
+        {"max_features": 500}, X_train, y_train, X_test, memory
+    )
+    second = train.fit_features({}, X_train, y_train, X_test, memory)
+    assert (first[1] != second[1]).nnz == 0
+    # the cache location does not end up in the fitted preprocessor
+    assert first[0].memory is None
+
+
+def test_search_ranks_candidates_within_budget(split, tmp_path, monkeypatch):
+    monkeypatch.setattr(train, "TFIDF_CANDIDATES", [{}, {"max_features": 50}])
+    monkeypatch.setattr(
+        train, "MODEL_CANDIDATES", {"naive_bayes": train.MODEL_CANDIDATES["naive_bayes"]}
+    )
+    results = train.search(*split, train.make_memory(str(tmp_path)), 5, 1, "roc_auc")
+    assert len(results) == 2
+    assert results[0]["roc_auc"] >= results[1]["roc_auc"]
+
+    skipped = train.search(*split, None, -1, 1)
+    assert skipped == []